@@ -0,0 +1,105 @@
+"""
+Агрегатные таблицы по клиентам, которые ведут триггеры
+
+agg_clients_daily   - число клиентов по дню создания и статусу
+agg_clients_company - число клиентов по компании
+
+Отчеты по периодам и распределения читают тысячи готовых строк вместо
+сканирования таблицы клиентов.
+"""
+import time
+import logging
+
+from .database import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Пустые значения сводятся к тем же подписям, что и в отчетах
+STATUS_EXPRESSION = "COALESCE(NULLIF({row}.status, ''), 'не указан')"
+COMPANY_EXPRESSION = "COALESCE(NULLIF({row}.company, ''), 'не указана')"
+DAY_EXPRESSION = "COALESCE(substr({row}.created_at, 1, 10), '')"
+
+AGGREGATE_TABLES = {
+    "agg_clients_daily": "CREATE TABLE IF NOT EXISTS agg_clients_daily ("
+                         "day TEXT NOT NULL, status TEXT NOT NULL, cnt INTEGER NOT NULL, "
+                         "PRIMARY KEY (day, status)) WITHOUT ROWID",
+    "agg_clients_company": "CREATE TABLE IF NOT EXISTS agg_clients_company ("
+                           "company TEXT PRIMARY KEY, cnt INTEGER NOT NULL) WITHOUT ROWID"
+}
+
+
+def _daily_delta(row: str, delta: str) -> str:
+    """SQL изменения счетчика дня и статуса для строки NEW или OLD"""
+    day = DAY_EXPRESSION.format(row=row)
+    status = STATUS_EXPRESSION.format(row=row)
+    return (f"INSERT INTO agg_clients_daily (day, status, cnt) VALUES ({day}, {status}, {delta}) "
+            f"ON CONFLICT (day, status) DO UPDATE SET cnt = cnt + ({delta}); "
+            f"DELETE FROM agg_clients_daily WHERE day = {day} AND status = {status} AND cnt <= 0;")
+
+
+def _company_delta(row: str, delta: str) -> str:
+    """SQL изменения счетчика компании для строки NEW или OLD"""
+    company = COMPANY_EXPRESSION.format(row=row)
+    return (f"INSERT INTO agg_clients_company (company, cnt) VALUES ({company}, {delta}) "
+            f"ON CONFLICT (company) DO UPDATE SET cnt = cnt + ({delta}); "
+            f"DELETE FROM agg_clients_company WHERE company = {company} AND cnt <= 0;")
+
+
+CLIENT_TRIGGERS = {
+    "trg_clients_agg_insert":
+        "AFTER INSERT ON clients BEGIN "
+        + _daily_delta("NEW", "1") + _company_delta("NEW", "1") + " END",
+    "trg_clients_agg_delete":
+        "AFTER DELETE ON clients BEGIN "
+        + _daily_delta("OLD", "-1") + _company_delta("OLD", "-1") + " END",
+    "trg_clients_agg_update_daily":
+        "AFTER UPDATE OF status, created_at ON clients "
+        "WHEN OLD.status IS NOT NEW.status OR OLD.created_at IS NOT NEW.created_at BEGIN "
+        + _daily_delta("OLD", "-1") + _daily_delta("NEW", "1") + " END",
+    "trg_clients_agg_update_company":
+        "AFTER UPDATE OF company ON clients "
+        "WHEN OLD.company IS NOT NEW.company BEGIN "
+        + _company_delta("OLD", "-1") + _company_delta("NEW", "1") + " END"
+}
+
+
+def initialize_client_aggregates():
+    """Создает агрегатные таблицы и триггеры; новые таблицы заполняются из clients"""
+    existing = {row[0] for row in db_manager.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'agg_clients_%'")}
+
+    for ddl in AGGREGATE_TABLES.values():
+        db_manager.execute_query(ddl)
+
+    # Триггеры с устаревшим текстом пересоздаются
+    triggers = {row[0]: row[1] for row in db_manager.execute_query(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_clients_agg_%'")}
+    for name, body in CLIENT_TRIGGERS.items():
+        ddl = f"CREATE TRIGGER {name} {body}"
+        if triggers.get(name) != ddl:
+            db_manager.execute_query(f"DROP TRIGGER IF EXISTS {name}")
+            db_manager.execute_query(ddl)
+    db_manager._commit()
+
+    if not set(AGGREGATE_TABLES) <= existing:
+        rebuild_client_aggregates()
+
+
+def rebuild_client_aggregates() -> float:
+    """Пересчитывает агрегаты по таблице клиентов целиком, возвращает время в секундах"""
+    start = time.perf_counter()
+    day = DAY_EXPRESSION.format(row="clients")
+    status = STATUS_EXPRESSION.format(row="clients")
+    company = COMPANY_EXPRESSION.format(row="clients")
+    with db_manager.transaction():
+        db_manager.execute_query("DELETE FROM agg_clients_daily")
+        db_manager.execute_query(
+            f"INSERT INTO agg_clients_daily (day, status, cnt) "
+            f"SELECT {day}, {status}, COUNT(*) FROM clients GROUP BY 1, 2")
+        db_manager.execute_query("DELETE FROM agg_clients_company")
+        db_manager.execute_query(
+            f"INSERT INTO agg_clients_company (company, cnt) "
+            f"SELECT {company}, COUNT(*) FROM clients GROUP BY 1")
+    elapsed = time.perf_counter() - start
+    logger.info(f"Client aggregates rebuilt in {elapsed:.2f} s")
+    return elapsed
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Кэш результатов (отчеты, агрегаты) с вытеснением давно неиспользуемых записей
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+
+from .config import Config
+from .database import db_manager
+
+
+def estimate_size(value: Any, depth: int = 2) -> int:
+    """Приблизительный размер значения в байтах (вложенность до depth уровней)"""
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, (str, bytes)):
+        return size
+    if isinstance(value, dict):
+        return size + sum(estimate_size(k, depth - 1) + estimate_size(v, depth - 1)
+                          for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return size + sum(estimate_size(item, depth - 1) for item in value)
+    return size
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш, ограниченный числом записей и объемом"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any, size: int = None):
+        """Сохраняет значение; слишком большие значения не кэшируются"""
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]):
+        """Значение из кэша или результат compute() (который затем кэшируется)"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+def data_version(*tables: str) -> Tuple[int, ...]:
+    """Версии данных таблиц - часть ключа кэша: изменение данных дает новый ключ"""
+    return tuple(db_manager.table_version(table) for table in tables)
+
+
+# Глобальный кэш результатов отчетов
+report_cache = LRUCache(Config.REPORT_CACHE_ENTRIES, Config.REPORT_CACHE_MB * 1024 * 1024)
\ No newline at end of file
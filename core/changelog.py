@@ -0,0 +1,111 @@
+"""
+Журнал изменений (change data capture)
+
+Триггеры, созданные Database.track_changes, на каждую вставленную, измененную
+или удаленную строку добавляют в changelog запись (seq, table_name, row_id,
+op, version, ts), op - 'I', 'U' или 'D'. Потребители (выгрузки, синхронизация,
+кэши) хранят курсор - последний прочитанный seq - и читают только новые записи.
+
+Сжатие журнала оставляет по одной (последней) записи на строку таблицы и
+удаляет записи старше срока хранения. Если курсор потребителя старше удаленных
+записей, changes_since возвращает reset=True - нужна полная пересинхронизация.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from .config import Config
+from .database import db_manager
+
+logger = logging.getLogger(__name__)
+
+def _get_meta(key: str, default: Optional[str] = None) -> Optional[str]:
+    row = db_manager.execute_query(
+        "SELECT value FROM changelog_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row is not None else default
+
+
+def _set_meta(key: str, value: Any):
+    db_manager.execute_query(
+        "INSERT INTO changelog_meta (key, value) VALUES (?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, str(value)))
+
+
+def current_cursor() -> int:
+    """Курсор последнего изменения (с него читатель начинает без полной выгрузки)"""
+    row = db_manager.execute_query("SELECT MAX(seq) FROM changelog").fetchone()
+    return max(row[0] or 0, int(_get_meta("truncated_seq", 0)))
+
+
+def changes_since(cursor: int, tables: Iterable[str] = None,
+                  limit: int = 1000) -> Dict[str, Any]:
+    """
+    Изменения после курсора, по возрастанию seq
+
+    Returns:
+        {'changes': [{'seq', 'table', 'row_id', 'op', 'version', 'ts'}, ...],
+         'cursor': курсор для следующего вызова,
+         'has_more': есть ли еще записи после limit,
+         'reset': записи после cursor были удалены сжатием - нужна полная выгрузка}
+    """
+    cursor = int(cursor or 0)
+    reset = cursor < int(_get_meta("truncated_seq", 0))
+
+    sql = "SELECT seq, table_name, row_id, op, version, ts FROM changelog WHERE seq > ?"
+    params = [cursor]
+    tables = list(tables or [])
+    if tables:
+        sql += f" AND table_name IN ({', '.join('?' * len(tables))})"
+        params.extend(tables)
+    sql += f" ORDER BY seq LIMIT {int(limit) + 1}"
+
+    rows = db_manager.execute_query(sql, tuple(params)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [{'seq': row[0], 'table': row[1], 'row_id': row[2], 'op': row[3],
+                'version': row[4], 'ts': row[5]} for row in rows]
+    if changes:
+        cursor = changes[-1]['seq']
+    return {'changes': changes, 'cursor': cursor, 'has_more': has_more, 'reset': reset}
+
+
+def compact_changelog(retention_days: int = None) -> Dict[str, int]:
+    """
+    Сжимает журнал: оставляет последнюю запись по каждой строке таблицы и
+    удаляет записи старше retention_days. Возвращает число удаленных записей
+    """
+    retention_days = Config.CHANGELOG_RETENTION_DAYS if retention_days is None else retention_days
+    start = time.perf_counter()
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+
+    with db_manager.transaction():
+        collapsed = db_manager.execute_query(
+            "DELETE FROM changelog WHERE seq NOT IN "
+            "(SELECT MAX(seq) FROM changelog GROUP BY table_name, row_id)").rowcount
+
+        row = db_manager.execute_query(
+            "SELECT MAX(seq) FROM changelog WHERE ts < ?", (cutoff,)).fetchone()
+        expired = 0
+        if row[0] is not None:
+            expired = db_manager.execute_query(
+                "DELETE FROM changelog WHERE seq <= ?", (row[0],)).rowcount
+            _set_meta("truncated_seq", max(row[0], int(_get_meta("truncated_seq", 0))))
+        _set_meta("compacted_at", datetime.now().isoformat())
+
+    logger.info(f"Changelog compacted in {time.perf_counter() - start:.2f} s: "
+                f"{collapsed} superseded, {expired} expired")
+    return {'collapsed': collapsed, 'expired': expired}
+
+
+def compact_if_due(interval_hours: float = None) -> Optional[Dict[str, int]]:
+    """Сжимает журнал, если с прошлого сжатия прошло больше interval_hours"""
+    interval_hours = Config.CHANGELOG_COMPACT_HOURS if interval_hours is None else interval_hours
+    compacted_at = _get_meta("compacted_at")
+    if compacted_at is not None:
+        try:
+            if datetime.now() - datetime.fromisoformat(compacted_at) < timedelta(hours=interval_hours):
+                return None
+        except ValueError:
+            pass
+    return compact_changelog()
\ No newline at end of file
@@ -2,12 +2,14 @@
 Конфигурация системы
 """
 import os
+import json
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent.parent
 DB_DIR = BASE_DIR / "db"
 DB_DIR.mkdir(exist_ok=True)  # Создаем папку, если её нет
 DB_PATH = DB_DIR / "crm.db"
+SETTINGS_FILE = BASE_DIR / "settings.json"
 
 
 class Config:
@@ -20,4 +22,76 @@ class Config:
     # Настройки UI
     UI_THEME = "dark-blue"
     UI_SCALING = 1.0
-    UI_FONT = ("Arial", 12)
\ No newline at end of file
+    UI_FONT = ("Arial", 12)
+
+    # Сколько построенных интерфейсов модулей держать в памяти
+    MODULE_VIEW_CACHE_SIZE = 4
+
+    # Кэш результатов отчетов: записей и приблизительный объем, МБ
+    REPORT_CACHE_ENTRIES = 256
+    REPORT_CACHE_MB = 64
+
+    # Потоки для коротких заданий (части предварительного просмотра отчета)
+    JOB_POOL_WORKERS = 3
+
+    # Бюджет времени запуска (до завершения фоновой загрузки), мс
+    STARTUP_BUDGET_MS = 2000
+
+    # Общий файл БД для нескольких копий приложения: ожидание снятия блокировки, с,
+    # и повторы запроса с растущей случайной задержкой, если блокировка не снята
+    DB_BUSY_TIMEOUT = 5.0
+    DB_LOCK_RETRIES = 5
+    DB_RETRY_DELAY = 0.05
+    DB_RETRY_MAX_DELAY = 2.0
+
+    # Статистика SQL-запросов (см. core.query_stats): порог медленного запроса, мс,
+    # размер журнала медленных запросов, предел числа форм запросов и признак N+1
+    # (столько выполнений одной формы за окно, мс)
+    QUERY_STATS_ENABLED = True
+    SLOW_QUERY_MS = 100
+    SLOW_QUERY_LOG_SIZE = 200
+    QUERY_SHAPES_MAX = 1000
+    QUERY_BURST_WINDOW_MS = 250
+    QUERY_BURST_THRESHOLD = 25
+
+    # Трассировка действий в формате Chrome trace (отладка, настройка trace_enabled)
+    TRACE_ENABLED = False
+
+    # Сторож интерфейса (см. utils.watchdog): период heartbeat главного цикла, мс,
+    # порог зависания, мс, число последних задержек для перцентилей, размер
+    # журнала зависаний и снятие стека главного потока во время зависания
+    UI_WATCHDOG_ENABLED = True
+    UI_HEARTBEAT_MS = 100
+    UI_STALL_MS = 200
+    UI_LAG_WINDOW = 3000
+    UI_STALL_LOG_SIZE = 100
+    UI_STACK_SAMPLING = True
+
+    # Журнал изменений: сколько дней хранить записи и как часто сжимать, ч
+    CHANGELOG_RETENTION_DAYS = 30
+    CHANGELOG_COMPACT_HOURS = 24
+
+    # Опрос изменений, сделанных другими копиями приложения: период, мс
+    # (0 - выключен), порция чтения журнала и предел строк до полной перезагрузки
+    CHANGE_POLL_MS = 1500
+    CHANGE_WATCH_BATCH = 1000
+    CHANGE_WATCH_MAX_ROWS = 5000
+
+    # HTTP API (включается настройкой api_enabled или командой python -m crm serve)
+    API_HOST = "127.0.0.1"
+    API_PORT = 8765
+    API_WORKERS = 16
+    # Через сколько секунд простоя закрывается keep-alive соединение
+    API_IDLE_TIMEOUT = 5
+    # Режим WAL для API (настройка api_wal): переключает файл БД навсегда и работает
+    # только на локальном диске - не включать для общей БД на сетевом ресурсе
+    API_WAL = False
+
+    @classmethod
+    def get_setting(cls, key: str, default=None):
+        """Возвращает пользовательскую настройку из settings.json"""
+        try:
+            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f).get(key, default)
+        except (OSError, ValueError):
+            return default
\ No newline at end of file
@@ -2,13 +2,31 @@
 Управление базой данных
 """
 import sqlite3
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable
 import logging
 from .config import Config
+from .query_stats import query_stats, InstrumentedCursor
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Колонка версии строки для оптимистичной блокировки (см. enable_row_versions)
+ROW_VERSION_COLUMN = "row_version"
+
+# Ошибки блокировки файла БД другим соединением или процессом (временные)
+TRANSIENT_ERRORS = ("database is locked", "database table is locked", "database is busy")
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Временная ошибка блокировки: запрос можно повторить"""
+    return isinstance(error, sqlite3.OperationalError) and str(error).startswith(TRANSIENT_ERRORS)
+
 
 class Database:
     """Гибкий менеджер базы данных"""
@@ -16,35 +34,150 @@ class Database:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or Config.DB_PATH
         self._ensure_db_directory()
-        self.connection = None
+        # Локальные счетчики изменений таблиц (для таблиц без триггеров версий)
+        self.table_versions = {}
+        # Таблицы с версиями строк: update_many увеличивает row_version
+        self.versioned_tables = set()
+
+        # У каждого потока свое соединение и своя глубина транзакции
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._connected = False
 
     def _ensure_db_directory(self):
         """Создает директорию для БД если её нет"""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
 
+    def _open_connection(self) -> sqlite3.Connection:
+        """Открывает соединение для текущего потока"""
+        # timeout - busy_timeout SQLite: сколько ждать снятия блокировки другим процессом
+        connection = sqlite3.connect(self.db_path, timeout=Config.DB_BUSY_TIMEOUT,
+                                     check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        self._local.connection = connection
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    @property
+    def connection(self) -> Optional[sqlite3.Connection]:
+        """Соединение текущего потока (открывается при первом обращении после connect)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None and self._connected:
+            connection = self._open_connection()
+        return connection
+
+    @property
+    def _transaction_depth(self) -> int:
+        return getattr(self._local, 'transaction_depth', 0)
+
+    @_transaction_depth.setter
+    def _transaction_depth(self, value: int):
+        self._local.transaction_depth = value
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
     def connect(self) -> sqlite3.Connection:
         """Устанавливает соединение с БД"""
         try:
-            self.connection = sqlite3.connect(self.db_path)
-            self.connection.row_factory = sqlite3.Row
+            connection = getattr(self._local, 'connection', None) or self._open_connection()
+            self._connected = True
+            self._create_service_tables()
             logger.info(f"Connected to database: {self.db_path}")
-            return self.connection
+            return connection
         except sqlite3.Error as e:
             logger.error(f"Database connection error: {e}")
             raise
 
+    def _with_retry(self, operation: Callable[[], Any], retry: bool = True) -> Any:
+        """
+        Выполняет операцию, повторяя ее при временной блокировке БД.
+        Задержка растет экспоненциально со случайным разбросом, чтобы копии
+        приложения, столкнувшиеся на одной блокировке, не повторяли запросы
+        одновременно. retry=False - ошибка сразу передается вызывающему
+        """
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except sqlite3.Error as e:
+                if not retry or not is_transient_error(e) or attempt >= Config.DB_LOCK_RETRIES:
+                    raise
+                attempt += 1
+                delay = random.uniform(0, min(Config.DB_RETRY_MAX_DELAY,
+                                              Config.DB_RETRY_DELAY * 2 ** attempt))
+                logger.warning(f"Database is busy ({e}), retry {attempt}/{Config.DB_LOCK_RETRIES} "
+                               f"in {delay:.2f} s")
+                time.sleep(delay)
+
+    def _can_retry_statement(self, connection: sqlite3.Connection) -> bool:
+        """
+        Запрос повторяется, только если он начинает транзакцию: внутри уже
+        начатой транзакции повтор не снимет взаимную блокировку, ее откатывает
+        вызывающий код (transaction)
+        """
+        return not connection.in_transaction
+
+    def _release_failed_statement(self, connection: sqlite3.Connection, retry: bool):
+        """Откатывает неявную транзакцию, открытую неудавшимся запросом"""
+        if retry and self._transaction_depth == 0 and connection.in_transaction:
+            connection.rollback()
+
     def execute_query(self, query: str, params: tuple = None) -> sqlite3.Cursor:
-        """Выполняет SQL запрос"""
-        try:
-            cursor = self.connection.cursor()
+        """
+        Выполняет SQL запрос (при блокировке БД запрос повторяется).
+        Время, строки и медленные запросы учитываются в query_stats
+        """
+        connection = self.connection
+        retry = self._can_retry_statement(connection)
+        instrumented = query_stats.enabled
+
+        def run():
+            cursor = connection.cursor(InstrumentedCursor) if instrumented else connection.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             return cursor
+
+        start = time.perf_counter_ns()
+        try:
+            cursor = self._with_retry(run, retry)
         except sqlite3.Error as e:
             logger.error(f"Query execution error: {e}")
+            self._release_failed_statement(connection, retry)
+            raise
+        if instrumented or tracer.enabled:
+            end = time.perf_counter_ns()
+            if instrumented:
+                query_stats.record(query, params, (end - start) / 1e9, connection, cursor)
+            tracer.complete("SQL", "db", start, end, {"sql": query[:300]})
+        return cursor
+
+    def _commit(self):
+        """Фиксирует изменения, если не открыта внешняя транзакция"""
+        if self._transaction_depth == 0:
+            # COMMIT, не получивший блокировку, оставляет транзакцию открытой - его можно повторить
+            self._with_retry(self.connection.commit)
+
+    @contextmanager
+    def transaction(self):
+        """Выполняет несколько операций в одной транзакции"""
+        self._transaction_depth += 1
+        try:
+            yield self.connection
+        except Exception:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.connection.rollback()
             raise
+        else:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._with_retry(self.connection.commit)
 
     def create_table(self, table_name: str, columns: Dict[str, str]):
         """
@@ -54,7 +187,110 @@ class Database:
         columns_def = ", ".join([f"{name} {type}" for name, type in columns.items()])
         query = f"CREATE TABLE IF NOT EXISTS {table_name} ({columns_def})"
         self.execute_query(query)
-        self.connection.commit()
+        self._commit()
+
+    def create_index(self, table_name: str, columns: List[str], unique: bool = False):
+        """Создает индекс по колонкам таблицы, если его еще нет"""
+        index_name = f"idx_{table_name}_{'_'.join(columns)}"
+        unique_sql = "UNIQUE " if unique else ""
+        query = (f"CREATE {unique_sql}INDEX IF NOT EXISTS {index_name} "
+                 f"ON {table_name} ({', '.join(columns)})")
+        self.execute_query(query)
+        self._commit()
+
+    def _create_service_tables(self):
+        """Служебные таблицы (версии данных, журнал изменений)"""
+        self.execute_query(
+            "CREATE TABLE IF NOT EXISTS data_versions ("
+            "table_name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID")
+        # Журнал изменений (CDC): одна строка на измененную запись, seq - курсор читателей
+        self.execute_query(
+            "CREATE TABLE IF NOT EXISTS changelog ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, "
+            "row_id INTEGER NOT NULL, op TEXT NOT NULL, version INTEGER NOT NULL, "
+            "ts TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')))")
+        self.execute_query(
+            "CREATE TABLE IF NOT EXISTS changelog_meta ("
+            "key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        self._commit()
+
+    # Операция триггера -> (код в журнале, строка NEW/OLD)
+    CHANGE_OPERATIONS = {
+        "INSERT": ("I", "NEW"),
+        "UPDATE": ("U", "NEW"),
+        "DELETE": ("D", "OLD")
+    }
+
+    def track_changes(self, table_name: str):
+        """
+        Создает триггеры, которые при любом изменении таблицы увеличивают версию
+        ее данных и добавляют запись в журнал изменений (changelog).
+        Версию и журнал видят все соединения и процессы, работающие с файлом БД
+        """
+        self.execute_query(
+            "INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table_name,))
+        for operation, (op, row) in self.CHANGE_OPERATIONS.items():
+            # Прежние триггеры только версии заменяются триггерами с журналом
+            self.execute_query(f"DROP TRIGGER IF EXISTS trg_{table_name}_version_{operation.lower()}")
+            self.execute_query(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_changes_{operation.lower()} "
+                f"AFTER {operation} ON {table_name} BEGIN "
+                f"UPDATE data_versions SET version = version + 1 WHERE table_name = '{table_name}'; "
+                f"INSERT INTO changelog (table_name, row_id, op, version) VALUES ('{table_name}', "
+                f"{row}.rowid, '{op}', "
+                f"(SELECT version FROM data_versions WHERE table_name = '{table_name}')); "
+                f"END")
+        self._commit()
+
+    def add_missing_columns(self, table_name: str, columns: Dict[str, str]):
+        """Добавляет в существующую таблицу колонки, которых в ней еще нет (ALTER TABLE)"""
+        existing = set(self.table_columns(table_name))
+        for name, type in columns.items():
+            if name not in existing:
+                self.execute_query(f"ALTER TABLE {table_name} ADD COLUMN {name} {type}")
+                logger.info(f"Added column {table_name}.{name}")
+        self._commit()
+
+    def enable_row_versions(self, table_name: str):
+        """
+        Включает версии строк таблицы: колонка row_version увеличивается при
+        каждом update_many, поэтому изменение записи другим пользователем
+        обнаруживается по несовпадению версии (update_versioned)
+        """
+        self.add_missing_columns(table_name, {ROW_VERSION_COLUMN: "INTEGER NOT NULL DEFAULT 0"})
+        self.versioned_tables.add(table_name)
+
+    def update_versioned(self, table_name: str, data: Dict[str, Any],
+                         row_id: int, expected_version: int) -> bool:
+        """
+        Обновляет запись, только если ее версия не изменилась с момента чтения.
+        False - запись изменена или удалена другим соединением
+        """
+        return self.update_many(table_name, data, f"id = ? AND {ROW_VERSION_COLUMN} = ?",
+                                (row_id, expected_version)) > 0
+
+    def row_version(self, table_name: str, row_id: int) -> Optional[int]:
+        """Текущая версия записи (None - записи нет)"""
+        row = self.execute_query(
+            f"SELECT {ROW_VERSION_COLUMN} FROM {table_name} WHERE id = ?", (row_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def mark_changed(self, table_name: str):
+        """Отмечает изменение данных таблицы"""
+        self.table_versions[table_name] = self.table_versions.get(table_name, 0) + 1
+
+    def table_version(self, table_name: str) -> int:
+        """
+        Возвращает версию данных таблицы: счетчик из data_versions (ведут триггеры)
+        плюс локальный счетчик mark_changed. Значение меняется при любом изменении
+        """
+        version = self.table_versions.get(table_name, 0)
+        if self.connection is not None:
+            row = self.execute_query(
+                "SELECT version FROM data_versions WHERE table_name = ?", (table_name,)).fetchone()
+            if row is not None:
+                version += row[0]
+        return version
 
     def insert(self, table_name: str, data: Dict[str, Any]) -> int:
         """Вставляет запись в таблицу"""
@@ -63,45 +299,129 @@ class Database:
         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
 
         cursor = self.execute_query(query, tuple(data.values()))
-        self.connection.commit()
+        self._commit()
+        self.mark_changed(table_name)
         return cursor.lastrowid
 
+    def insert_many(self, table_name: str, columns: List[str],
+                    rows: List[tuple]) -> int:
+        """Вставляет записи одним executemany, возвращает число вставленных строк"""
+        placeholders = ", ".join(["?"] * len(columns))
+        query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+        connection = self.connection
+        retry = self._can_retry_statement(connection)
+        start = time.perf_counter()
+        try:
+            cursor = self._with_retry(lambda: connection.executemany(query, rows), retry)
+        except sqlite3.Error as e:
+            logger.error(f"Query execution error: {e}")
+            self._release_failed_statement(connection, retry)
+            raise
+        if query_stats.enabled:
+            query_stats.record(query, None, time.perf_counter() - start, connection,
+                               rows=cursor.rowcount)
+        self._commit()
+        self.mark_changed(table_name)
+        return cursor.rowcount
+
+    def table_columns(self, table_name: str) -> List[str]:
+        """Имена колонок таблицы"""
+        cursor = self.execute_query(f"PRAGMA table_info({table_name})")
+        return [row[1] for row in cursor.fetchall()]
+
     def select(self, table_name: str,
                columns: List[str] = None,
                where: str = None,
-               params: tuple = None) -> List[Dict]:
+               params: tuple = None,
+               order_by: str = None,
+               limit: int = None,
+               offset: int = None) -> List[Dict]:
         """Выбирает записи из таблицы"""
         cols = "*" if not columns else ", ".join(columns)
         query = f"SELECT {cols} FROM {table_name}"
 
         if where:
             query += f" WHERE {where}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+            if offset:
+                query += f" OFFSET {int(offset)}"
 
         cursor = self.execute_query(query, params)
         return [dict(row) for row in cursor.fetchall()]
 
+    def count(self, table_name: str, where: str = None, params: tuple = None) -> int:
+        """Считает записи в таблице"""
+        query = f"SELECT COUNT(*) FROM {table_name}"
+        if where:
+            query += f" WHERE {where}"
+        return self.execute_query(query, params).fetchone()[0]
+
+    def group_count(self, table_name: str, column: str,
+                    where: str = None, params: tuple = None,
+                    limit: int = None) -> List[Tuple[Any, int]]:
+        """Считает записи по значениям колонки (GROUP BY), по убыванию количества"""
+        query = f"SELECT {column}, COUNT(*) AS cnt FROM {table_name}"
+        if where:
+            query += f" WHERE {where}"
+        query += f" GROUP BY {column} ORDER BY cnt DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        cursor = self.execute_query(query, params)
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
     def update(self, table_name: str, data: Dict[str, Any],
                where: str, where_params: tuple) -> bool:
         """Обновляет записи в таблице"""
-        set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
+        return self.update_many(table_name, data, where, where_params) > 0
+
+    def update_many(self, table_name: str, data: Dict[str, Any],
+                    where: str, where_params: tuple) -> int:
+        """Обновляет записи одним запросом, возвращает число измененных строк"""
+        # Версию строки ведет только база, значение из данных не записывается
+        data = {key: value for key, value in data.items() if key != ROW_VERSION_COLUMN}
+        assignments = [f"{key} = ?" for key in data.keys()]
+        if table_name in self.versioned_tables:
+            assignments.append(f"{ROW_VERSION_COLUMN} = {ROW_VERSION_COLUMN} + 1")
+        set_clause = ", ".join(assignments)
         query = f"UPDATE {table_name} SET {set_clause} WHERE {where}"
-        params = tuple(data.values()) + where_params
+        params = tuple(data.values()) + tuple(where_params or ())
 
         cursor = self.execute_query(query, params)
-        self.connection.commit()
-        return cursor.rowcount > 0
+        self._commit()
+        self.mark_changed(table_name)
+        return cursor.rowcount
 
     def delete(self, table_name: str, where: str, params: tuple) -> bool:
         """Удаляет записи из таблицы"""
+        return self.delete_many(table_name, where, params) > 0
+
+    def delete_many(self, table_name: str, where: str, params: tuple) -> int:
+        """Удаляет записи одним запросом, возвращает число удаленных строк"""
         query = f"DELETE FROM {table_name} WHERE {where}"
         cursor = self.execute_query(query, params)
-        self.connection.commit()
-        return cursor.rowcount > 0
+        self._commit()
+        self.mark_changed(table_name)
+        return cursor.rowcount
+
+    @staticmethod
+    def ids_condition(ids, column: str = "id") -> Tuple[str, tuple]:
+        """Условие "column IN (ids)" с одним параметром (без лимита на число переменных)"""
+        return (f"{column} IN (SELECT value FROM json_each(?))",
+                (json.dumps([int(i) for i in ids]),))
 
     def close(self):
-        """Закрывает соединение с БД"""
-        if self.connection:
-            self.connection.close()
+        """Закрывает соединения с БД всех потоков"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        self._connected = False
+        self._local = threading.local()
+        for connection in connections:
+            connection.close()
+        if connections:
             logger.info("Database connection closed")
 
 
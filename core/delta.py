@@ -0,0 +1,95 @@
+"""
+Выгрузка изменений с прошлой выгрузки (дельта) по журналу изменений
+
+Для каждой цели выгрузки (например, "nightly") в export_watermarks хранится
+курсор журнала, до которого данные уже выгружены. Дельта содержит только
+строки, вставленные, измененные или удаленные после курсора: первая колонка
+_op - 'upsert' (текущее состояние строки) или 'delete' (tombstone: только id).
+Первая выгрузка цели и выгрузка после сжатия журнала (reset) - полные.
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from .database import db_manager
+from .changelog import changes_since, current_cursor
+from .reports import RowSource
+
+logger = logging.getLogger(__name__)
+
+
+class DeltaExport:
+    """
+    Дельта-выгрузка таблицы для цели target
+
+    source() фиксирует верхнюю границу журнала и возвращает строки дельты;
+    commit() после успешной записи файла сдвигает курсор цели на эту границу.
+    Изменения, пришедшие во время выгрузки, попадут в следующую дельту
+    """
+
+    def __init__(self, target: str, table: str = "clients"):
+        self.target = target
+        self.table = table
+        self.is_full = False
+        self._upper: Optional[int] = None
+        self._ensure_table()
+
+    @staticmethod
+    def _ensure_table():
+        db_manager.execute_query(
+            "CREATE TABLE IF NOT EXISTS export_watermarks ("
+            "target TEXT NOT NULL, table_name TEXT NOT NULL, cursor INTEGER NOT NULL, "
+            "exported_at TEXT, PRIMARY KEY (target, table_name)) WITHOUT ROWID")
+        db_manager._commit()
+
+    @property
+    def cursor(self) -> Optional[int]:
+        """Курсор прошлой выгрузки (None - цель еще не выгружалась)"""
+        row = db_manager.execute_query(
+            "SELECT cursor FROM export_watermarks WHERE target = ? AND table_name = ?",
+            (self.target, self.table)).fetchone()
+        return row[0] if row is not None else None
+
+    def source(self, chunk_size: int = 1000) -> RowSource:
+        """Строки дельты: колонка _op и колонки таблицы"""
+        columns = db_manager.table_columns(self.table)
+        cursor = self.cursor
+        self._upper = current_cursor()
+        self.is_full = cursor is None or changes_since(cursor, [self.table], limit=1)['reset']
+
+        if self.is_full:
+            select = ", ".join(f"t.{column}" for column in columns)
+            sql = f"SELECT 'upsert' AS _op, {select} FROM {self.table} t ORDER BY t.rowid"
+            params = ()
+        else:
+            # Последняя запись журнала по каждой строке; удаленной строки в таблице нет
+            select = ", ".join("changed.row_id" if column == "id" else f"t.{column}"
+                               for column in columns)
+            sql = (f"WITH changed AS (SELECT row_id, MAX(seq) AS seq FROM changelog "
+                   f"WHERE table_name = ? AND seq > ? AND seq <= ? GROUP BY row_id) "
+                   f"SELECT CASE WHEN t.rowid IS NULL THEN 'delete' ELSE 'upsert' END AS _op, "
+                   f"{select} FROM changed LEFT JOIN {self.table} t ON t.rowid = changed.row_id "
+                   f"ORDER BY changed.seq")
+            params = (self.table, cursor, self._upper)
+
+        logger.info(f"Delta export '{self.target}' of {self.table}: "
+                    f"{'full' if self.is_full else f'since {cursor}'} up to {self._upper}")
+        return RowSource(sql, params, ["_op"] + columns, chunk_size=chunk_size)
+
+    def commit(self):
+        """Сохраняет курсор выгрузки (вызывать после успешной записи файла)"""
+        if self._upper is None:
+            raise RuntimeError("commit() вызван до source()")
+        db_manager.execute_query(
+            "INSERT INTO export_watermarks (target, table_name, cursor, exported_at) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (target, table_name) DO UPDATE SET "
+            "cursor = excluded.cursor, exported_at = excluded.exported_at",
+            (self.target, self.table, self._upper, datetime.now().isoformat()))
+        db_manager._commit()
+
+    def reset(self):
+        """Сбрасывает курсор: следующая выгрузка будет полной"""
+        db_manager.execute_query(
+            "DELETE FROM export_watermarks WHERE target = ? AND table_name = ?",
+            (self.target, self.table))
+        db_manager._commit()
\ No newline at end of file
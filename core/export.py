@@ -0,0 +1,289 @@
+"""
+Потоковый экспорт данных: CSV, JSON Lines, JSON (с опциональным gzip) и Excel
+
+Источник - любой объект с атрибутом columns и методом chunks()
+(например, core.reports.RowSource). Строки читаются из курсора порциями,
+поэтому расход памяти не зависит от числа строк.
+"""
+import csv
+import gzip
+import json
+import os
+import shutil
+import time
+import logging
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.lazy_imports import openpyxl
+from .cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Excel: строк на листе (вместе с заголовком), длина имени листа
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_SHEET_TITLE = 31
+EXCEL_MAX_COLUMN_WIDTH = 50
+
+
+class ExportResult:
+    """Итог экспорта: число строк, время и скорость"""
+
+    def __init__(self, path: str, rows: int, seconds: float):
+        self.path = path
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def __str__(self):
+        return f"{self.rows} строк за {self.seconds:.2f} с ({self.rows_per_second:.0f} строк/с)"
+
+
+def open_output(path: str, gzip_output: Optional[bool] = None, encoding: str = 'utf-8'):
+    """Открывает файл для записи текста; gzip_output=None - по расширению .gz"""
+    if gzip_output is None:
+        gzip_output = str(path).lower().endswith('.gz')
+    if gzip_output:
+        return gzip.open(path, 'wt', encoding=encoding, newline='')
+    return open(path, 'w', encoding=encoding, newline='')
+
+
+def _tracked_chunks(source, progress: Optional[Callable[[int], None]] = None):
+    """
+    Порции строк источника; после записи каждой порции вызывается progress(строк записано).
+    Исключение из progress (например, отмена задания) прерывает экспорт
+    """
+    done = 0
+    for chunk in source.chunks():
+        yield chunk
+        done += len(chunk)
+        if progress is not None:
+            progress(done)
+
+
+def _run_export(path: str, write_rows: Callable[[], int], fmt: str) -> ExportResult:
+    """Замеряет экспорт и пишет скорость в лог"""
+    start = time.perf_counter()
+    rows = write_rows()
+    result = ExportResult(path, rows, time.perf_counter() - start)
+    logger.info(f"Exported {fmt}: {path}, {result}")
+    return result
+
+
+def export_csv(source, path: str, gzip_output: Optional[bool] = None,
+               encoding: str = 'utf-8-sig',
+               progress: Optional[Callable[[int], None]] = None) -> ExportResult:
+    """Экспорт в CSV (по умолчанию с BOM, чтобы Excel открыл кириллицу)"""
+    def write_rows() -> int:
+        exported = 0
+        with open_output(path, gzip_output, encoding) as f:
+            writer = csv.writer(f)
+            writer.writerow(source.columns)
+            for chunk in _tracked_chunks(source, progress):
+                writer.writerows(chunk)
+                exported += len(chunk)
+        return exported
+
+    return _run_export(path, write_rows, "csv")
+
+
+def export_jsonl(source, path: str, gzip_output: Optional[bool] = None,
+                 progress: Optional[Callable[[int], None]] = None) -> ExportResult:
+    """Экспорт в JSON Lines: одна запись - одна строка"""
+    columns = list(source.columns)
+
+    def write_rows() -> int:
+        exported = 0
+        with open_output(path, gzip_output) as f:
+            for chunk in _tracked_chunks(source, progress):
+                f.write("".join(
+                    json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+                    for row in chunk))
+                exported += len(chunk)
+        return exported
+
+    return _run_export(path, write_rows, "jsonl")
+
+
+def export_json(source, path: str, gzip_output: Optional[bool] = None,
+                progress: Optional[Callable[[int], None]] = None) -> ExportResult:
+    """Экспорт в JSON-массив записей (пишется потоково, без сборки списка)"""
+    columns = list(source.columns)
+
+    def write_rows() -> int:
+        exported = 0
+        with open_output(path, gzip_output) as f:
+            f.write("[")
+            for chunk in _tracked_chunks(source, progress):
+                for row in chunk:
+                    record = json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                                        indent=2, default=str)
+                    f.write(("," if exported else "") + "\n  " + record.replace("\n", "\n  "))
+                    exported += 1
+            f.write("\n]\n" if exported else "]\n")
+        return exported
+
+    return _run_export(path, write_rows, "json")
+
+
+class ColumnWidths:
+    """Максимальная длина значений по колонкам (для ширины колонок Excel)"""
+
+    def __init__(self, header: Sequence = ()):
+        self.lengths: List[int] = [len(str(title)) for title in header]
+
+    def update(self, rows: Sequence[Sequence]):
+        """Учитывает порцию строк"""
+        if not rows:
+            return
+        if len({len(row) for row in rows}) == 1:
+            columns = enumerate(zip(*rows))
+        else:
+            columns = self._columns_of_ragged(rows)
+
+        lengths = self.lengths
+        for i, values in columns:
+            longest = max((len(str(value)) for value in values if value is not None), default=0)
+            if i >= len(lengths):
+                lengths.extend([0] * (i + 1 - len(lengths)))
+            if longest > lengths[i]:
+                lengths[i] = longest
+
+    @staticmethod
+    def _columns_of_ragged(rows: Sequence[Sequence]):
+        """Колонки строк разной длины (листы статистики)"""
+        width = max((len(row) for row in rows), default=0)
+        for i in range(width):
+            yield i, [row[i] for row in rows if i < len(row)]
+
+    def apply(self, worksheet):
+        """Задает ширину колонок листа (в write-only режиме - до первой строки)"""
+        from openpyxl.utils import get_column_letter
+
+        for i, length in enumerate(self.lengths, 1):
+            worksheet.column_dimensions[get_column_letter(i)].width = \
+                min(length + 2, EXCEL_MAX_COLUMN_WIDTH)
+
+
+def _sheet_title(title: str, index: int) -> str:
+    """Имя листа с номером части (Excel ограничивает длину 31 символом)"""
+    if index <= 1:
+        return title[:EXCEL_MAX_SHEET_TITLE]
+    suffix = f" ({index})"
+    return title[:EXCEL_MAX_SHEET_TITLE - len(suffix)] + suffix
+
+
+def export_xlsx(source, path: str, sheet_title: str = "Отчет",
+                extra_sheets: Iterable[Tuple[str, List[Sequence]]] = (),
+                max_rows_per_sheet: int = EXCEL_MAX_ROWS,
+                progress: Optional[Callable[[int], None]] = None) -> ExportResult:
+    """
+    Экспорт в Excel в write-only режиме openpyxl: строки пишутся сразу в файл
+
+    В write-only режиме ширина колонок записывается вместе с первой строкой листа,
+    поэтому ширина считается по первой порции строк; для следующих листов
+    (при превышении лимита строк Excel) - по максимуму всех прочитанных строк.
+
+    Args:
+        extra_sheets: Небольшие листы [(название, строки)], например статистика
+        max_rows_per_sheet: Строк на листе вместе с заголовком
+        progress: Вызывается после каждой порции с числом записанных строк
+    """
+    columns = list(source.columns)
+
+    def write_rows() -> int:
+        workbook = openpyxl.Workbook(write_only=True)
+        widths = ColumnWidths(columns)
+        rows_per_sheet = max(1, max_rows_per_sheet - 1)
+
+        exported = 0
+        sheet = None
+        try:
+            chunks = _tracked_chunks(source, progress)
+            first_chunk = next(chunks, [])
+            widths.update(first_chunk)
+
+            sheet_index = 0
+            sheet_rows = 0
+            for chunk in chain([first_chunk], chunks):
+                if exported:
+                    widths.update(chunk)
+                for row in chunk:
+                    if sheet is None or sheet_rows >= rows_per_sheet:
+                        sheet_index += 1
+                        sheet = workbook.create_sheet(_sheet_title(sheet_title, sheet_index))
+                        widths.apply(sheet)
+                        sheet.append(columns)
+                        sheet_rows = 0
+                    sheet.append(row)
+                    sheet_rows += 1
+                exported += len(chunk)
+        except BaseException:
+            # Экспорт прерван (отмена или ошибка): закрываем потоки листов,
+            # иначе openpyxl оставит их незавершенными до выхода из программы
+            for worksheet in workbook.worksheets:
+                try:
+                    worksheet.close()
+                except Exception:
+                    pass
+            raise
+
+        if sheet is None:
+            # Пустой отчет - только заголовок
+            sheet = workbook.create_sheet(_sheet_title(sheet_title, 1))
+            widths.apply(sheet)
+            sheet.append(columns)
+
+        for title, rows in extra_sheets:
+            extra = workbook.create_sheet(_sheet_title(title, 1))
+            extra_widths = ColumnWidths()
+            extra_widths.update(rows)
+            extra_widths.apply(extra)
+            for row in rows:
+                extra.append(row)
+
+        workbook.save(path)
+        return exported
+
+    return _run_export(path, write_rows, "xlsx")
+
+
+def cached_export(exporter: Callable[..., ExportResult], source, path: str,
+                  **kwargs) -> ExportResult:
+    """
+    Экспорт с кэшем: если те же данные (запрос + версия данных) уже выгружались
+    с теми же параметрами и файл не менялся, он копируется вместо повторной выгрузки
+    """
+    if not getattr(source, 'is_cacheable', False):
+        return exporter(source, path, **kwargs)
+
+    options = tuple(sorted((name, repr(value)) for name, value in kwargs.items()
+                           if name != 'progress'))
+    key = ("export", getattr(exporter, '__qualname__', repr(exporter)), options) + source.cache_key()
+
+    cached = report_cache.get(key)
+    if cached is not None:
+        cached_path, mtime, size, rows = cached
+        if cached_path != path and os.path.exists(cached_path) and \
+                os.path.getmtime(cached_path) == mtime and os.path.getsize(cached_path) == size:
+            start = time.perf_counter()
+            shutil.copyfile(cached_path, path)
+            result = ExportResult(path, rows, time.perf_counter() - start)
+            logger.info(f"Export served from cache: {cached_path} -> {path}")
+            return result
+
+    result = exporter(source, path, **kwargs)
+    report_cache.set(key, (path, os.path.getmtime(path), os.path.getsize(path), result.rows))
+    return result
+
+
+# Экспортеры по формату
+EXPORTERS: Dict[str, Callable[..., ExportResult]] = {
+    'csv': export_csv,
+    'jsonl': export_jsonl,
+    'json': export_json,
+    'excel': export_xlsx
+}
\ No newline at end of file
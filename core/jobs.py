@@ -0,0 +1,186 @@
+"""
+Фоновые задания (генерация отчетов) с прогрессом и отменой
+"""
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from .config import Config
+from .export import cached_export
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Задание отменено пользователем"""
+    pass
+
+
+class Job:
+    """
+    Фоновое задание
+
+    Функция run(job) выполняется в рабочем потоке; она сообщает прогресс через
+    job.report_progress() и между порциями данных проверяет отмену
+    (report_progress сам выбрасывает JobCancelled). Интерфейс читает состояние
+    задания по таймеру - виджеты из рабочего потока не трогаются.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, title: str, run: Callable[['Job'], Any], kind: str = "report"):
+        self.title = title
+        self.kind = kind
+        self._run = run
+        self.state = Job.QUEUED
+        self.total: Optional[int] = None  # Оценка числа строк (COUNT)
+        self.processed = 0
+        self.result = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.state in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def progress(self) -> float:
+        """Доля выполнения 0..1 (0, если общий объем неизвестен)"""
+        if self.state == Job.DONE:
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(1.0, self.processed / self.total)
+
+    def cancel(self):
+        """Запрашивает отмену (сработает на следующей проверке)"""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report_progress(self, processed: int):
+        """Обновляет прогресс и прерывает задание, если запрошена отмена"""
+        self.processed = processed
+        self.check_cancelled()
+
+    def execute(self):
+        """Выполняет задание (вызывается рабочим потоком очереди)"""
+        if self.is_cancelled:
+            self.state = Job.CANCELLED
+            return
+        self.state = Job.RUNNING
+        self.started_at = time.perf_counter()
+        with tracer.span(self.title, f"job:{self.kind}") as span:
+            try:
+                self.result = self._run(self)
+                self.state = Job.DONE
+            except JobCancelled:
+                self.state = Job.CANCELLED
+                logger.info(f"Job cancelled: {self.title}")
+            except Exception as e:
+                self.error = str(e)
+                self.state = Job.FAILED
+                logger.error(f"Job failed: {self.title}: {e}")
+            finally:
+                self.finished_at = time.perf_counter()
+                span.set("state", self.state)
+                span.set("rows", self.processed)
+
+
+class JobQueue:
+    """
+    Очередь заданий с одним рабочим потоком (задания выполняются по порядку)
+    и небольшим постоянным пулом для коротких заданий
+    """
+
+    def __init__(self):
+        self.jobs: List[Job] = []
+        self._queue = queue.Queue()
+        self._worker = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, job: Job) -> Job:
+        """Ставит задание в очередь"""
+        with self._lock:
+            self.jobs.append(job)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, name="jobs", daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+        return job
+
+    def run_now(self, job: Job) -> Job:
+        """
+        Выполняет короткое задание в пуле, минуя очередь. Потоки пула постоянные:
+        у каждого потока свое соединение с БД, поэтому число соединений ограничено
+        """
+        with self._lock:
+            self.jobs.append(job)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=Config.JOB_POOL_WORKERS,
+                                                thread_name_prefix="job-pool")
+            self._pool.submit(job.execute)
+        return job
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.execute()
+
+    def active_jobs(self) -> List[Job]:
+        """Задания в очереди и выполняющиеся"""
+        return [job for job in self.jobs if not job.is_finished]
+
+    def clear_finished(self):
+        """Удаляет завершенные задания из списка"""
+        with self._lock:
+            self.jobs = [job for job in self.jobs if not job.is_finished]
+
+
+def export_job(title: str, exporter: Callable, source, path: str,
+               on_done: Optional[Callable[[], None]] = None,
+               empty_message: str = "Нет данных для генерации отчета",
+               allow_empty: bool = False, **kwargs) -> Job:
+    """
+    Задание экспорта: COUNT для оценки объема, потоковая запись в файл.
+    При отмене или ошибке недописанный файл удаляется.
+    on_done вызывается в рабочем потоке после успешной записи файла.
+    allow_empty - без строк пишется файл с одними заголовками (иначе ошибка empty_message)
+    """
+    def run(job: Job):
+        job.total = source.count()
+        if not job.total and not allow_empty:
+            raise ValueError(empty_message)
+        try:
+            result = cached_export(exporter, source, path, progress=job.report_progress, **kwargs)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        if on_done is not None:
+            on_done()
+        return result
+
+    return Job(title, run, kind="export")
+
+
+# Глобальная очередь заданий
+job_queue = JobQueue()
\ No newline at end of file
@@ -4,18 +4,47 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from .database import db_manager
+import logging
+from .config import Config
+from .database import db_manager, ROW_VERSION_COLUMN
+from .aggregates import initialize_client_aggregates
+from utils.validators import Validators
+from utils.dependencies import dependency_manager, setup_client_dependencies
+
+logger = logging.getLogger(__name__)
+
+
+class ConflictError(Exception):
+    """Запись изменена или удалена другим пользователем после чтения"""
+
+    def __init__(self, table: str, record_id: int, expected_version: int,
+                 current_version: Optional[int]):
+        self.table = table
+        self.record_id = record_id
+        self.expected_version = expected_version
+        # None - запись удалена
+        self.current_version = current_version
+        if current_version is None:
+            message = f"Запись {record_id} удалена другим пользователем"
+        else:
+            message = (f"Запись {record_id} изменена другим пользователем "
+                       f"(версия {current_version}, ожидалась {expected_version})")
+        super().__init__(message)
 
 
 class BaseModel(ABC):
     """Абстрактная базовая модель"""
 
     TABLE_NAME = ""
+    # Таблица ведет версии строк: save() обнаруживает чужие изменения (ConflictError)
+    ROW_VERSIONED = False
 
     def __init__(self, **kwargs):
         self.id = kwargs.get('id')
         self.created_at = kwargs.get('created_at', datetime.now().isoformat())
         self.updated_at = kwargs.get('updated_at', datetime.now().isoformat())
+        # Версия строки на момент чтения из БД
+        self.row_version = kwargs.get(ROW_VERSION_COLUMN)
 
     @abstractmethod
     def to_dict(self) -> Dict[str, Any]:
@@ -29,18 +58,29 @@ class BaseModel(ABC):
         pass
 
     def save(self) -> int:
-        """Сохраняет объект в БД"""
+        """
+        Сохраняет объект в БД. Для таблиц с версиями строк обновление
+        проходит, только если запись не менялась с момента чтения,
+        иначе ConflictError (чужие изменения не перезаписываются)
+        """
         data = self.to_dict()
         data['updated_at'] = datetime.now().isoformat()
 
         if self.id:
             # Обновление существующей записи
-            db_manager.update(self.TABLE_NAME, data, "id = ?", (self.id,))
+            if self.ROW_VERSIONED and self.row_version is not None:
+                if not db_manager.update_versioned(self.TABLE_NAME, data, self.id, self.row_version):
+                    raise ConflictError(self.TABLE_NAME, self.id, self.row_version,
+                                        db_manager.row_version(self.TABLE_NAME, self.id))
+                self.row_version += 1
+            else:
+                db_manager.update(self.TABLE_NAME, data, "id = ?", (self.id,))
             return self.id
         else:
             # Вставка новой записи
             data['created_at'] = datetime.now().isoformat()
             self.id = db_manager.insert(self.TABLE_NAME, data)
+            self.row_version = 0 if self.ROW_VERSIONED else None
             return self.id
 
     @classmethod
@@ -52,17 +92,169 @@ class BaseModel(ABC):
         return None
 
     @classmethod
-    def get_all(cls, where: str = None, params: tuple = None) -> List['BaseModel']:
+    def get_all(cls, where: str = None, params: tuple = None,
+                order_by: str = None, limit: int = None,
+                offset: int = None) -> List['BaseModel']:
         """Получает все объекты"""
-        results = db_manager.select(cls.TABLE_NAME, where=where, params=params)
+        results = db_manager.select(cls.TABLE_NAME, where=where, params=params,
+                                    order_by=order_by, limit=limit, offset=offset)
         return [cls.from_dict(row) for row in results]
 
+    @classmethod
+    def count(cls, where: str = None, params: tuple = None) -> int:
+        """Считает объекты"""
+        return db_manager.count(cls.TABLE_NAME, where=where, params=params)
+
+    @classmethod
+    def count_by(cls, column: str, where: str = None, params: tuple = None,
+                 limit: int = None) -> List[tuple]:
+        """Считает объекты по значениям колонки"""
+        return db_manager.group_count(cls.TABLE_NAME, column, where=where,
+                                      params=params, limit=limit)
+
     def delete(self) -> bool:
         """Удаляет объект из БД"""
         if self.id:
             return db_manager.delete(self.TABLE_NAME, "id = ?", (self.id,))
         return False
 
+    @classmethod
+    def update_where(cls, data: Dict[str, Any], where: str, params: tuple = None) -> int:
+        """Массово обновляет записи одним UPDATE, возвращает число измененных"""
+        data = dict(data)
+        data['updated_at'] = datetime.now().isoformat()
+        return db_manager.update_many(cls.TABLE_NAME, data, where, params)
+
+    @classmethod
+    def delete_where(cls, where: str, params: tuple = None) -> int:
+        """Массово удаляет записи одним DELETE, возвращает число удаленных"""
+        return db_manager.delete_many(cls.TABLE_NAME, where, params)
+
+
+class Client(BaseModel):
+    """Модель клиента"""
+
+    TABLE_NAME = "clients"
+    ROW_VERSIONED = True
+
+    SCHEMA = {
+        'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+        'created_at': 'TEXT',
+        'updated_at': 'TEXT',
+        'name': 'TEXT NOT NULL',
+        'email': 'TEXT',
+        'phone': 'TEXT',
+        'company': 'TEXT',
+        'status': 'TEXT DEFAULT "активный"',
+        'notes': 'TEXT',
+        ROW_VERSION_COLUMN: 'INTEGER NOT NULL DEFAULT 0'
+    }
+
+    # Индексы для сортировки, фасетов и фильтров по дате
+    INDEXED_COLUMNS = ['name', 'company', 'status', 'created_at']
+
+    # Проверки записей (как в форме клиента): поле -> тип маски, обязательные поля
+    FIELD_TYPES = {'name': 'name', 'email': 'email', 'phone': 'phone', 'company': 'company'}
+    REQUIRED_FIELDS = ('name', 'phone', 'status')
+
+    # Варианты поля "Статус" и статус по умолчанию
+    STATUS_OPTIONS = ('активный', 'неактивный', 'потенциальный')
+    DEFAULT_STATUS = 'активный'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.name = kwargs.get('name', '')
+        self.email = kwargs.get('email', '')
+        self.phone = kwargs.get('phone', '')
+        self.company = kwargs.get('company', '')
+        self.status = kwargs.get('status', 'активный')  # active, inactive, lead
+        self.notes = kwargs.get('notes', '')
+
+        # Динамические пользовательские поля
+        for key, value in kwargs.items():
+            if key not in ['id', 'name', 'email', 'phone', 'company',
+                           'status', 'notes', 'created_at', 'updated_at', ROW_VERSION_COLUMN]:
+                setattr(self, key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'name': self.name,
+            'email': self.email,
+            'phone': Validators.format_phone(self.phone) if self.phone else '',
+            'company': self.company,
+            'status': self.status,
+            'notes': self.notes,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+        if self.id:
+            data['id'] = self.id
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Client':
+        return cls(**data)
+
+    @classmethod
+    def default_status(cls) -> str:
+        """Статус по умолчанию из настройки default_status (значение не из списка - 'активный')"""
+        status = Config.get_setting('default_status', cls.DEFAULT_STATUS)
+        if status not in cls.STATUS_OPTIONS:
+            logger.warning(f"Setting default_status={status!r} is not a status option, "
+                           f"using {cls.DEFAULT_STATUS!r}")
+            return cls.DEFAULT_STATUS
+        return status
+
+    @classmethod
+    def prepare_record(cls, record: Dict[str, Any], columns: List[str],
+                       default_status: str = DEFAULT_STATUS) -> Dict[str, Any]:
+        """
+        Запись клиента из внешнего источника (импорт, API) в формате таблицы:
+        значения по умолчанию, формат телефона, только существующие колонки
+        """
+        if default_status not in cls.STATUS_OPTIONS:
+            default_status = cls.DEFAULT_STATUS
+        record = {key: ("" if value is None else value) for key, value in record.items()
+                  if key not in ('id', ROW_VERSION_COLUMN)}
+        # Пустые даты заполняются текущим временем
+        for key in ('created_at', 'updated_at'):
+            if not record.get(key):
+                record.pop(key, None)
+        if not record.get('status'):
+            record['status'] = default_status
+        data = {key: value for key, value in record.items() if key in columns}
+        data.update(cls(**record).to_dict())
+        return data
+
+    @classmethod
+    def validate_many(cls, records: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        Пакетная проверка записей: маски полей и зависимости между полями.
+        Для каждой записи - список сообщений об ошибках (пустой - запись валидна)
+        """
+        setup_client_dependencies()
+        field_errors = Validators.validate_many(records, cls.FIELD_TYPES, cls.REQUIRED_FIELDS)
+        rule_errors = dependency_manager.validate_many(records)
+        return [list(errors.values()) + rules for errors, rules in zip(field_errors, rule_errors)]
+
+    @classmethod
+    def initialize_table(cls, extra_columns: Dict[str, str] = None):
+        """Создает таблицу клиентов и индексы"""
+        schema = dict(cls.SCHEMA)
+        schema.update(extra_columns or {})
+        db_manager.create_table(cls.TABLE_NAME, schema)
+        # Таблицы, созданные прежними версиями, дополняются новыми колонками
+        db_manager.add_missing_columns(cls.TABLE_NAME, schema)
+        db_manager.enable_row_versions(cls.TABLE_NAME)
+
+        for column in cls.INDEXED_COLUMNS:
+            db_manager.create_index(cls.TABLE_NAME, [column])
+
+        # Версия данных для инвалидации кэшей отчетов
+        db_manager.track_changes(cls.TABLE_NAME)
+        # Агрегаты по дням и компаниям для отчетов
+        initialize_client_aggregates()
+
 
 class CustomField:
     """Класс для пользовательских полей"""
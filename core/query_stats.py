@@ -0,0 +1,345 @@
+"""
+Статистика SQL-запросов: время по формам запросов, число строк, медленные запросы
+
+Форма запроса - текст SQL, в котором числа, строковые литералы и списки
+значений заменены на "?": запросы, отличающиеся только значениями, считаются
+вместе. Для каждой формы ведутся число выполнений, суммарное и максимальное
+время, число строк и гистограмма времени выполнения. Время выборки строк
+(fetchone/fetchmany/fetchall) добавляется ко времени выполнения запроса.
+
+Запрос дольше порога попадает в журнал медленных запросов вместе с планом
+EXPLAIN QUERY PLAN (план снимается один раз на форму). Полный просмотр
+таблицы в плане отмечается как full_scan. Форма, выполненная много раз подряд
+за короткое окно, отмечается как возможный N+1.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы, мс (последняя - все остальное)
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# План снимается только для запросов, которые его поддерживают
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+# Полный просмотр таблицы: "SCAN clients" (без USING INDEX)
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def normalize_sql(sql: str) -> str:
+    """Форма запроса: литералы и списки значений заменены на ?"""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _WHITESPACE.sub(" ", shape).strip()
+    return _VALUE_LIST.sub("(?, ...)", shape)
+
+
+# Границы корзин в секундах: номер корзины - bisect_left(_HISTOGRAM_BOUNDS_S, время)
+_HISTOGRAM_BOUNDS_S = [bound / 1000 for bound in HISTOGRAM_BOUNDS_MS]
+
+
+class QueryShape:
+    """Накопленная статистика одной формы запроса"""
+
+    def __init__(self, shape: str):
+        self.shape = shape
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.plan: Optional[List[str]] = None
+        self.full_scan: List[str] = []
+        # Пример запроса для плана по требованию (только в памяти, в выгрузку не попадает)
+        self.sample = None
+        # Серии выполнений подряд (признак N+1)
+        self.max_burst = 0
+        self._burst_start = 0.0
+        self._burst_count = 0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Оценка перцентиля по гистограмме (верхняя граница корзины), мс"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return HISTOGRAM_BOUNDS_MS[index] if index < len(HISTOGRAM_BOUNDS_MS) \
+                    else round(self.max * 1000, 3)
+        return round(self.max * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "shape": self.shape,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "rows": self.rows,
+            "avg_rows": round(self.rows / self.count, 1) if self.count else 0,
+            "slow": self.slow,
+            "histogram": dict(zip([f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + ["more"],
+                                  self.histogram)),
+            "plan": self.plan,
+            "full_scan": self.full_scan,
+            "max_burst": self.max_burst,
+            "n_plus_one_suspect": self.max_burst >= Config.QUERY_BURST_THRESHOLD
+        }
+
+
+class QueryExecution:
+    """Одно выполнение запроса: время растет по мере выборки строк"""
+
+    def __init__(self, stats: 'QueryStats', entry: QueryShape, sql: str, params,
+                 connection: sqlite3.Connection):
+        self.stats = stats
+        self.entry = entry
+        self.sql = sql
+        self.params = params
+        self.connection = connection
+        self.elapsed = 0.0
+        self.rows = 0
+        self.bucket = None
+        # Запись в журнале медленных запросов (когда выполнение стало медленным)
+        self.slow_record = None
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, который добавляет время и число выбранных строк к статистике
+    запроса. Строки, прочитанные перебором курсора (for row in cursor), не
+    считаются - перебор не замедляется
+    """
+
+    execution: Optional[QueryExecution] = None
+
+    def _account(self, start: float, rows: int):
+        if self.execution is not None:
+            self.execution.stats.add(self.execution, time.perf_counter() - start, rows)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._account(start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size: int = None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._account(start, len(rows))
+        return rows
+
+
+class QueryStats:
+    """Статистика запросов процесса (все соединения и потоки)"""
+
+    def __init__(self):
+        self.enabled = Config.QUERY_STATS_ENABLED
+        self.slow_query_ms = Config.SLOW_QUERY_MS
+        self.shapes: Dict[str, QueryShape] = {}
+        self.slow_log = deque(maxlen=Config.SLOW_QUERY_LOG_SIZE)
+        self.started_at = datetime.now()
+        self._shape_cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool = None, slow_query_ms: float = None):
+        """Включает/выключает сбор и задает порог медленного запроса"""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if slow_query_ms is not None:
+            self.slow_query_ms = float(slow_query_ms)
+
+    def reset(self):
+        """Сбрасывает накопленную статистику"""
+        with self._lock:
+            self.shapes = {}
+            self.slow_log.clear()
+            self.started_at = datetime.now()
+
+    def _shape(self, sql: str) -> QueryShape:
+        shape = self._shape_cache.get(sql)
+        if shape is None:
+            shape = normalize_sql(sql)
+            if len(self._shape_cache) >= 4096:
+                self._shape_cache.clear()
+            self._shape_cache[sql] = shape
+        entry = self.shapes.get(shape)
+        if entry is None:
+            if len(self.shapes) >= Config.QUERY_SHAPES_MAX:
+                # Слишком много разных форм: остальные учитываются вместе
+                shape = "<другие запросы>"
+                entry = self.shapes.get(shape)
+            if entry is None:
+                entry = self.shapes[shape] = QueryShape(shape)
+        return entry
+
+    def record(self, sql: str, params, elapsed: float, connection: sqlite3.Connection,
+               cursor: sqlite3.Cursor = None, rows: int = None):
+        """
+        Учитывает выполненный запрос. Если передан InstrumentedCursor запроса
+        с результатом, время и строки последующей выборки добавляются к этому
+        же выполнению
+        """
+        if rows is None:
+            rows = cursor.rowcount if cursor is not None and cursor.rowcount > 0 else 0
+        bucket = bisect_left(_HISTOGRAM_BOUNDS_S, elapsed)
+        is_slow = elapsed * 1000 >= self.slow_query_ms
+        now = time.perf_counter()
+        with self._lock:
+            entry = self._shape(sql)
+            entry.count += 1
+            entry.total += elapsed
+            entry.rows += rows
+            if elapsed > entry.max:
+                entry.max = elapsed
+            entry.histogram[bucket] += 1
+            entry.sample = (sql, params)
+            if now - entry._burst_start > Config.QUERY_BURST_WINDOW_MS / 1000:
+                entry._burst_start = now
+                entry._burst_count = 0
+            entry._burst_count += 1
+            if entry._burst_count > entry.max_burst:
+                entry.max_burst = entry._burst_count
+            if is_slow:
+                entry.slow += 1
+
+        execution = None
+        if is_slow or (isinstance(cursor, InstrumentedCursor) and cursor.description is not None):
+            execution = QueryExecution(self, entry, sql, params, connection)
+            execution.elapsed, execution.rows, execution.bucket = elapsed, rows, bucket
+            if isinstance(cursor, InstrumentedCursor):
+                cursor.execution = execution
+        if is_slow:
+            self._log_slow(execution)
+
+    def add(self, execution: QueryExecution, elapsed: float, rows: int):
+        """Добавляет время и строки выборки к выполнению запроса"""
+        entry = execution.entry
+        with self._lock:
+            execution.elapsed += elapsed
+            execution.rows += rows
+            entry.total += elapsed
+            entry.rows += rows
+            if execution.elapsed > entry.max:
+                entry.max = execution.elapsed
+            bucket = bisect_left(_HISTOGRAM_BOUNDS_S, execution.elapsed)
+            if bucket != execution.bucket:
+                entry.histogram[execution.bucket] -= 1
+                entry.histogram[bucket] += 1
+                execution.bucket = bucket
+            is_slow = execution.slow_record is None and \
+                execution.elapsed * 1000 >= self.slow_query_ms
+            if is_slow:
+                entry.slow += 1
+            elif execution.slow_record is not None:
+                # Запись журнала медленных запросов растет вместе с выборкой
+                execution.slow_record["elapsed_ms"] = round(execution.elapsed * 1000, 3)
+                execution.slow_record["rows"] = execution.rows
+        if is_slow:
+            self._log_slow(execution)
+
+    def _log_slow(self, execution: QueryExecution):
+        entry = execution.entry
+        if entry.plan is None:
+            entry.plan = self._explain(execution.connection, execution.sql, execution.params)
+            entry.full_scan = [match.group(1) for match in
+                               (_FULL_SCAN.match(detail.strip()) for detail in entry.plan or [])
+                               if match]
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "elapsed_ms": round(execution.elapsed * 1000, 3),
+            "rows": execution.rows,
+            "shape": entry.shape,
+            "thread": threading.current_thread().name,
+            "plan": entry.plan,
+            "full_scan": entry.full_scan
+        }
+        with self._lock:
+            execution.slow_record = record
+            self.slow_log.append(record)
+        scan = f", full scan: {', '.join(entry.full_scan)}" if entry.full_scan else ""
+        logger.warning(f"Slow query {record['elapsed_ms']:.1f} ms ({execution.rows} rows{scan}): "
+                       f"{entry.shape[:300]}")
+
+    @staticmethod
+    def _explain(connection: sqlite3.Connection, sql: str, params) -> Optional[List[str]]:
+        """План запроса (EXPLAIN QUERY PLAN) с отступами по вложенности"""
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        try:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        except sqlite3.Error as e:
+            logger.debug(f"EXPLAIN QUERY PLAN failed: {e}")
+            return None
+        depth = {0: -1}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append("  " * depth[node_id] + detail)
+        return plan
+
+    def explain(self, shape: str, connection: sqlite3.Connection) -> Optional[List[str]]:
+        """Снимает план формы запроса по сохраненному примеру (для окна диагностики)"""
+        entry = self.shapes.get(shape)
+        if entry is None or entry.sample is None:
+            return None
+        entry.plan = self._explain(connection, *entry.sample)
+        entry.full_scan = [match.group(1) for match in
+                           (_FULL_SCAN.match(detail.strip()) for detail in entry.plan or [])
+                           if match]
+        return entry.plan
+
+    def snapshot(self, sort: str = "total_ms", limit: int = None) -> Dict[str, Any]:
+        """Статистика для окна диагностики и выгрузки в JSON"""
+        with self._lock:
+            shapes = [entry.to_dict() for entry in self.shapes.values()]
+            slow = list(self.slow_log)
+        queries = sum(item["count"] for item in shapes)
+        shapes.sort(key=lambda item: item.get(sort) or 0, reverse=True)
+        if limit is not None:
+            shapes = shapes[:limit]
+        return {
+            "enabled": self.enabled,
+            "since": self.started_at.isoformat(timespec="seconds"),
+            "slow_query_ms": self.slow_query_ms,
+            "queries": queries,
+            "shapes": shapes,
+            "slow_queries": slow
+        }
+
+    def dump(self, path: str) -> str:
+        """Сохраняет статистику в JSON-файл"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+# Глобальная статистика запросов
+query_stats = QueryStats()
@@ -0,0 +1,339 @@
+"""
+Движок отчетов: декларативные описания отчетов, компилируемые в один SQL-запрос
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+import logging
+
+from .database import db_manager
+from .cache import report_cache, data_version
+
+logger = logging.getLogger(__name__)
+
+
+class ReportColumn:
+    """Колонка отчета: заголовок и SQL-выражение"""
+
+    def __init__(self, title: str, expression: str, option: str = None):
+        self.title = title
+        self.expression = expression
+        # Колонка выводится, только если включена опция отчета с этим именем
+        self.option = option
+
+    def is_enabled(self, options: Dict[str, Any]) -> bool:
+        return self.option is None or bool(options.get(self.option))
+
+
+class RowSource:
+    """Потоковый источник строк отчета: курсор читается порциями"""
+
+    def __init__(self, sql: str, params: tuple, columns: List[str], chunk_size: int = 1000,
+                 tables: Tuple[str, ...] = ()):
+        self.sql = sql
+        self.params = params
+        self.columns = columns
+        self.chunk_size = chunk_size
+        # Таблицы-источники: по их версиям данных кэшируются count() и head()
+        self.tables = tuple(tables)
+
+    @property
+    def is_cacheable(self) -> bool:
+        return bool(self.tables)
+
+    def cache_key(self) -> tuple:
+        """Ключ результата: запрос, параметры и текущие версии данных таблиц"""
+        return (self.sql, self.params, data_version(*self.tables))
+
+    def chunks(self, chunk_size: int = None) -> Iterator[List[tuple]]:
+        """Возвращает строки порциями по chunk_size"""
+        cursor = db_manager.execute_query(self.sql, self.params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size or self.chunk_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def __iter__(self) -> Iterator[tuple]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def head(self, limit: int) -> List[tuple]:
+        """Первые limit строк отчета"""
+        def load():
+            cursor = db_manager.execute_query(
+                f"SELECT * FROM ({self.sql}) LIMIT {int(limit)}", self.params)
+            return [tuple(row) for row in cursor.fetchall()]
+
+        if not self.is_cacheable:
+            return load()
+        return report_cache.get_or_compute(("head", int(limit)) + self.cache_key(), load)
+
+    def count(self) -> int:
+        """Число строк отчета"""
+        def load():
+            cursor = db_manager.execute_query(
+                f"SELECT COUNT(*) FROM ({self.sql})", self.params)
+            return cursor.fetchone()[0]
+
+        if not self.is_cacheable:
+            return load()
+        return report_cache.get_or_compute(("count",) + self.cache_key(), load)
+
+
+class ReportDefinition:
+    """
+    Описание отчета
+
+    Args:
+        report_id: Уникальный идентификатор отчета
+        title: Название для интерфейса
+        table: Таблица-источник
+        columns: Колонки построчного отчета
+        group_by: Колонки группировки (отчет с агрегатами)
+        measures: Агрегаты для группировки, например ReportColumn("Количество", "COUNT(*)")
+        where / params: Постоянный фильтр отчета
+        date_column: Колонка, по которой применяется период
+        date_only: В колонке периода дата без времени (YYYY-MM-DD)
+        order_by: Сортировка
+        option_order_by: Сортировка при включенной опции {'опция': 'ORDER BY ...'}
+        depends_on: Таблицы, от версий данных которых зависит результат
+            (по умолчанию table; для агрегатных таблиц - исходная таблица)
+    """
+
+    def __init__(self, report_id: str, title: str, table: str,
+                 columns: List[ReportColumn] = None,
+                 group_by: List[ReportColumn] = None,
+                 measures: List[ReportColumn] = None,
+                 where: str = None, params: tuple = (),
+                 date_column: Optional[str] = "created_at",
+                 date_only: bool = False,
+                 order_by: str = None,
+                 option_order_by: Dict[str, str] = None,
+                 depends_on: Tuple[str, ...] = None):
+        self.report_id = report_id
+        self.title = title
+        self.table = table
+        self.columns = columns or []
+        self.group_by = group_by or []
+        self.measures = measures or []
+        self.where = where
+        self.params = tuple(params)
+        self.date_column = date_column
+        self.date_only = date_only
+        self.order_by = order_by
+        self.option_order_by = option_order_by or {}
+        self.depends_on = tuple(depends_on or (table,))
+
+    @property
+    def is_grouped(self) -> bool:
+        return bool(self.group_by)
+
+    def compile(self, start_date: datetime = None, end_date: datetime = None,
+                options: Dict[str, Any] = None) -> Tuple[str, tuple, List[str]]:
+        """Собирает SQL-запрос отчета: (sql, параметры, заголовки колонок)"""
+        options = options or {}
+        if self.is_grouped:
+            selected = self.group_by + self.measures
+        else:
+            selected = [column for column in self.columns if column.is_enabled(options)]
+
+        select_sql = ", ".join(f'{column.expression} AS "{column.title}"' for column in selected)
+        sql = f"SELECT {select_sql} FROM {self.table}"
+
+        conditions, params = date_range_condition(
+            self.date_column, start_date, end_date, self.date_only)
+        if self.where:
+            conditions.insert(0, f"({self.where})")
+            params = self.params + params
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        if self.is_grouped:
+            sql += " GROUP BY " + ", ".join(column.expression for column in self.group_by)
+
+        order_by = self.order_by
+        for option, option_order in self.option_order_by.items():
+            if options.get(option):
+                order_by = option_order
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+
+        return sql, params, [column.title for column in selected]
+
+    def source(self, start_date: datetime = None, end_date: datetime = None,
+               options: Dict[str, Any] = None) -> RowSource:
+        """Возвращает потоковый источник строк отчета"""
+        sql, params, columns = self.compile(start_date, end_date, options)
+        return RowSource(sql, params, columns, tables=self.depends_on)
+
+
+class ReportRegistry:
+    """Реестр отчетов: модули и плагины регистрируют в нем свои отчеты"""
+
+    def __init__(self):
+        self._reports: Dict[str, ReportDefinition] = {}
+
+    def register(self, definition: ReportDefinition):
+        """Регистрирует отчет (повторная регистрация заменяет описание)"""
+        self._reports[definition.report_id] = definition
+        logger.info(f"Registered report: {definition.report_id}")
+
+    def unregister(self, report_id: str):
+        """Удаляет отчет из реестра"""
+        self._reports.pop(report_id, None)
+
+    def get(self, report_id: str) -> Optional[ReportDefinition]:
+        return self._reports.get(report_id)
+
+    def all(self) -> List[ReportDefinition]:
+        """Отчеты в порядке регистрации"""
+        return list(self._reports.values())
+
+
+def date_range_condition(date_column: Optional[str], start_date: datetime = None,
+                         end_date: datetime = None,
+                         date_only: bool = False) -> Tuple[List[str], tuple]:
+    """
+    Условие периода по колонке с датой в ISO-формате (сравнение строк).
+    date_only - в колонке только дата, границы сравниваются по дням
+    """
+    if not date_column or start_date is None or end_date is None:
+        return [], ()
+    if date_only:
+        return [f"{date_column} BETWEEN ? AND ?"], (start_date.date().isoformat(),
+                                                    end_date.date().isoformat())
+    return [f"{date_column} BETWEEN ? AND ?"], (start_date.isoformat(), end_date.isoformat())
+
+
+# Относительные периоды отчетов: число дней назад от сегодняшнего
+RELATIVE_PERIODS = {
+    "today": 0,
+    "week": 7,
+    "month": 30,
+    "quarter": 90,
+    "year": 365
+}
+
+
+def period_range(period: str, now: datetime = None) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Границы относительного периода, выровненные по началу и концу дня.
+    В течение дня границы не меняются, поэтому результаты отчетов кэшируются
+    """
+    if period not in RELATIVE_PERIODS:
+        return None, None
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = today - timedelta(days=RELATIVE_PERIODS[period])
+    end_date = today + timedelta(days=1) - timedelta(microseconds=1)
+    return start_date, end_date
+
+
+def summary_statistics(start_date: datetime = None, end_date: datetime = None,
+                       company_limit: int = 10) -> Dict[str, Any]:
+    """Сводная статистика по клиентам за период (агрегаты считает SQL, результат кэшируется)"""
+    key = ("summary", start_date, end_date, company_limit, data_version("clients"))
+    return report_cache.get_or_compute(
+        key, lambda: _load_summary_statistics(start_date, end_date, company_limit))
+
+
+def _load_summary_statistics(start_date: datetime, end_date: datetime,
+                             company_limit: int) -> Dict[str, Any]:
+    # Итог и статусы читаются из агрегатов по дням, периоды выровнены по дням
+    conditions, params = date_range_condition("day", start_date, end_date, date_only=True)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = db_manager.execute_query(
+        f"SELECT status, SUM(cnt) AS total FROM agg_clients_daily{where} "
+        f"GROUP BY status ORDER BY total DESC", params)
+    by_status = [(row[0], row[1]) for row in cursor.fetchall()]
+    total = sum(count for _, count in by_status)
+
+    if conditions:
+        # Компании за период считаются по таблице клиентов
+        client_conditions, client_params = date_range_condition("created_at", start_date, end_date)
+        by_company = db_manager.group_count(
+            "clients", "COALESCE(NULLIF(company, ''), 'не указана')",
+            " AND ".join(client_conditions), client_params, limit=company_limit)
+    else:
+        cursor = db_manager.execute_query(
+            f"SELECT company, cnt FROM agg_clients_company "
+            f"ORDER BY cnt DESC LIMIT {int(company_limit)}")
+        by_company = [(row[0], row[1]) for row in cursor.fetchall()]
+    return {
+        "total": total,
+        "by_status": dict(by_status),
+        "by_company": dict(by_company)
+    }
+
+
+# Заметки в отчетах обрезаются до 100 символов
+NOTES_EXPRESSION = "CASE WHEN length(notes) > 100 THEN substr(notes, 1, 100) || '...' ELSE notes END"
+
+
+def _register_builtin_reports(registry: ReportRegistry):
+    """Стандартные отчеты по клиентам"""
+    notes = ReportColumn("Заметки", NOTES_EXPRESSION, option="include_notes")
+    by_status_order = {"group_by_status": "status, id"}
+
+    registry.register(ReportDefinition(
+        "clients_summary", "Общий отчет по клиентам", "clients",
+        columns=[
+            ReportColumn("ID", "id"),
+            ReportColumn("Имя", "name"),
+            ReportColumn("Компания", "company"),
+            ReportColumn("Статус", "status"),
+            ReportColumn("Дата создания", "created_at"),
+            notes
+        ],
+        order_by="id",
+        option_order_by=by_status_order
+    ))
+
+    # Распределения читаются из агрегатной таблицы (см. core.aggregates)
+    registry.register(ReportDefinition(
+        "clients_by_status", "Клиенты по статусам", "agg_clients_daily",
+        group_by=[ReportColumn("Статус", "status")],
+        measures=[
+            ReportColumn("Количество", "SUM(cnt)"),
+            ReportColumn("Процент", "ROUND(SUM(cnt) * 100.0 / SUM(SUM(cnt)) OVER (), 1)")
+        ],
+        date_column="day",
+        date_only=True,
+        order_by='"Количество" DESC',
+        depends_on=("clients",)
+    ))
+
+    registry.register(ReportDefinition(
+        "clients_by_date", "Клиенты по дате добавления", "agg_clients_daily",
+        group_by=[ReportColumn("Дата", "day")],
+        measures=[ReportColumn("Количество", "SUM(cnt)")],
+        date_column="day",
+        date_only=True,
+        order_by='"Дата"',
+        depends_on=("clients",)
+    ))
+
+    registry.register(ReportDefinition(
+        "detailed_clients", "Подробный отчет по клиентам", "clients",
+        columns=[
+            ReportColumn("ID", "id"),
+            ReportColumn("Имя", "name"),
+            ReportColumn("Email", "email"),
+            ReportColumn("Телефон", "phone"),
+            ReportColumn("Компания", "company"),
+            ReportColumn("Статус", "status"),
+            ReportColumn("Дата создания", "created_at"),
+            ReportColumn("Дата обновления", "updated_at"),
+            notes
+        ],
+        order_by="id",
+        option_order_by=by_status_order
+    ))
+
+
+# Глобальный реестр отчетов
+report_registry = ReportRegistry()
+_register_builtin_reports(report_registry)
\ No newline at end of file
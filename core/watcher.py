@@ -0,0 +1,135 @@
+"""
+Наблюдение за изменениями БД, сделанными другими копиями приложения
+
+PRAGMA data_version соединения меняется, только когда изменения в файл БД
+записало другое соединение или процесс, поэтому пустой опрос - один PRAGMA
+без чтения таблиц. Когда версия изменилась, новые записи журнала изменений
+(core.changelog) читаются от курсора наблюдателя, сворачиваются по строкам и
+передаются подписчикам - открытые интерфейсы обновляют только эти строки.
+
+Опрос выполняется в потоке UI по таймеру (root.after, см. main.py).
+"""
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+from .config import Config
+from .database import db_manager
+from .changelog import changes_since, current_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class TableChanges:
+    """Изменения одной таблицы с прошлого опроса, свернутые по строкам"""
+
+    def __init__(self, table: str, reset: bool = False):
+        self.table = table
+        self.inserted: Set[int] = set()
+        self.updated: Set[int] = set()
+        self.deleted: Set[int] = set()
+        # Журнал сжат или изменений слишком много - нужна полная перезагрузка
+        self.reset = reset
+
+    @property
+    def changed(self) -> Set[int]:
+        """Строки, которые есть в таблице и изменились (вставлены или обновлены)"""
+        return self.inserted | self.updated
+
+    def add(self, row_id: int, op: str):
+        """Учитывает запись журнала (последняя операция над строкой главнее)"""
+        if op == 'D':
+            self.inserted.discard(row_id)
+            self.updated.discard(row_id)
+            self.deleted.add(row_id)
+        elif op == 'I':
+            self.deleted.discard(row_id)
+            self.inserted.add(row_id)
+        elif row_id not in self.inserted:
+            self.updated.add(row_id)
+
+    def __bool__(self) -> bool:
+        return self.reset or bool(self.inserted or self.updated or self.deleted)
+
+
+class ChangeWatcher:
+    """Рассылает подписчикам изменения таблиц, сделанные другими соединениями"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[TableChanges], None]]] = {}
+        self._data_version: Optional[int] = None
+        self.cursor: Optional[int] = None
+
+    def subscribe(self, table: str, callback: Callable[[TableChanges], None]):
+        """Подписывает callback(TableChanges) на изменения таблицы"""
+        callbacks = self._subscribers.setdefault(table, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def unsubscribe(self, table: str, callback: Callable[[TableChanges], None]):
+        callbacks = self._subscribers.get(table, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def _read_data_version(self) -> int:
+        return db_manager.execute_query("PRAGMA data_version").fetchone()[0]
+
+    def reset(self):
+        """Начинает наблюдение с текущего состояния БД (например, после смены файла БД)"""
+        self._data_version = None
+        self.cursor = None
+
+    def poll(self) -> Dict[str, TableChanges]:
+        """
+        Один опрос: если другое соединение записало изменения, читает журнал
+        от курсора и вызывает подписчиков. Возвращает изменения по таблицам
+        """
+        if not db_manager.is_connected or not self._subscribers:
+            return {}
+
+        data_version = self._read_data_version()
+        if self.cursor is None:
+            self.cursor = current_cursor()
+            self._data_version = data_version
+            return {}
+        if data_version == self._data_version:
+            return {}
+        self._data_version = data_version
+
+        changes = self._collect()
+        for table, table_changes in changes.items():
+            for callback in list(self._subscribers.get(table, ())):
+                try:
+                    callback(table_changes)
+                except Exception as e:
+                    logger.error(f"Change subscriber failed for {table}: {e}")
+        return changes
+
+    def _collect(self) -> Dict[str, TableChanges]:
+        """Читает журнал от курсора порциями и сворачивает записи по строкам"""
+        tables = {table: TableChanges(table) for table, callbacks in self._subscribers.items()
+                  if callbacks}
+        read = 0
+        while True:
+            result = changes_since(self.cursor, limit=Config.CHANGE_WATCH_BATCH)
+            self.cursor = result['cursor']
+            if result['reset']:
+                return {table: TableChanges(table, reset=True) for table in tables}
+
+            for change in result['changes']:
+                table_changes = tables.get(change['table'])
+                if table_changes is not None:
+                    table_changes.add(change['row_id'], change['op'])
+            read += len(result['changes'])
+
+            if not result['has_more']:
+                break
+            if read >= Config.CHANGE_WATCH_MAX_ROWS:
+                # Дешевле перезагрузить интерфейсы, чем обновлять строки по одной
+                self.cursor = current_cursor()
+                return {table: TableChanges(table, reset=True) for table in tables}
+
+        return {table: table_changes for table, table_changes in tables.items() if table_changes}
+
+
+# Глобальный наблюдатель изменений
+change_watcher = ChangeWatcher()
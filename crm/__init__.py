@@ -0,0 +1,3 @@
+"""
+Консольный интерфейс CRM (без графического интерфейса): python -m crm
+"""
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""
+Точка входа: python -m crm <команда>
+"""
+import sys
+
+from crm.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
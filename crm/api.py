@@ -0,0 +1,442 @@
+"""
+Встроенный HTTP/JSON API для клиентов и задач
+
+Только стандартная библиотека: http.server с пулом рабочих потоков. У каждого
+потока пула свое соединение с БД (см. core.database), соединения
+переиспользуются между запросами. Ответы списков кэшируются по версии данных
+таблицы и отдаются с ETag: повторный запрос с If-None-Match получает 304
+без обращения к таблице.
+
+Маршруты (<resource> - clients или tasks):
+    GET    /api/health
+    GET    /api/changes?since=<seq>&table=clients&limit=1000 - журнал изменений
+    GET    /api/diagnostics/queries?sort=total_ms&limit=50 - статистика SQL-запросов
+    GET    /api/<resource>?limit=50&offset=0&sort=name&order=desc&status=...&q=...
+    GET    /api/<resource>/<id>
+    POST   /api/<resource>                 - создать запись
+    POST   /api/<resource>/batch           - {"create": [...], "update": [...], "delete": [...]}
+    PATCH  /api/<resource>/<id>            - изменить поля (PUT - то же самое)
+    DELETE /api/<resource>/<id>
+
+Оптимистичная блокировка: если в PATCH (или в записи update пакета) передан
+row_version, прочитанный клиентом, запись изменяется только при совпадении
+версии, иначе 409 с текущей версией. Занятая другим процессом БД - 503.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+from core.config import Config
+from core.database import db_manager, ROW_VERSION_COLUMN, is_transient_error
+from core.cache import report_cache, data_version
+from core.models import Client
+from core.changelog import changes_since
+from core.query_stats import query_stats
+
+logger = logging.getLogger(__name__)
+
+# Ограничения запросов
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class ApiError(Exception):
+    """Ошибка запроса: HTTP-статус, сообщение и подробности (ошибки валидации)"""
+
+    def __init__(self, status: int, message: str, details: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+
+class ApiResource:
+    """
+    Таблица, доступная через API
+
+    Args:
+        name: Имя в URL (/api/<name>)
+        table: Таблица БД
+        prepare: prepare(record, columns) -> запись в формате таблицы
+        validate: validate(records) -> список ошибок для каждой записи
+        filter_columns: Колонки для фильтра ?колонка=значение
+        sort_columns: Колонки, по которым разрешена сортировка
+        search_columns: Колонки для поиска ?q= (LIKE)
+    """
+
+    def __init__(self, name: str, table: str,
+                 prepare: Callable[[Dict[str, Any], List[str]], Dict[str, Any]],
+                 validate: Callable[[List[Dict[str, Any]]], List[List[str]]],
+                 filter_columns: Tuple[str, ...] = (),
+                 sort_columns: Tuple[str, ...] = (),
+                 search_columns: Tuple[str, ...] = ()):
+        self.name = name
+        self.table = table
+        self.prepare = prepare
+        self.validate = validate
+        self.filter_columns = filter_columns
+        self.sort_columns = ('id',) + tuple(sort_columns)
+        self.search_columns = search_columns
+        # Версию строки ведет база, в записываемые колонки она не входит
+        self.columns = [column for column in db_manager.table_columns(table)
+                        if column not in ('id', ROW_VERSION_COLUMN)]
+
+    # -- чтение
+
+    def list(self, query: Dict[str, str]) -> Dict[str, Any]:
+        limit = _int_param(query, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        offset = _int_param(query, 'offset', 0, 0, None)
+
+        conditions, params = [], []
+        for column in self.filter_columns:
+            if column in query:
+                conditions.append(f"{column} = ?")
+                params.append(query[column])
+        if query.get('q') and self.search_columns:
+            conditions.append("(" + " OR ".join(f"{column} LIKE ?" for column in self.search_columns) + ")")
+            params.extend([f"%{query['q']}%"] * len(self.search_columns))
+        where = " AND ".join(conditions) or None
+
+        sort = query.get('sort', 'id')
+        if sort not in self.sort_columns:
+            raise ApiError(400, f"Сортировка по '{sort}' недоступна", list(self.sort_columns))
+        direction = "DESC" if query.get('order') == 'desc' else "ASC"
+        order_by = f"{sort} {direction}" if sort == 'id' else f"{sort} {direction}, id"
+
+        items = db_manager.select(self.table, where=where, params=tuple(params),
+                                  order_by=order_by, limit=limit, offset=offset)
+        # Итог не зависит от страницы: кэшируется по фильтру и версии данных
+        total = report_cache.get_or_compute(
+            ("api-count", self.table, where, tuple(params), data_version(self.table)),
+            lambda: db_manager.count(self.table, where, tuple(params)))
+        return {"items": items, "total": total, "limit": limit, "offset": offset}
+
+    def get(self, record_id: int) -> Dict[str, Any]:
+        rows = db_manager.select(self.table, where="id = ?", params=(record_id,))
+        if not rows:
+            raise ApiError(404, f"Запись {record_id} не найдена")
+        return rows[0]
+
+    # -- запись
+
+    def _prepare_valid(self, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+        """Приводит записи к формату таблицы и проверяет их: (записи, {индекс: ошибки})"""
+        prepared = [self.prepare(record, self.columns) for record in records]
+        errors = {index: messages for index, messages in enumerate(self.validate(prepared)) if messages}
+        return prepared, errors
+
+    def _merge(self, record_id: int, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Существующая запись с изменениями (для update)"""
+        merged = dict(self.get(record_id))
+        merged.update(changes)
+        if 'updated_at' in self.columns:
+            merged['updated_at'] = datetime.now().isoformat()
+        return merged
+
+    def create(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        prepared, errors = self._prepare_valid([_require_object(record)])
+        if errors:
+            raise ApiError(422, "Ошибки валидации", errors[0])
+        return {"id": db_manager.insert(self.table, prepared[0])}
+
+    def _write_update(self, record_id: int, record: Dict[str, Any], expected_version: Any):
+        """Изменяет запись; при переданной версии - только если ее никто не изменил"""
+        if expected_version is None or self.table not in db_manager.versioned_tables:
+            db_manager.update_many(self.table, record, "id = ?", (record_id,))
+            return
+        if not db_manager.update_versioned(self.table, record, record_id, int(expected_version)):
+            current = db_manager.row_version(self.table, record_id)
+            if current is None:
+                raise ApiError(404, f"Запись {record_id} не найдена")
+            raise ApiError(409, f"Запись {record_id} изменена другим пользователем",
+                           {"id": record_id, ROW_VERSION_COLUMN: current})
+
+    def update(self, record_id: int, changes: Dict[str, Any]) -> Dict[str, Any]:
+        changes = dict(_require_object(changes))
+        expected_version = changes.pop(ROW_VERSION_COLUMN, None)
+        prepared, errors = self._prepare_valid([self._merge(record_id, changes)])
+        if errors:
+            raise ApiError(422, "Ошибки валидации", errors[0])
+        self._write_update(record_id, prepared[0], expected_version)
+        return self.get(record_id)
+
+    def delete(self, record_id: int) -> Dict[str, Any]:
+        if not db_manager.delete(self.table, "id = ?", (record_id,)):
+            raise ApiError(404, f"Запись {record_id} не найдена")
+        return {"deleted": 1}
+
+    def batch(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Пакетное изменение в одной транзакции: все записи проверяются заранее,
+        при любой ошибке ничего не меняется
+        """
+        body = _require_object(body)
+        creates = [_require_object(record) for record in body.get('create') or []]
+        updates = [_require_object(record) for record in body.get('update') or []]
+        deletes = [int(record_id) for record_id in body.get('delete') or []]
+
+        if any('id' not in record for record in updates):
+            raise ApiError(400, "Каждая запись в 'update' должна содержать id")
+
+        created, create_errors = self._prepare_valid(creates)
+        update_ids = [int(record['id']) for record in updates]
+        expected_versions = [record.get(ROW_VERSION_COLUMN) for record in updates]
+        updated, update_errors = self._prepare_valid(
+            [self._merge(record_id, {key: value for key, value in record.items()
+                                     if key != ROW_VERSION_COLUMN})
+             for record_id, record in zip(update_ids, updates)])
+        if create_errors or update_errors:
+            raise ApiError(422, "Ошибки валидации", {"create": create_errors, "update": update_errors})
+
+        with db_manager.transaction():
+            created_count = 0
+            if created:
+                created_count = db_manager.insert_many(
+                    self.table, self.columns,
+                    [tuple(record.get(column) for column in self.columns) for record in created])
+            # Конфликт версии любой записи откатывает весь пакет
+            for record_id, record, expected_version in zip(update_ids, updated, expected_versions):
+                self._write_update(record_id, record, expected_version)
+            deleted_count = 0
+            if deletes:
+                where, params = db_manager.ids_condition(deletes)
+                deleted_count = db_manager.delete_many(self.table, where, params)
+
+        return {"created": created_count, "updated": len(updated), "deleted": deleted_count}
+
+
+def _int_param(query: Dict[str, str], name: str, default: int,
+               minimum: int, maximum: Optional[int]) -> int:
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"Параметр '{name}' должен быть числом")
+    value = max(minimum, value)
+    return min(maximum, value) if maximum is not None else value
+
+
+def _require_object(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ApiError(400, "Ожидается JSON-объект")
+    return value
+
+
+def build_resources() -> Dict[str, ApiResource]:
+    """Ресурсы API: клиенты и, если есть таблица, задачи плагина"""
+    default_status = Client.default_status()
+    resources = {
+        "clients": ApiResource(
+            "clients", Client.TABLE_NAME,
+            prepare=lambda record, columns: Client.prepare_record(record, columns, default_status),
+            validate=Client.validate_many,
+            filter_columns=('status', 'company', 'name', 'email', 'phone'),
+            sort_columns=('name', 'company', 'status', 'created_at', 'updated_at'),
+            search_columns=('name', 'email', 'company')
+        )
+    }
+
+    tables = {row[0] for row in db_manager.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "tasks" in tables:
+        from plugins.tasks.models import TaskModel
+
+        resources["tasks"] = ApiResource(
+            "tasks", TaskModel.TABLE_NAME,
+            prepare=TaskModel.prepare_record,
+            validate=TaskModel.validate_many,
+            filter_columns=('status', 'priority'),
+            sort_columns=('title', 'status', 'priority', 'created_at'),
+            search_columns=('title', 'description')
+        )
+    return resources
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Разбор запроса, маршрутизация и JSON-ответ"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive: соединение обслуживает много запросов
+    server_version = "FlexCRM-API/1.0"
+    timeout = Config.API_IDLE_TIMEOUT  # Простаивающее keep-alive соединение закрывается
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY keep-alive ответ ждет ~40 мс
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PATCH")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _dispatch(self, method: str):
+        # Запрос обрабатывается в пуле сервера (там же соединения с БД), ответ
+        # пишется потоком соединения: простаивающий клиент не занимает поток пула
+        status, payload, etag = self.server.execute(lambda: self._handle(method))
+        self._send(status, payload, etag)
+
+    def _handle(self, method: str) -> Tuple[int, Any, Optional[str]]:
+        try:
+            return self._route(method)
+        except ApiError as e:
+            status, payload, etag = e.status, {"error": e.message, "details": e.details}, None
+        except json.JSONDecodeError as e:
+            status, payload, etag = 400, {"error": f"Неверный JSON: {e}"}, None
+        except (TypeError, ValueError) as e:
+            status, payload, etag = 400, {"error": f"Неверные данные: {e}"}, None
+        except sqlite3.IntegrityError as e:
+            status, payload, etag = 409, {"error": str(e)}, None
+        except sqlite3.OperationalError as e:
+            if not is_transient_error(e):
+                logger.exception(f"API error: {method} {self.path}")
+                status, payload, etag = 500, {"error": str(e)}, None
+            else:
+                # Блокировка не снята и после повторов: клиент может повторить позже
+                status, payload, etag = 503, {"error": f"База данных занята: {e}"}, None
+        except Exception as e:
+            logger.exception(f"API error: {method} {self.path}")
+            status, payload, etag = 500, {"error": str(e)}, None
+        return status, payload, etag
+
+    def _route(self, method: str) -> Tuple[int, Any, Optional[str]]:
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if not parts or parts[0] != "api":
+            raise ApiError(404, "Не найдено")
+        if parts[1:] == ["health"]:
+            return 200, {"status": "ok"}, None
+        if parts[1:] == ["changes"] and method == "GET":
+            query = parse_qsl(url.query)
+            params = dict(query)
+            tables = [value for key, value in query if key == "table"]
+            return 200, changes_since(_int_param(params, 'since', 0, 0, None), tables,
+                                      _int_param(params, 'limit', 1000, 1, 10000)), None
+        if parts[1:] == ["diagnostics", "queries"] and method == "GET":
+            params = dict(parse_qsl(url.query))
+            return 200, query_stats.snapshot(params.get('sort', 'total_ms'),
+                                             _int_param(params, 'limit', 50, 1, 1000)), None
+
+        resource = self.server.resources.get(parts[1]) if len(parts) > 1 else None
+        if resource is None:
+            raise ApiError(404, "Неизвестный ресурс", sorted(self.server.resources))
+        tail = parts[2:]
+
+        if method == "GET":
+            return self._cached_get(resource, url, tail)
+        if method == "POST" and not tail:
+            return 201, resource.create(self._read_json()), None
+        if method == "POST" and tail == ["batch"]:
+            return 200, resource.batch(self._read_json()), None
+        if method in ("PATCH", "DELETE") and len(tail) == 1:
+            record_id = _record_id(tail[0])
+            if method == "PATCH":
+                return 200, resource.update(record_id, self._read_json()), None
+            return 200, resource.delete(record_id), None
+        raise ApiError(405, "Метод не поддерживается")
+
+    def _cached_get(self, resource: ApiResource, url, tail: List[str]) -> Tuple[int, Any, Optional[str]]:
+        """
+        GET списка или записи. ETag зависит от версии данных таблицы и запроса:
+        пока данные не менялись, ответ берется из кэша или клиент получает 304
+        """
+        if len(tail) > 1:
+            raise ApiError(404, "Не найдено")
+        query = dict(parse_qsl(url.query))
+        key = ("api", url.path, tuple(sorted(query.items())), data_version(resource.table))
+        etag = '"' + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:24] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return 304, None, etag
+
+        if tail:
+            record_id = _record_id(tail[0])
+            return 200, report_cache.get_or_compute(key, lambda: _encode(resource.get(record_id))), etag
+        return 200, report_cache.get_or_compute(key, lambda: _encode(resource.list(query))), etag
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Слишком большой запрос")
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send(self, status: int, payload: Any, etag: Optional[str] = None):
+        body = b"" if status == 304 else (payload if isinstance(payload, bytes) else _encode(payload))
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _record_id(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(404, "Не найдено")
+
+
+def _encode(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+
+class ApiServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP-сервер: у каждого соединения свой легкий поток ввода-вывода, а запросы
+    выполняются фиксированным пулом потоков (и соединений с БД). Keep-alive
+    соединение занимает поток пула только на время обработки своего запроса
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, address: Tuple[str, int], resources: Dict[str, ApiResource],
+                 workers: int = Config.API_WORKERS):
+        super().__init__(address, ApiRequestHandler)
+        self.resources = resources
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    def execute(self, handler: Callable[[], Any]) -> Any:
+        """Выполняет обработку запроса в пуле и ждет результат"""
+        return self._executor.submit(handler).result()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+def start_api_server(host: str = Config.API_HOST, port: int = Config.API_PORT,
+                     workers: int = Config.API_WORKERS) -> ApiServer:
+    """
+    Запускает API в фоновом потоке (БД должна быть подключена).
+    Остановка: server.shutdown(); server.server_close()
+    """
+    # WAL: чтение не блокируется записью из других потоков и процессов. Режим
+    # сохраняется в файле БД и не работает на сетевых ресурсах, поэтому только по настройке
+    if Config.get_setting("api_wal", Config.API_WAL):
+        db_manager.execute_query("PRAGMA journal_mode=WAL")
+        logger.info("Database switched to WAL journal mode (api_wal)")
+    server = ApiServer((host, port), build_resources(), workers)
+    threading.Thread(target=server.serve_forever, name="api", daemon=True).start()
+    logger.info(f"API server listening on http://{host}:{server.server_port}")
+    return server
\ No newline at end of file
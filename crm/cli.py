@@ -0,0 +1,426 @@
+"""
+Консольные команды: отчеты, импорт и экспорт, обслуживание БД
+
+Использует core (БД, модели, движок отчетов) и не импортирует Tk, поэтому
+работает на сервере без дисплея и подходит для cron и пакетной обработки.
+
+Примеры:
+    python -m crm report clients_by_status --period month -o status.csv
+    python -m crm import clients.csv
+    python -m crm export clients -o clients.jsonl.gz
+    python -m crm backup
+"""
+import argparse
+import csv
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.config import Config, BASE_DIR
+from core.database import db_manager, ROW_VERSION_COLUMN
+from core.models import Client
+from core.reports import RowSource, report_registry, period_range, RELATIVE_PERIODS
+from core.export import EXPORTERS
+from core.aggregates import rebuild_client_aggregates
+from core.changelog import changes_since, compact_changelog
+from core.delta import DeltaExport
+from core.query_stats import query_stats
+from utils.tracing import tracer
+from plugins import plugin_manager
+
+logger = logging.getLogger(__name__)
+
+# Расширение файла -> формат выгрузки
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".json": "json",
+    ".xlsx": "excel"
+}
+
+
+class CommandError(Exception):
+    """Ошибка выполнения команды (выводится без трассировки)"""
+    pass
+
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    """Формат файла: явно заданный или по расширению (.gz не учитывается)"""
+    if fmt:
+        return fmt
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes if suffix.lower() != ".gz"]
+    if suffixes and suffixes[-1] in FORMAT_EXTENSIONS:
+        return FORMAT_EXTENSIONS[suffixes[-1]]
+    raise CommandError(f"Не удалось определить формат файла {path}, укажите --format")
+
+
+def _parse_date(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise CommandError(f"Неверный формат даты '{value}'. Используйте ГГГГ-ММ-ДД")
+
+
+def _date_range(args):
+    """Период отчета из аргументов: --from/--to или --period"""
+    if args.date_from or args.date_to:
+        if not (args.date_from and args.date_to):
+            raise CommandError("Укажите обе даты периода: --from и --to")
+        start_date = _parse_date(args.date_from)
+        end_date = _parse_date(args.date_to).replace(hour=23, minute=59, second=59)
+        return start_date, end_date
+    return period_range(args.period)
+
+
+def _export(source: RowSource, path: str, fmt: str, gzip_output: bool):
+    """Выгружает источник строк в файл выбранного формата"""
+    exporter = EXPORTERS[fmt]
+    if fmt == "excel":
+        return exporter(source, path)
+    return exporter(source, path, gzip_output=gzip_output or None)
+
+
+# ---------------------------------------------------------------------------
+# Команды
+
+def cmd_reports(args) -> int:
+    """Список доступных отчетов"""
+    for definition in report_registry.all():
+        print(f"{definition.report_id:24} {definition.title}")
+    return 0
+
+
+def cmd_report(args) -> int:
+    """Формирует отчет в файл"""
+    definition = report_registry.get(args.report_id)
+    if definition is None:
+        raise CommandError(f"Неизвестный отчет: {args.report_id} (список: python -m crm reports)")
+
+    start_date, end_date = _date_range(args)
+    options = {option: True for option in args.option}
+    source = definition.source(start_date, end_date, options)
+    if not source.count():
+        raise CommandError("Нет данных для генерации отчета")
+
+    result = _export(source, args.output, _detect_format(args.output, args.format), args.gzip)
+    print(result)
+    return 0
+
+
+def cmd_export(args) -> int:
+    """Выгружает таблицу целиком или изменения с прошлой выгрузки цели (--delta)"""
+    tables = {row[0] for row in db_manager.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if args.table not in tables:
+        raise CommandError(f"Таблица не найдена: {args.table}")
+
+    fmt = _detect_format(args.output, args.format)
+    if not args.delta:
+        columns = db_manager.table_columns(args.table)
+        source = RowSource(f"SELECT * FROM {args.table} ORDER BY rowid", (), columns,
+                           tables=(args.table,))
+        print(_export(source, args.output, fmt, args.gzip))
+        return 0
+
+    delta = DeltaExport(args.delta, args.table)
+    if args.full:
+        delta.reset()
+    source = delta.source()
+    # Пустая дельта тоже пишется: ночной конвейер получает файл без строк
+    result = _export(source, args.output, fmt, args.gzip)
+    delta.commit()
+    kind = "полная выгрузка" if delta.is_full else "изменения"
+    print(f"{result} ({kind}, цель '{args.delta}')")
+    return 0
+
+
+def _read_records(path: str, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Читает записи файла импорта потоково"""
+    if fmt == "excel":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(title).strip() for title in next(rows, ())]
+            for row in rows:
+                yield dict(zip(header, row))
+        finally:
+            workbook.close()
+        return
+
+    gzip_input = path.lower().endswith(".gz")
+    encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+    if gzip_input:
+        import gzip
+        handle = gzip.open(path, "rt", encoding=encoding, newline="")
+    else:
+        handle = open(path, "r", encoding=encoding, newline="")
+    with handle:
+        if fmt == "csv":
+            for record in csv.DictReader(handle):
+                yield {key.strip(): value for key, value in record.items() if key}
+        elif fmt == "jsonl":
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(handle)
+            if not isinstance(data, list):
+                raise CommandError("JSON-файл должен содержать массив записей")
+            yield from data
+
+
+def _batches(records: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def cmd_import(args) -> int:
+    """
+    Импортирует клиентов из CSV, JSON, JSON Lines или Excel.
+    Записи проверяются пакетами; неверные пропускаются и выводятся в stderr
+    """
+    fmt = _detect_format(args.file, args.format)
+    columns = [column for column in db_manager.table_columns(Client.TABLE_NAME)
+               if column not in ('id', ROW_VERSION_COLUMN)]
+    default_status = Client.default_status()
+
+    start = time.perf_counter()
+    imported = skipped = 0
+    line = 1
+    for batch in _batches(_read_records(args.file, fmt), args.batch_size):
+        records = [Client.prepare_record(record, columns, default_status) for record in batch]
+        valid = []
+        for record, messages in zip(records, Client.validate_many(records)):
+            line += 1
+            if messages:
+                skipped += 1
+                print(f"Запись {line}: {'; '.join(messages)}", file=sys.stderr)
+            else:
+                valid.append(record)
+
+        if valid and not args.dry_run:
+            imported += db_manager.insert_many(
+                Client.TABLE_NAME, columns,
+                [tuple(record.get(column) for column in columns) for record in valid])
+        elif args.dry_run:
+            imported += len(valid)
+
+    elapsed = time.perf_counter() - start
+    action = "Проверено" if args.dry_run else "Импортировано"
+    print(f"{action} записей: {imported}, пропущено: {skipped} ({elapsed:.2f} с)")
+    return 1 if skipped and args.strict else 0
+
+
+def cmd_backup(args) -> int:
+    """Резервная копия БД через backup API SQLite (согласованная копия без остановки)"""
+    if args.output:
+        backup_path = Path(args.output)
+    else:
+        backup_dir = BASE_DIR / "backups"
+        backup_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = backup_dir / f"crm_backup_{timestamp}.db"
+
+    target = sqlite3.connect(str(backup_path))
+    try:
+        db_manager.connection.backup(target)
+    finally:
+        target.close()
+    print(f"Резервная копия создана: {backup_path}")
+    return 0
+
+
+def cmd_vacuum(args) -> int:
+    """Сжимает файл БД"""
+    db_path = Path(db_manager.db_path)
+    size_before = db_path.stat().st_size
+    db_manager.execute_query("VACUUM")
+    size_after = db_path.stat().st_size
+    print(f"VACUUM: {size_before / 1024 / 1024:.2f} MB -> {size_after / 1024 / 1024:.2f} MB")
+    return 0
+
+
+def cmd_reindex(args) -> int:
+    """Перестраивает индексы и обновляет статистику планировщика"""
+    start = time.perf_counter()
+    db_manager.execute_query("REINDEX")
+    db_manager.execute_query("ANALYZE")
+    db_manager._commit()
+    print(f"Индексы перестроены за {time.perf_counter() - start:.2f} с")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    """HTTP/JSON API до остановки по Ctrl+C"""
+    from crm.api import start_api_server
+
+    # Долго работающий сервер: статистика доступна по /api/diagnostics/queries
+    query_stats.configure(enabled=Config.get_setting("query_stats_enabled", Config.QUERY_STATS_ENABLED))
+    server = start_api_server(args.host, args.port, args.workers)
+    print(f"API: http://{args.host}:{server.server_port}/api/ (Ctrl+C - остановить)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 0
+
+
+def cmd_changes(args) -> int:
+    """Выводит изменения после курсора (JSON Lines), курсор продолжения - в stderr"""
+    cursor, has_more = args.since, True
+    while has_more:
+        batch = changes_since(cursor, args.table, limit=args.limit)
+        if batch['reset']:
+            print(f"Журнал после курсора {cursor} сжат - нужна полная выгрузка", file=sys.stderr)
+        for change in batch['changes']:
+            print(json.dumps(change, ensure_ascii=False))
+        cursor, has_more = batch['cursor'], batch['has_more'] and args.all
+    print(f"Курсор: {cursor}", file=sys.stderr)
+    return 0
+
+
+def cmd_compact_changelog(args) -> int:
+    """Сжимает журнал изменений"""
+    result = compact_changelog(args.retention_days)
+    print(f"Журнал сжат: заменено {result['collapsed']}, устарело {result['expired']}")
+    return 0
+
+
+def cmd_rebuild_aggregates(args) -> int:
+    """Пересчитывает агрегатные таблицы отчетов"""
+    elapsed = rebuild_client_aggregates()
+    print(f"Агрегаты отчетов пересобраны за {elapsed:.2f} с")
+    return 0
+
+
+# ---------------------------------------------------------------------------
+
+def _add_output_arguments(parser):
+    parser.add_argument("-o", "--output", required=True, help="Файл результата")
+    parser.add_argument("--format", choices=sorted(EXPORTERS),
+                        help="Формат (по умолчанию - по расширению файла)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Сжать gzip (также включается расширением .gz)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m crm", description="FlexCRM без графического интерфейса")
+    parser.add_argument("--db", help=f"Файл базы данных (по умолчанию {Config.DB_PATH})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Подробный лог")
+    parser.add_argument("--query-stats", metavar="FILE",
+                        help="Сохранить статистику SQL-запросов команды в JSON")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Сохранить трассу команды в формате Chrome trace events")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("reports", help="Список отчетов").set_defaults(handler=cmd_reports)
+
+    report = commands.add_parser("report", help="Сформировать отчет")
+    report.add_argument("report_id", help="Идентификатор отчета")
+    report.add_argument("--period", choices=["all"] + list(RELATIVE_PERIODS), default="all")
+    report.add_argument("--from", dest="date_from", help="Начало периода ГГГГ-ММ-ДД")
+    report.add_argument("--to", dest="date_to", help="Конец периода ГГГГ-ММ-ДД")
+    report.add_argument("--option", action="append", default=[],
+                        help="Опция отчета (include_notes, group_by_status)")
+    _add_output_arguments(report)
+    report.set_defaults(handler=cmd_report)
+
+    import_parser = commands.add_parser("import", help="Импортировать клиентов из файла")
+    import_parser.add_argument("file", help="CSV, JSON, JSON Lines или Excel (можно .gz)")
+    import_parser.add_argument("--format", choices=sorted(EXPORTERS))
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--dry-run", action="store_true", help="Только проверить записи")
+    import_parser.add_argument("--strict", action="store_true",
+                               help="Код возврата 1, если есть пропущенные записи")
+    import_parser.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="Выгрузить таблицу")
+    export.add_argument("table", nargs="?", default=Client.TABLE_NAME)
+    export.add_argument("--delta", metavar="TARGET",
+                        help="Только изменения с прошлой выгрузки этой цели (колонка _op, "
+                             "удаленные строки - tombstone)")
+    export.add_argument("--full", action="store_true",
+                        help="С --delta: сбросить курсор цели и выгрузить все строки")
+    _add_output_arguments(export)
+    export.set_defaults(handler=cmd_export)
+
+    backup = commands.add_parser("backup", help="Резервная копия БД")
+    backup.add_argument("-o", "--output", help="Файл копии (по умолчанию backups/crm_backup_*.db)")
+    backup.set_defaults(handler=cmd_backup)
+
+    serve = commands.add_parser("serve", help="Запустить HTTP/JSON API")
+    serve.add_argument("--host", default=Config.API_HOST)
+    serve.add_argument("--port", type=int, default=Config.API_PORT)
+    serve.add_argument("--workers", type=int, default=Config.API_WORKERS,
+                       help="Потоков обработки (и соединений с БД)")
+    serve.set_defaults(handler=cmd_serve)
+
+    changes = commands.add_parser("changes", help="Изменения из журнала после курсора")
+    changes.add_argument("--since", type=int, default=0, help="Курсор (seq последнего прочитанного)")
+    changes.add_argument("--table", action="append", help="Только эти таблицы")
+    changes.add_argument("--limit", type=int, default=1000)
+    changes.add_argument("--all", action="store_true", help="Читать до конца журнала")
+    changes.set_defaults(handler=cmd_changes)
+
+    compact = commands.add_parser("compact-changelog", help="Сжать журнал изменений")
+    compact.add_argument("--retention-days", type=int, default=Config.CHANGELOG_RETENTION_DAYS)
+    compact.set_defaults(handler=cmd_compact_changelog)
+
+    commands.add_parser("vacuum", help="Сжать файл БД").set_defaults(handler=cmd_vacuum)
+    commands.add_parser("reindex", help="Перестроить индексы").set_defaults(handler=cmd_reindex)
+    commands.add_parser("rebuild-aggregates",
+                        help="Пересчитать агрегаты отчетов").set_defaults(handler=cmd_rebuild_aggregates)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.db:
+        db_manager.db_path = args.db
+        db_manager._ensure_db_directory()
+    # Пакетные команды по природе долгие: статистика собирается только по запросу
+    query_stats.configure(enabled=bool(args.query_stats))
+    if args.trace:
+        tracer.enable()
+
+    try:
+        db_manager.connect()
+        Client.initialize_table()
+        # Отчеты включенных плагинов (без загрузки их интерфейса)
+        plugin_manager.discover_plugins()
+        plugin_manager.load_plugin_models()
+        with tracer.span(f"Команда: {args.command}", "cli"):
+            return args.handler(args)
+    except CommandError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    except (OSError, sqlite3.Error, ValueError) as e:
+        logger.debug("Command failed", exc_info=True)
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.query_stats:
+            query_stats.dump(args.query_stats)
+        if args.trace:
+            tracer.dump(args.trace)
+        db_manager.close()
\ No newline at end of file
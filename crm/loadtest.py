@@ -0,0 +1,105 @@
+"""
+Нагрузочный тест HTTP API: python -m crm.loadtest
+
+Несколько потоков с keep-alive соединениями запрашивают один путь заданное
+время; выводятся запросы в секунду, перцентили задержки и коды ответов.
+
+Примеры:
+    python -m crm.loadtest --path "/api/clients?limit=50" --threads 8 --duration 10
+    python -m crm.loadtest --path "/api/clients?limit=50" --etag   # с If-None-Match
+"""
+import argparse
+import http.client
+import threading
+import time
+from collections import Counter
+from typing import List
+from urllib.parse import urlsplit
+
+
+def _worker(host: str, port: int, path: str, use_etag: bool, deadline: float,
+            latencies: List[float], statuses: Counter, lock: threading.Lock):
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    local_latencies, local_statuses = [], Counter()
+    etag = None
+    try:
+        while time.perf_counter() < deadline:
+            headers = {"If-None-Match": etag} if etag else {}
+            start = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                local_statuses["error"] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=10)
+                continue
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[response.status] += 1
+            if use_etag and response.status == 200:
+                etag = response.getheader("ETag")
+    finally:
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def run(url: str, path: str, threads: int, duration: float, use_etag: bool = False) -> dict:
+    """Запускает нагрузку и возвращает сводку"""
+    parts = urlsplit(url)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    workers = [threading.Thread(target=_worker,
+                                args=(parts.hostname, parts.port or 80, path, use_etag,
+                                      deadline, latencies, statuses, lock))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "statuses": dict(statuses)
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m crm.loadtest", description="Нагрузочный тест API")
+    parser.add_argument("--url", default="http://127.0.0.1:8765", help="Адрес сервера API")
+    parser.add_argument("--path", default="/api/clients?limit=50", help="Запрашиваемый путь")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность, с")
+    parser.add_argument("--etag", action="store_true", help="Повторять запрос с If-None-Match")
+    args = parser.parse_args(argv)
+
+    result = run(args.url, args.path, args.threads, args.duration, args.etag)
+    print(f"Запросов: {result['requests']} за {args.duration:.0f} с, "
+          f"{result['rps']:.0f} запросов/с ({args.threads} потоков)")
+    print(f"Задержка: p50 {result['p50_ms']:.2f} мс, p95 {result['p95_ms']:.2f} мс, "
+          f"p99 {result['p99_ms']:.2f} мс")
+    print(f"Ответы: {result['statuses']}")
+    return 0 if "error" not in result["statuses"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
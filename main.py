@@ -4,25 +4,89 @@
 import sys
 import os
 import logging
+import importlib
+import time
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
 from tkinter import messagebox
 from pathlib import Path
 
 # Добавляем корневую директорию в путь
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from utils.profiler import startup_profiler
+from utils.tracing import tracer
+from utils.watchdog import ui_watchdog
+
 import customtkinter as ctk
 from PIL import Image
 
-from core.config import Config
+from core.config import Config, BASE_DIR
 from core.database import db_manager
+from core.models import Client
+from core.watcher import change_watcher
+from core.query_stats import query_stats
 from ui.styles import Styles
-from modules.clients import ClientsModule
-from modules.reports import ReportsModule
-from modules.settings import SettingsModule
-from modules.plugins import PluginsModule
 from utils.dependencies import setup_client_dependencies  # Импортируем зависимости
 
 
+# Модули приложения: (название, иконка, "пакет.модуль:Класс", нужна ли БД).
+# Импортируются и создаются при первом открытии.
+CORE_MODULES = [
+    ("Клиенты", "👥", "modules.clients:ClientsModule", True),
+    ("Отчеты", "📊", "modules.reports:ReportsModule", True),
+]
+SYSTEM_MODULES = [
+    ("Плагины", "🔌", "modules.plugins:PluginsModule", True),
+    ("Диагностика", "🩺", "modules.diagnostics:DiagnosticsModule", False),
+    ("Настройки", "⚙️", "modules.settings:SettingsModule", False),
+]
+
+
+class LazyModule:
+    """Модуль, который импортируется и создается при первом обращении"""
+
+    def __init__(self, name: str, icon: str, import_path: str, requires_db: bool = True):
+        self.MODULE_NAME = name
+        self.icon = icon
+        self.import_path = import_path
+        self.requires_db = requires_db  # Кнопка доступна только после загрузки БД
+        self._instance = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._instance is not None
+
+    @property
+    def instance(self):
+        """Импортирует модуль и создает его экземпляр (один раз)"""
+        if self._instance is None:
+            module_path, class_name = self.import_path.split(":")
+            start = time.perf_counter()
+            with tracer.span("Загрузка модуля", "ui", module=self.MODULE_NAME):
+                module_class = getattr(importlib.import_module(module_path), class_name)
+                self._instance = module_class()
+            logging.getLogger(__name__).info(
+                f"Module '{self.MODULE_NAME}' loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return self._instance
+
+    def get_ui_component(self, parent):
+        """Возвращает UI компонент модуля"""
+        return self.instance.get_ui_component(parent)
+
+    def on_show(self):
+        """Передает модулю событие показа"""
+        if self.is_loaded:
+            self.instance.on_show()
+
+    def on_hide(self):
+        """Передает модулю событие скрытия"""
+        if self.is_loaded:
+            self.instance.on_hide()
+
+
 class PluginModuleWrapper:
     """Обертка для плагинов, чтобы они работали как модули"""
 
@@ -36,28 +100,55 @@ class PluginModuleWrapper:
         """Возвращает UI компонент плагина"""
         return self.plugin.get_ui_component(parent)
 
+    def on_show(self):
+        """Передает плагину событие показа"""
+        if hasattr(self.plugin, 'on_show'):
+            self.plugin.on_show()
+
+    def on_hide(self):
+        """Передает плагину событие скрытия"""
+        if hasattr(self.plugin, 'on_hide'):
+            self.plugin.on_hide()
+
 
 class FlexCRMApp:
     """Главное приложение CRM"""
 
+    # Период опроса очереди событий фоновой загрузки, мс
+    BOOTSTRAP_POLL_MS = 50
+
     def __init__(self):
-        self.root = ctk.CTk()
-        self.setup_window()
         self.setup_logging()
-        self.setup_database()
+        self.setup_tracing()
+        startup_profiler.mark("imports")
+        with startup_profiler.phase("window"):
+            self.root = ctk.CTk()
+            self.setup_window()
 
-        # Настраиваем зависимости перед инициализацией модулей
+        # Зависимости между полями не требуют БД - настраиваем сразу
         self.setup_dependencies()
 
         self.modules = []
         self.plugin_modules = []
         self.current_module = None
+        self.sidebar_buttons = {}
+        self.db_ready = False
 
-        # Загружаем плагины
-        self.load_plugins()
+        # Построенные интерфейсы модулей (LRU: последние показанные в конце)
+        self.module_views = OrderedDict()
+        self.welcome_frame = None
+        self.splash = None
 
-        # Инициализация модулей
-        self.init_modules()
+        # Фоновая загрузка (БД, миграции, плагины): поток кладет события
+        # в очередь, UI забирает их по таймеру root.after
+        self.bootstrap_queue = queue.Queue()
+        self.bootstrap_thread = None
+        self.api_server = None
+        self.change_poll_ms = 0
+
+        # Регистрация модулей (без импорта)
+        with startup_profiler.phase("module init"):
+            self.init_modules()
 
     def setup_window(self):
         """Настраивает главное окно"""
@@ -68,6 +159,33 @@ class FlexCRMApp:
         # Устанавливаем тему
         Styles.setup_theme()
 
+    def setup_tracing(self):
+        """Включает трассировку действий (отладочная настройка trace_enabled)"""
+        if Config.get_setting("trace_enabled", Config.TRACE_ENABLED):
+            tracer.enable()
+
+    def start_ui_watchdog(self):
+        """Запускает измерение задержек главного цикла (настройки ui_watchdog_enabled, ui_stall_ms)"""
+        ui_watchdog.configure(
+            enabled=Config.get_setting("ui_watchdog_enabled", Config.UI_WATCHDOG_ENABLED),
+            heartbeat_ms=Config.UI_HEARTBEAT_MS,
+            stall_ms=Config.get_setting("ui_stall_ms", Config.UI_STALL_MS),
+            sample_stacks=Config.get_setting("ui_stack_sampling", Config.UI_STACK_SAMPLING),
+            window=Config.UI_LAG_WINDOW,
+            log_size=Config.UI_STALL_LOG_SIZE)
+        ui_watchdog.start(self.root)
+
+    def save_trace(self):
+        """Сохраняет записанную трассу в traces/ (открывается в chrome://tracing)"""
+        if not tracer.enabled or not tracer.events:
+            return
+        try:
+            trace_dir = BASE_DIR / "traces"
+            trace_dir.mkdir(exist_ok=True)
+            tracer.dump(str(trace_dir / f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+        except OSError as e:
+            self.logger.warning(f"Failed to save trace: {e}")
+
     def setup_logging(self):
         """Настраивает логирование"""
         logging.basicConfig(
@@ -77,13 +195,19 @@ class FlexCRMApp:
         self.logger = logging.getLogger(__name__)
 
     def setup_database(self):
-        """Настраивает базу данных"""
-        try:
+        """Подключает базу данных и обновляет схему (вызывается из фонового потока)"""
+        self._post_bootstrap("progress", (0.1, "Подключение к базе данных..."))
+        query_stats.configure(
+            enabled=Config.get_setting("query_stats_enabled", Config.QUERY_STATS_ENABLED),
+            slow_query_ms=Config.get_setting("slow_query_ms", Config.SLOW_QUERY_MS))
+        with startup_profiler.phase("DB connect"):
             db_manager.connect()
-            self.logger.info("Database initialized successfully")
-        except Exception as e:
-            self.logger.error(f"Failed to initialize database: {e}")
-            messagebox.showerror("Ошибка", f"Ошибка инициализации БД: {e}")
+
+        self._post_bootstrap("progress", (0.3, "Обновление структуры базы данных..."))
+        with startup_profiler.phase("migrations"):
+            # Схема клиентов нужна отчетам и плагинам еще до открытия модуля "Клиенты"
+            Client.initialize_table()
+        self.logger.info("Database initialized successfully")
 
     def setup_dependencies(self):
         """Настраивает зависимости между полями"""
@@ -94,45 +218,164 @@ class FlexCRMApp:
             self.logger.warning(f"Failed to setup dependencies: {e}")
 
     def load_plugins(self):
-        """Загружает включенные плагины"""
+        """Загружает включенные плагины (вызывается из фонового потока)"""
         try:
             from plugins import plugin_manager
 
+            self._post_bootstrap("progress", (0.5, "Поиск плагинов..."))
             plugin_manager.discover_plugins()
             self.logger.info(f"Найдено плагинов: {len(plugin_manager.plugins)}")
 
-            for plugin_id, plugin_info in plugin_manager.plugins.items():
-                if plugin_manager.is_plugin_enabled(plugin_id):
-                    # Пытаемся загрузить плагин, если еще не загружен
-                    if plugin_id not in plugin_manager.loaded_plugins:
-                        if not plugin_manager.enable_plugin(plugin_id):
-                            self.logger.warning(f"Не удалось загрузить плагин: {plugin_id}")
-                            continue
-
-                    plugin_instance = plugin_manager.get_plugin_module(plugin_id)
-                    if plugin_instance:
-                        self.plugin_modules.append(plugin_instance)
-                        self.logger.info(f"Загружен плагин: {plugin_id}")
+            enabled = [plugin_id for plugin_id in plugin_manager.plugins
+                       if plugin_manager.is_plugin_enabled(plugin_id)]
+            for i, plugin_id in enumerate(enabled):
+                plugin_name = plugin_manager.plugins[plugin_id].get('name', plugin_id)
+                self._post_bootstrap("progress", (0.5 + 0.5 * i / len(enabled),
+                                                  f"Загрузка плагина: {plugin_name}..."))
+
+                # Пытаемся загрузить плагин, если еще не загружен.
+                # Диалоги из фонового потока не показываем - ошибку отдаем в UI
+                if plugin_id not in plugin_manager.loaded_plugins:
+                    if not plugin_manager.enable_plugin(plugin_id, show_errors=False):
+                        self.logger.warning(f"Не удалось загрузить плагин: {plugin_id}")
+                        error = plugin_manager.errors.get(plugin_id, "")
+                        self._post_bootstrap("error", f"Не удалось включить плагин {plugin_id}:\n{error}")
+                        continue
+
+                plugin_instance = plugin_manager.get_plugin_module(plugin_id)
+                if plugin_instance:
+                    self._post_bootstrap("plugin", plugin_instance)
+                    self.logger.info(f"Загружен плагин: {plugin_id}")
         except Exception as e:
             self.logger.error(f"Ошибка загрузки плагинов: {e}")
             # Не показываем ошибку пользователю, если плагины не загрузились
 
     def init_modules(self):
-        """Инициализирует все модули"""
-        # Регистрируем стандартные модули
-        self.modules.append(ClientsModule())
-        self.modules.append(ReportsModule())
+        """Регистрирует модули (сами модули загружаются при первом открытии)"""
+        # Регистрируем стандартные модули; плагины добавляются после фоновой загрузки
+        for name, icon, import_path, requires_db in CORE_MODULES + SYSTEM_MODULES:
+            self.modules.append(LazyModule(name, icon, import_path, requires_db))
 
-        # Добавляем плагины как модули
-        for plugin in self.plugin_modules:
-            plugin_wrapper = PluginModuleWrapper(plugin)
-            self.modules.append(plugin_wrapper)
+        self.logger.info(f"Зарегистрировано {len(self.modules)} модулей")
 
-        # Модуль управления плагинами и настройки
-        self.modules.append(PluginsModule())
-        self.modules.append(SettingsModule())
+    def _post_bootstrap(self, event: str, payload=None):
+        """Передает событие фоновой загрузки в поток UI"""
+        self.bootstrap_queue.put((event, payload))
 
-        self.logger.info(f"Загружено {len(self.modules)} модулей")
+    def _bootstrap_worker(self):
+        """Фоновая загрузка: БД, миграции, плагины. Виджеты здесь не трогаем"""
+        try:
+            self.setup_database()
+        except Exception as e:
+            self.logger.error(f"Failed to initialize database: {e}")
+            self._post_bootstrap("error", f"Ошибка инициализации БД: {e}")
+        else:
+            self._post_bootstrap("db_ready")
+            with startup_profiler.phase("plugin discovery"):
+                self.load_plugins()
+            self.compact_changelog()
+            self.start_api()
+        finally:
+            self._post_bootstrap("done")
+
+    def compact_changelog(self):
+        """Периодическое сжатие журнала изменений (не чаще CHANGELOG_COMPACT_HOURS)"""
+        try:
+            from core.changelog import compact_if_due
+
+            compact_if_due()
+        except Exception as e:
+            self.logger.warning(f"Changelog compaction failed: {e}")
+
+    def start_api(self):
+        """Запускает встроенный HTTP API, если он включен в настройках (api_enabled)"""
+        if not Config.get_setting("api_enabled", False):
+            return
+        try:
+            from crm.api import start_api_server
+
+            self.api_server = start_api_server(
+                Config.get_setting("api_host", Config.API_HOST),
+                int(Config.get_setting("api_port", Config.API_PORT)))
+        except Exception as e:
+            self.logger.error(f"Failed to start API server: {e}")
+
+    def start_bootstrap(self):
+        """Запускает фоновую загрузку и опрос ее событий"""
+        self.bootstrap_thread = threading.Thread(
+            target=self._bootstrap_worker, name="bootstrap", daemon=True)
+        self.bootstrap_thread.start()
+        self.root.after(self.BOOTSTRAP_POLL_MS, self._poll_bootstrap)
+
+    def _poll_bootstrap(self):
+        """Применяет события фоновой загрузки к интерфейсу"""
+        done = False
+        while True:
+            try:
+                event, payload = self.bootstrap_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if event == "progress":
+                self._update_splash(*payload)
+            elif event == "db_ready":
+                self.db_ready = True
+                self._update_sidebar_state()
+            elif event == "plugin":
+                self._add_plugin_module(payload)
+            elif event == "error":
+                messagebox.showerror("Ошибка", payload)
+            elif event == "done":
+                done = True
+
+        if done:
+            self._finish_bootstrap()
+        else:
+            self.root.after(self.BOOTSTRAP_POLL_MS, self._poll_bootstrap)
+
+    def _finish_bootstrap(self):
+        """Завершает загрузку: убирает заставку и показывает экран приветствия"""
+        if self.splash is not None:
+            self.splash.destroy()
+            self.splash = None
+            if self.current_module is None:
+                self.create_welcome_screen()
+        startup_profiler.report(Config.STARTUP_BUDGET_MS)
+        if self.db_ready:
+            self.start_change_watcher()
+
+    def start_change_watcher(self):
+        """Запускает опрос изменений, сделанных другими копиями приложения (change_poll_ms)"""
+        try:
+            self.change_poll_ms = int(Config.get_setting("change_poll_ms", Config.CHANGE_POLL_MS))
+        except (TypeError, ValueError):
+            self.change_poll_ms = Config.CHANGE_POLL_MS
+        if self.change_poll_ms > 0:
+            self.root.after(self.change_poll_ms, self._poll_changes)
+
+    def _poll_changes(self):
+        """Передает открытым модулям изменения других копий приложения"""
+        try:
+            change_watcher.poll()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Change polling failed: {e}")
+        self.root.after(self.change_poll_ms, self._poll_changes)
+
+    def _add_plugin_module(self, plugin):
+        """Добавляет загруженный плагин в список модулей и в боковую панель"""
+        plugin_wrapper = PluginModuleWrapper(plugin)
+        self.plugin_modules.append(plugin)
+        self.modules.append(plugin_wrapper)
+        self._create_module_button(plugin_wrapper)
+
+    def _is_module_ready(self, module) -> bool:
+        """Можно ли открыть модуль (модулям с данными нужна загруженная БД)"""
+        return self.db_ready or not getattr(module, 'requires_db', True)
+
+    def _update_sidebar_state(self):
+        """Включает кнопки модулей, готовых к работе"""
+        for module, button in self.sidebar_buttons.items():
+            button.configure(state="normal" if self._is_module_ready(module) else "disabled")
 
     def create_sidebar(self):
         """Создает боковую панель"""
@@ -144,78 +387,30 @@ class FlexCRMApp:
         header = Styles.create_header_label(sidebar, Config.APP_NAME)
         header.pack(pady=20)
 
-        # Кнопки основных модулей (кроме настроек и плагинов)
-        for i, module in enumerate(self.modules):
-            # Пропускаем специальные модули в основном списке
-            if module.MODULE_NAME in ["Настройки", "Плагины"]:
+        # Кнопки основных модулей (кроме системных).
+        # Плагины добавляются в этот же контейнер по мере загрузки
+        self.module_buttons_frame = ctk.CTkFrame(sidebar, fg_color="transparent")
+        self.module_buttons_frame.pack(fill="x")
+        system_names = [name for name, _, _, _ in SYSTEM_MODULES]
+        for module in self.modules:
+            # Пропускаем системные модули в основном списке
+            if module.MODULE_NAME in system_names:
                 continue
-
-            # Проверяем, является ли это плагином
-            is_plugin = hasattr(module, 'plugin')
-
-            # Определяем иконку и цвет
-            if module.MODULE_NAME == "Клиенты":
-                icon = "👥"
-                bg_color = "#2D3748"
-                hover_color = "#4A5568"
-            elif module.MODULE_NAME == "Отчеты":
-                icon = "📊"
-                bg_color = "#2D3748"
-                hover_color = "#4A5568"
-            elif is_plugin:
-                # Для плагинов используем иконку из плагина
-                icon = module.plugin.get_sidebar_icon()
-                bg_color = "#2A4D69"  # Синий для плагинов
-                hover_color = "#3B6C8C"
-            else:
-                icon = "📦"
-                bg_color = "#2D3748"
-                hover_color = "#4A5568"
-
-            btn = ctk.CTkButton(
-                sidebar,
-                text=f"{icon} {module.MODULE_NAME}",
-                command=lambda m=module: self.switch_module(m),
-                height=45,
-                font=("Arial", 14),
-                fg_color=bg_color,
-                hover_color=hover_color,
-                border_width=1,
-                border_color="#4A5568",
-                corner_radius=8,
-                anchor="w"
-            )
-            btn.pack(fill="x", padx=10, pady=5)
+            self._create_module_button(module)
 
         # Разделитель перед системными модулями
         separator = ctk.CTkFrame(sidebar, height=2, fg_color="#555555")
         separator.pack(fill="x", padx=20, pady=20)
 
-        # Добавляем модуль "Плагины"
-        plugins_module = next((m for m in self.modules if m.MODULE_NAME == "Плагины"), None)
-        if plugins_module:
-            plugins_btn = ctk.CTkButton(
-                sidebar,
-                text="🔌 Плагины",
-                command=lambda m=plugins_module: self.switch_module(m),
-                height=45,
-                font=("Arial", 14),
-                fg_color="#333333",
-                hover_color="#444444",
-                border_width=1,
-                border_color="#555555",
-                corner_radius=8,
-                anchor="w"
-            )
-            plugins_btn.pack(fill="x", padx=10, pady=5)
-
-        # Добавляем кнопку "Настройки"
-        settings_module = next((m for m in self.modules if m.MODULE_NAME == "Настройки"), None)
-        if settings_module:
-            settings_btn = ctk.CTkButton(
+        # Системные модули (плагины, диагностика, настройки)
+        for name in system_names:
+            module = next((m for m in self.modules if m.MODULE_NAME == name), None)
+            if module is None:
+                continue
+            button = ctk.CTkButton(
                 sidebar,
-                text="⚙️ Настройки",
-                command=lambda m=settings_module: self.switch_module(m),
+                text=f"{module.icon} {module.MODULE_NAME}",
+                command=lambda m=module: self.switch_module(m),
                 height=45,
                 font=("Arial", 14),
                 fg_color="#333333",
@@ -225,7 +420,8 @@ class FlexCRMApp:
                 corner_radius=8,
                 anchor="w"
             )
-            settings_btn.pack(fill="x", padx=10, pady=5)
+            button.pack(fill="x", padx=10, pady=5)
+            self.sidebar_buttons[module] = button
 
         # Разделитель
         separator = ctk.CTkFrame(sidebar, height=2, fg_color="#555555")
@@ -246,8 +442,45 @@ class FlexCRMApp:
         )
         exit_btn.pack(side="bottom", fill="x", padx=10, pady=10)
 
+        # До загрузки БД доступны только модули, которым она не нужна
+        self._update_sidebar_state()
+
         return sidebar
 
+    def _create_module_button(self, module):
+        """Создает кнопку модуля в основном списке боковой панели"""
+        # Проверяем, является ли это плагином
+        is_plugin = hasattr(module, 'plugin')
+
+        # Определяем иконку и цвет
+        if is_plugin:
+            # Для плагинов используем иконку из плагина
+            icon = module.plugin.get_sidebar_icon()
+            bg_color = "#2A4D69"  # Синий для плагинов
+            hover_color = "#3B6C8C"
+        else:
+            icon = getattr(module, 'icon', "📦")
+            bg_color = "#2D3748"
+            hover_color = "#4A5568"
+
+        btn = ctk.CTkButton(
+            self.module_buttons_frame,
+            text=f"{icon} {module.MODULE_NAME}",
+            command=lambda m=module: self.switch_module(m),
+            height=45,
+            font=("Arial", 14),
+            fg_color=bg_color,
+            hover_color=hover_color,
+            border_width=1,
+            border_color="#4A5568",
+            corner_radius=8,
+            anchor="w",
+            state="normal" if self._is_module_ready(module) else "disabled"
+        )
+        btn.pack(fill="x", padx=10, pady=5)
+        self.sidebar_buttons[module] = btn
+        return btn
+
     def create_main_area(self):
         """Создает основную область"""
         main_area = ctk.CTkFrame(self.root)
@@ -268,27 +501,114 @@ class FlexCRMApp:
 
         return main_area
 
+    def get_view_cache_size(self) -> int:
+        """Сколько интерфейсов модулей держать построенными"""
+        try:
+            size = int(Config.get_setting("module_view_cache_size", Config.MODULE_VIEW_CACHE_SIZE))
+        except (TypeError, ValueError):
+            size = Config.MODULE_VIEW_CACHE_SIZE
+        return max(1, size)
+
     def switch_module(self, module):
         """Переключает активный модуль"""
+        with tracer.span("Переключение модуля", "ui", module=module.MODULE_NAME):
+            self._switch_module(module)
+        # Новый интерфейс раскладывается и рисуется в idle-задачах Tk
+        tracer.until_idle(self.root, "Отрисовка модуля", module=module.MODULE_NAME)
+
+    def _switch_module(self, module):
+        previous = self.current_module
         self.current_module = module
 
         # Обновляем заголовок
         self.module_title.configure(text=module.MODULE_NAME)
 
-        # Очищаем контейнер
-        for widget in self.module_container.winfo_children():
-            widget.destroy()
-
-        # Добавляем UI модуля
-        module_ui = module.get_ui_component(self.module_container)
-        module_ui.pack(fill="both", expand=True)
+        # Экран приветствия и заставка нужны только до первого выбора модуля
+        if self.welcome_frame is not None:
+            self.welcome_frame.destroy()
+            self.welcome_frame = None
+        if self.splash is not None:
+            self.splash.destroy()
+            self.splash = None
+
+        # Прячем предыдущий модуль (интерфейс остается построенным)
+        if previous is not None and previous is not module and previous in self.module_views:
+            self.module_views[previous].pack_forget()
+            self._call_module_hook(previous, "on_hide")
+
+        view = self.module_views.get(module)
+        if view is None or not view.winfo_exists():
+            with tracer.span("Построение интерфейса", "ui", module=module.MODULE_NAME):
+                view = module.get_ui_component(self.module_container)
+            self.module_views[module] = view
+        self.module_views.move_to_end(module)
+
+        view.pack(fill="both", expand=True)
+        self._evict_module_views()
+        self._call_module_hook(module, "on_show")
 
         self.logger.info(f"Switched to module: {module.MODULE_NAME}")
 
+    def _evict_module_views(self):
+        """Уничтожает давно не открывавшиеся интерфейсы сверх лимита"""
+        cache_size = self.get_view_cache_size()
+        while len(self.module_views) > cache_size:
+            module, view = next(iter(self.module_views.items()))
+            if module is self.current_module:
+                break
+            del self.module_views[module]
+            view.destroy()
+            self.logger.info(f"Evicted module view: {module.MODULE_NAME}")
+
+    def _call_module_hook(self, module, hook_name: str):
+        """Вызывает необязательный хук модуля (on_show/on_hide)"""
+        hook = getattr(module, hook_name, None)
+        if hook is None:
+            return
+        try:
+            with tracer.span(hook_name, "ui", module=module.MODULE_NAME):
+                hook()
+        except Exception as e:
+            self.logger.error(f"Ошибка в {hook_name} модуля {module.MODULE_NAME}: {e}")
+
+    def create_splash_screen(self):
+        """Создает заставку с прогрессом фоновой загрузки"""
+        splash = ctk.CTkFrame(self.module_container)
+        splash.pack(fill="both", expand=True)
+        self.splash = splash
+
+        title = ctk.CTkLabel(
+            splash,
+            text=Config.APP_NAME,
+            font=("Arial", 28, "bold"),
+            text_color=Styles.PRIMARY_COLOR
+        )
+        title.pack(pady=(150, 20))
+
+        self.splash_status = ctk.CTkLabel(
+            splash,
+            text="Запуск...",
+            font=("Arial", 14),
+            text_color="gray"
+        )
+        self.splash_status.pack(pady=(0, 10))
+
+        self.splash_progress = ctk.CTkProgressBar(splash, width=400)
+        self.splash_progress.set(0)
+        self.splash_progress.pack()
+
+    def _update_splash(self, progress: float, text: str):
+        """Обновляет прогресс на заставке (если она еще показана)"""
+        if self.splash is None:
+            return
+        self.splash_progress.set(progress)
+        self.splash_status.configure(text=text)
+
     def create_welcome_screen(self):
         """Создает экран приветствия"""
         welcome_frame = ctk.CTkFrame(self.module_container)
         welcome_frame.pack(fill="both", expand=True)
+        self.welcome_frame = welcome_frame
 
         # Текст приветствия с описанием новых функций
         welcome_text = """
@@ -321,6 +641,11 @@ class FlexCRMApp:
     def on_closing(self):
         """Обрабатывает закрытие приложения"""
         try:
+            if self.api_server is not None:
+                self.api_server.shutdown()
+                self.api_server.server_close()
+            ui_watchdog.stop()
+            self.save_trace()
             db_manager.close()
             self.logger.info("Application closed")
         except:
@@ -329,6 +654,11 @@ class FlexCRMApp:
             self.root.quit()
             self.root.destroy()
 
+    def _on_first_paint(self):
+        """Фиксирует время до первой отрисовки окна"""
+        self.root.update_idletasks()
+        startup_profiler.mark("first paint")
+
     def run(self):
         """Запускает приложение"""
         try:
@@ -336,12 +666,23 @@ class FlexCRMApp:
             self.create_sidebar()
             main_area = self.create_main_area()
 
-            # Показываем экран приветствия
-            self.create_welcome_screen()
+            # Пока идет фоновая загрузка, показываем заставку
+            # (экран приветствия появится после ее завершения)
+            self.create_splash_screen()
 
             # Обработка закрытия окна
             self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+            # Первая отрисовка: idle-задачи Tk выполняются после построения окна
+            startup_profiler.mark("UI build")
+            self.root.after_idle(self._on_first_paint)
+
+            # БД, миграции и плагины загружаются в фоне
+            self.start_bootstrap()
+
+            # Задержки главного цикла меряются с самого запуска
+            self.start_ui_watchdog()
+
             # Запуск главного цикла
             self.root.mainloop()
 
@@ -1,9 +1,10 @@
 """
 Базовый класс для модулей
+
+Не зависит от customtkinter: виджеты создают только реализации get_ui_component
 """
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
-import customtkinter as ctk
 from core.database import db_manager
 from core.models import BaseModel
 
@@ -19,8 +20,8 @@ class BaseModule(ABC):
         self.custom_fields = []
 
     @abstractmethod
-    def get_ui_component(self, parent) -> ctk.CTkFrame:
-        """Возвращает UI компонент модуля"""
+    def get_ui_component(self, parent) -> Any:
+        """Возвращает UI компонент модуля (CTkFrame)"""
         pass
 
     @abstractmethod
@@ -28,6 +29,14 @@ class BaseModule(ABC):
         """Инициализирует таблицы БД для модуля"""
         pass
 
+    def on_show(self):
+        """Вызывается при показе интерфейса модуля (можно обновить данные)"""
+        pass
+
+    def on_hide(self):
+        """Вызывается, когда интерфейс модуля скрыт, но остается построенным"""
+        pass
+
     def add_custom_field(self, field):
         """Добавляет пользовательское поле"""
         self.custom_fields.append(field)
@@ -4,54 +4,22 @@
 import customtkinter as ctk
 from tkinter import messagebox
 from typing import Dict, Any, List, Tuple
+from tkinter import filedialog
 from datetime import datetime
 import re
 
+from core.config import Config
 from core.database import db_manager
-from core.models import BaseModel, CustomField
+from core.models import BaseModel, CustomField, Client, ConflictError
+from core.reports import RowSource
+from core.export import export_csv
+from core.watcher import change_watcher, TableChanges
 from modules.base_module import BaseModule
 from ui.styles import Styles
 from utils.validators import Validators
-
-
-class Client(BaseModel):
-    """Модель клиента"""
-
-    TABLE_NAME = "clients"
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.name = kwargs.get('name', '')
-        self.email = kwargs.get('email', '')
-        self.phone = kwargs.get('phone', '')
-        self.company = kwargs.get('company', '')
-        self.status = kwargs.get('status', 'активный')  # active, inactive, lead
-        self.notes = kwargs.get('notes', '')
-
-        # Динамические пользовательские поля
-        for key, value in kwargs.items():
-            if key not in ['id', 'name', 'email', 'phone', 'company',
-                           'status', 'notes', 'created_at', 'updated_at']:
-                setattr(self, key, value)
-
-    def to_dict(self) -> Dict[str, Any]:
-        data = {
-            'name': self.name,
-            'email': self.email,
-            'phone': Validators.format_phone(self.phone) if self.phone else '',
-            'company': self.company,
-            'status': self.status,
-            'notes': self.notes,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at
-        }
-        if self.id:
-            data['id'] = self.id
-        return data
-
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Client':
-        return cls(**data)
+from utils.dependencies import dependency_manager, setup_client_dependencies
+from ui.widgets import apply_to_widgets
+from utils.tracing import tracer, traced
 
 
 class ClientsModule(BaseModule):
@@ -60,13 +28,35 @@ class ClientsModule(BaseModule):
     MODULE_NAME = "Клиенты"
     MODULE_VERSION = "1.0"
 
+    # Колонки таблицы, сортируемые в БД (по ним построены индексы)
+    SORTABLE_COLUMNS = {"ID": "id", "Имя": "name", "Компания": "company", "Статус": "status"}
+    # Фасеты фильтрации: колонка -> заголовок панели
+    FACET_COLUMNS = {"status": "Статус", "company": "Компания"}
+    FACET_LIMIT = 20
+
     def __init__(self):
         super().__init__()
         self.model_class = Client
         self.initialize_database()
         self._setup_default_fields()
         self.selected_client_id = None  # ID выбранного клиента для удаления/редактирования
-        self.field_dependencies = {}  # Зависимости между полями
+        self.selected_client_version = None  # Версия записи, загруженной в форму редактирования
+        self.selected_ids = set()  # Клиенты, отмеченные для массовых операций
+        self.selection_filter = None  # (where, params), если выбраны все по фильтру
+
+        # Состояние списка: сортировка, фильтры фасетов и кэш GROUP BY
+        self.sort_column = "id"
+        self.sort_desc = False
+        self.facet_filters = {column: None for column in self.FACET_COLUMNS}
+        self._facet_cache = {}
+        self._facet_cache_version = None
+        self._grid_version = None
+        self.page = 0  # Текущая страница таблицы (размер - настройка max_rows_per_page)
+        # Виджеты строк таблицы по ID клиента: изменения других копий
+        # приложения обновляют только эти строки (см. _on_external_changes)
+        self.row_widgets = {}
+        self._grid_has_new = False  # другие копии добавили клиентов после загрузки таблицы
+        change_watcher.subscribe(Client.TABLE_NAME, self._on_external_changes)
 
     def _setup_default_fields(self):
         """Настраивает поля по умолчанию"""
@@ -76,37 +66,20 @@ class ClientsModule(BaseModule):
             CustomField("phone", "phone", "Телефон", required=True),
             CustomField("company", "text", "Компания", required=False),
             CustomField("status", "select", "Статус", required=True,
-                        options=['активный', 'неактивный', 'потенциальный']),
+                        options=list(Client.STATUS_OPTIONS)),
             CustomField("notes", "textarea", "Заметки", required=False)
         ]
 
-        # Настраиваем зависимости между полями
-        self._setup_field_dependencies()
-
-    def _setup_field_dependencies(self):
-        """Настраивает зависимости между полями"""
-        self.field_dependencies = {
-            'status': {
-                'trigger_value': 'потенциальный',
-                'dependent_field': 'company',
-                'action': 'make_required',
-                'message': 'Для потенциальных клиентов обязательно указание компании'
-            }
-        }
+        # Зависимости между полями задаются в utils.dependencies
+        setup_client_dependencies()
 
     def initialize_database(self):
         """Создает таблицу клиентов"""
+        # Пользовательские поля добавляются к базовой схеме модели
         schema = self.get_fields_schema()
-        schema.update({
-            'name': 'TEXT NOT NULL',
-            'email': 'TEXT',
-            'phone': 'TEXT',
-            'company': 'TEXT',
-            'status': 'TEXT DEFAULT "активный"',
-            'notes': 'TEXT'
-        })
-
-        db_manager.create_table(Client.TABLE_NAME, schema)
+        extra_columns = {name: sql_type for name, sql_type in schema.items()
+                         if name not in Client.SCHEMA}
+        Client.initialize_table(extra_columns)
 
     def get_fields_schema(self) -> Dict[str, str]:
         schema = super().get_fields_schema()
@@ -135,25 +108,54 @@ class ClientsModule(BaseModule):
     def get_ui_component(self, parent) -> ctk.CTkFrame:
         """Создает интерфейс для модуля клиентов"""
         self.main_frame = ctk.CTkFrame(parent)
+        self.selected_client_id = None
 
-        # Создаем вкладки
-        self.tabview = ctk.CTkTabview(self.main_frame)
+        # Создаем вкладки (содержимое строится при первом открытии вкладки)
+        self.tabview = ctk.CTkTabview(self.main_frame, command=self._on_tab_change)
         self.tabview.pack(fill="both", expand=True, padx=10, pady=10)
 
+        self._tab_builders = {
+            "Список клиентов": self._create_list_view,
+            "Добавить клиента": self._create_add_form,
+            "Управление клиентом": self._create_edit_form
+        }
+        self._built_tabs = set()
+
         # Вкладка списка клиентов
         self.list_tab = self.tabview.add("Список клиентов")
-        self._create_list_view(self.list_tab)
 
         # Вкладка добавления клиента
         self.add_tab = self.tabview.add("Добавить клиента")
-        self._create_add_form(self.add_tab)
 
         # Вкладка удаления/редактирования
         self.edit_tab = self.tabview.add("Управление клиентом")
-        self._create_edit_form(self.edit_tab)
+
+        self._ensure_tab_built(self.tabview.get())
 
         return self.main_frame
 
+    def on_show(self):
+        """Обновляет список, если клиенты менялись, пока модуль был скрыт"""
+        if "Список клиентов" in self._built_tabs and \
+                self._grid_version != db_manager.table_version(Client.TABLE_NAME):
+            self._search_clients(keep_page=True)
+
+    def _ensure_tab_built(self, tab_name: str):
+        """Строит содержимое вкладки, если оно еще не создано"""
+        if tab_name in self._built_tabs:
+            return
+        self._built_tabs.add(tab_name)
+        self._tab_builders[tab_name](self.tabview.tab(tab_name))
+
+    def _on_tab_change(self):
+        """Обработчик переключения вкладки"""
+        self._ensure_tab_built(self.tabview.get())
+
+    def _show_tab(self, tab_name: str):
+        """Переключает на вкладку, построив ее при необходимости"""
+        self._ensure_tab_built(tab_name)
+        self.tabview.set(tab_name)
+
     def _create_list_view(self, parent):
         """Создает вид списка клиентов"""
         # Панель поиска
@@ -171,20 +173,183 @@ class ClientsModule(BaseModule):
                                      command=self._refresh_clients_list)
         refresh_btn.pack(side="left", padx=5)
 
+        self.rows_info_label = ctk.CTkLabel(search_frame, text="", text_color="gray")
+        self.rows_info_label.pack(side="right", padx=10)
+
+        # Панель массовых операций
+        self._create_bulk_actions(parent)
+
+        # Постраничная навигация (под таблицей)
+        pager_frame = ctk.CTkFrame(parent, fg_color="transparent")
+        pager_frame.pack(side="bottom", fill="x", padx=10, pady=(0, 10))
+        self.next_page_btn = ctk.CTkButton(pager_frame, text="Вперед ▶", width=100,
+                                           command=lambda: self._go_to_page(self.page + 1))
+        self.next_page_btn.pack(side="right", padx=5)
+        self.page_label = ctk.CTkLabel(pager_frame, text="")
+        self.page_label.pack(side="right", padx=10)
+        self.prev_page_btn = ctk.CTkButton(pager_frame, text="◀ Назад", width=100,
+                                           command=lambda: self._go_to_page(self.page - 1))
+        self.prev_page_btn.pack(side="right", padx=5)
+
+        content_frame = ctk.CTkFrame(parent, fg_color="transparent")
+        content_frame.pack(fill="both", expand=True, padx=10, pady=5)
+
+        # Панель фасетов (статус и компания)
+        self.facets_frame = ctk.CTkScrollableFrame(content_frame, width=220)
+        self.facets_frame.pack(side="left", fill="y", padx=(0, 5))
+
         # Таблица клиентов
-        columns = ["ID", "Имя", "Email", "Телефон", "Компания", "Статус", "Действия"]
-        self.tree_frame = ctk.CTkScrollableFrame(parent)
-        self.tree_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        columns = ["", "ID", "Имя", "Email", "Телефон", "Компания", "Статус", "Действия"]
+        self.tree_frame = ctk.CTkScrollableFrame(content_frame)
+        self.tree_frame.pack(side="left", fill="both", expand=True)
 
-        # Заголовки
+        # Заголовки (колонки с индексом сортируются по клику)
+        self.header_widgets = {}
         for i, col in enumerate(columns):
-            header = ctk.CTkLabel(self.tree_frame, text=col, font=("Arial", 12, "bold"))
+            if col in self.SORTABLE_COLUMNS:
+                header = ctk.CTkButton(
+                    self.tree_frame,
+                    text=col,
+                    font=("Arial", 12, "bold"),
+                    fg_color="transparent",
+                    hover_color="#4A5568",
+                    height=25,
+                    command=lambda c=col: self._sort_by(c)
+                )
+                self.header_widgets[col] = header
+            elif col == "":
+                # Отметить все видимые строки
+                self.select_all_var = ctk.BooleanVar(value=False)
+                header = ctk.CTkCheckBox(self.tree_frame, text="", width=20,
+                                         variable=self.select_all_var,
+                                         command=self._toggle_visible_selection)
+            else:
+                header = ctk.CTkLabel(self.tree_frame, text=col, font=("Arial", 12, "bold"))
             header.grid(row=0, column=i, padx=5, pady=5, sticky="ew")
             self.tree_frame.grid_columnconfigure(i, weight=1)
 
         # Загрузка данных
         self._load_clients_to_grid()
 
+    def _build_filters(self, search_term: str = None, exclude: str = None) -> Tuple[str, tuple]:
+        """Собирает WHERE для поиска и выбранных фасетов (кроме exclude)"""
+        conditions = []
+        params = []
+
+        if search_term:
+            conditions.append("(name LIKE ? OR email LIKE ? OR phone LIKE ?)")
+            params.extend([f"%{search_term}%"] * 3)
+
+        for column, value in self.facet_filters.items():
+            if column == exclude or value is None:
+                continue
+            if value == "":
+                conditions.append(f"({column} IS NULL OR {column} = '')")
+            else:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        return " AND ".join(conditions), tuple(params)
+
+    def _cached_query(self, key: tuple, loader):
+        """Возвращает результат агрегатного запроса из кэша (сбрасывается при записи в таблицу)"""
+        version = db_manager.table_version(Client.TABLE_NAME)
+        if version != self._facet_cache_version:
+            self._facet_cache = {}
+            self._facet_cache_version = version
+
+        if key not in self._facet_cache:
+            self._facet_cache[key] = loader()
+        return self._facet_cache[key]
+
+    def _get_facet_counts(self, column: str, search_term: str = None) -> List[Tuple[str, int]]:
+        """Возвращает количество клиентов по значениям колонки (GROUP BY, с кэшем)"""
+        where, params = self._build_filters(search_term, exclude=column)
+
+        def load():
+            counts = {}
+            for value, count in Client.count_by(column, where or None, params or None,
+                                                limit=self.FACET_LIMIT):
+                # NULL и пустая строка - одно значение "не указано"
+                value = value or ""
+                counts[value] = counts.get(value, 0) + count
+            return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+        return self._cached_query(("facet", column, where, params), load)
+
+    def _get_total_count(self, search_term: str = None) -> int:
+        """Возвращает количество клиентов с учетом фильтров (с кэшем)"""
+        where, params = self._build_filters(search_term)
+        return self._cached_query(("total", where, params),
+                                  lambda: Client.count(where or None, params or None))
+
+    def _render_facets(self, search_term: str = None):
+        """Перерисовывает панели фасетов"""
+        for widget in self.facets_frame.winfo_children():
+            widget.destroy()
+
+        for column, title in self.FACET_COLUMNS.items():
+            ctk.CTkLabel(self.facets_frame, text=title,
+                         font=("Arial", 13, "bold")).pack(anchor="w", padx=5, pady=(10, 5))
+
+            selected = self.facet_filters.get(column)
+            for value, count in self._get_facet_counts(column, search_term):
+                is_selected = selected is not None and selected == value
+                btn = ctk.CTkButton(
+                    self.facets_frame,
+                    text=f"{value or 'не указано'} ({count})",
+                    height=25,
+                    anchor="w",
+                    fg_color=Styles.PRIMARY_COLOR if is_selected else "transparent",
+                    hover_color="#4A5568",
+                    command=lambda c=column, v=value: self._toggle_facet(c, v)
+                )
+                btn.pack(fill="x", padx=5, pady=1)
+
+        reset_btn = ctk.CTkButton(self.facets_frame, text="Сбросить фильтры", height=28,
+                                  command=self._reset_facets)
+        reset_btn.pack(fill="x", padx=5, pady=(15, 5))
+
+    def _toggle_facet(self, column: str, value: str):
+        """Включает/выключает фильтр по значению фасета"""
+        if self.facet_filters.get(column) == value:
+            self.facet_filters[column] = None
+        else:
+            self.facet_filters[column] = value
+        self._search_clients()
+
+    def _reset_facets(self):
+        """Сбрасывает фильтры фасетов"""
+        self.facet_filters = {column: None for column in self.FACET_COLUMNS}
+        self._search_clients()
+
+    def _sort_by(self, header: str):
+        """Сортирует список по колонке (повторный клик меняет направление)"""
+        column = self.SORTABLE_COLUMNS[header]
+        if self.sort_column == column:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_column = column
+            self.sort_desc = False
+        self._search_clients()
+
+    def _update_headers(self):
+        """Показывает направление сортировки в заголовках"""
+        for header, button in self.header_widgets.items():
+            text = header
+            if self.SORTABLE_COLUMNS[header] == self.sort_column:
+                text += " ▼" if self.sort_desc else " ▲"
+            button.configure(text=text)
+
+    def _get_page_size(self):
+        """Возвращает ограничение строк в таблице из настроек"""
+        try:
+            page_size = int(Config.get_setting("max_rows_per_page", 50))
+        except (TypeError, ValueError):
+            return None  # "Все"
+        return page_size if page_size > 0 else None
+
+    @traced("Загрузка таблицы клиентов", "ui")
     def _load_clients_to_grid(self, search_term: str = None):
         """Загружает клиентов в таблицу"""
         # Очищаем старые данные (кроме заголовков)
@@ -192,22 +357,40 @@ class ClientsModule(BaseModule):
             if widget.grid_info()["row"] > 0:
                 widget.destroy()
 
-        # Получаем клиентов
-        if search_term:
-            clients = Client.get_all(where="name LIKE ? OR email LIKE ? OR phone LIKE ?",
-                                    params=(f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-        else:
-            clients = Client.get_all()
-
+        # Получаем клиентов (фильтрация и сортировка на стороне БД)
+        where, params = self._build_filters(search_term)
+        direction = "DESC" if self.sort_desc else "ASC"
+        order_by = f"{self.sort_column} {direction}"
+        if self.sort_column != "id":
+            order_by += f", id {direction}"
+
+        # Страница: при сокращении выборки номер страницы ограничивается последней
+        page_size = self._get_page_size()
+        offset = None
+        if page_size:
+            total = self._get_total_count(search_term)
+            self.page = max(0, min(self.page, (total - 1) // page_size))
+            offset = self.page * page_size
+        clients = Client.get_all(where=where or None, params=params or None,
+                                 order_by=order_by, limit=page_size, offset=offset)
+
+        self.row_check_vars = {}
+        self.row_widgets = {}
+        self._grid_has_new = False
         for i, client in enumerate(clients, start=1):
-            data = [client.id, client.name, client.email,
-                    Validators.format_phone(client.phone) if client.phone else "",
-                    client.company, client.status]
+            # Отметка для массовых операций
+            check_var = ctk.BooleanVar(value=self._is_selected(client.id))
+            check = ctk.CTkCheckBox(self.tree_frame, text="", width=20, variable=check_var,
+                                    command=lambda cid=client.id, v=check_var: self._toggle_selection(cid, v.get()))
+            check.grid(row=i, column=0, padx=5, pady=2)
+            self.row_check_vars[client.id] = check_var
 
             # Данные клиента
-            for j, value in enumerate(data):
+            cells = []
+            for j, value in enumerate(self._grid_row_values(client), start=1):
                 cell = ctk.CTkLabel(self.tree_frame, text=str(value), anchor="w")
                 cell.grid(row=i, column=j, padx=5, pady=2, sticky="ew")
+                cells.append(cell)
 
             # Кнопка выбора для редактирования/удаления
             select_btn = ctk.CTkButton(
@@ -217,29 +400,319 @@ class ClientsModule(BaseModule):
                 height=25,
                 command=lambda cid=client.id: self._select_client(cid)
             )
-            select_btn.grid(row=i, column=6, padx=5, pady=2)
+            select_btn.grid(row=i, column=7, padx=5, pady=2)
+            self.row_widgets[client.id] = (cells, select_btn)
+
+        self._grid_version = db_manager.table_version(Client.TABLE_NAME)
+        self._update_rows_info(search_term)
+        self.select_all_var.set(bool(clients) and all(v.get() for v in self.row_check_vars.values()))
+        self._update_headers()
+        self._render_facets(search_term)
+        self._update_selection_info()
+
+    @staticmethod
+    def _grid_row_values(client: Client) -> List[Any]:
+        """Значения ячеек строки таблицы"""
+        return [client.id, client.name, client.email,
+                Validators.format_phone(client.phone) if client.phone else "",
+                client.company, client.status]
+
+    def _update_rows_info(self, search_term: str = None):
+        """Показывает строки таблицы, всего по фильтру и состояние страниц"""
+        total = self._get_total_count(search_term)
+        page_size = self._get_page_size()
+        first = self.page * page_size if page_size else 0
+        shown = len(self.row_widgets)
+        text = f"Показано {first + 1}-{first + shown} из {total}" if shown else f"Показано 0 из {total}"
+        if self._grid_has_new:
+            text += " · есть новые записи, нажмите «Обновить»"
+        self.rows_info_label.configure(text=text)
+
+        pages = max(1, -(-total // page_size)) if page_size else 1
+        self.page_label.configure(text=f"Страница {self.page + 1} из {pages}")
+        self.prev_page_btn.configure(state="normal" if self.page > 0 else "disabled")
+        self.next_page_btn.configure(state="normal" if self.page + 1 < pages else "disabled")
+
+    def _go_to_page(self, page: int):
+        """Переходит на страницу таблицы (фильтры и сортировка сохраняются)"""
+        self.page = max(0, page)
+        self._load_clients_to_grid(self.search_entry.get().strip())
+
+    def _on_external_changes(self, changes: TableChanges):
+        """
+        Применяет изменения клиентов из других копий приложения: видимые строки
+        обновляются на месте, без перезагрузки таблицы. Новые записи не
+        вставляются (порядок строк не меняется под курсором) - о них сообщает
+        строка состояния
+        """
+        if "Список клиентов" not in getattr(self, '_built_tabs', ()) or \
+                not self.tree_frame.winfo_exists():
+            return
+        if changes.reset:
+            self._search_clients(keep_page=True)
+            return
+
+        shown = changes.changed & set(self.row_widgets)
+        if shown:
+            where, params = db_manager.ids_condition(shown)
+            for client in Client.get_all(where=where, params=params):
+                cells, _ = self.row_widgets[client.id]
+                for cell, value in zip(cells, self._grid_row_values(client)):
+                    cell.configure(text=str(value))
+
+        for client_id in changes.deleted & set(self.row_widgets):
+            cells, select_btn = self.row_widgets[client_id]
+            for cell in cells:
+                cell.configure(text_color="gray")
+            cells[1].configure(text=f"{cells[1].cget('text')} (удален)")
+            select_btn.configure(state="disabled")
+
+        if "Управление клиентом" in self._built_tabs and \
+                self.selected_client_id in changes.updated | changes.deleted:
+            state = "удален" if self.selected_client_id in changes.deleted else "изменен"
+            self.selected_client_info.configure(
+                text=f"Клиент (ID: {self.selected_client_id}) {state} другим пользователем")
+
+        self._grid_has_new = self._grid_has_new or bool(changes.inserted)
+        search_term = self.search_entry.get().strip()
+        self._update_rows_info(search_term)
+        self._render_facets(search_term)
 
-    def _search_clients(self):
-        """Поиск клиентов"""
+    def _search_clients(self, keep_page: bool = False):
+        """Поиск клиентов (новый поиск, фильтр или сортировка - с первой страницы)"""
+        if not keep_page:
+            self.page = 0
         search_term = self.search_entry.get().strip()
-        self._load_clients_to_grid(search_term)
+        with tracer.span("Поиск клиентов", "ui", term=search_term):
+            self._load_clients_to_grid(search_term)
 
     def _refresh_clients_list(self):
         """Обновляет список клиентов"""
         self.search_entry.delete(0, "end")
+        self.page = 0
         self._load_clients_to_grid()
 
+    def _create_bulk_actions(self, parent):
+        """Создает панель массовых операций над отмеченными клиентами"""
+        bulk_frame = ctk.CTkFrame(parent)
+        bulk_frame.pack(fill="x", padx=10, pady=5)
+
+        self.selection_info_label = ctk.CTkLabel(bulk_frame, text="Выбрано: 0", width=110, anchor="w")
+        self.selection_info_label.pack(side="left", padx=5)
+
+        status_options = next((f.options for f in self.custom_fields if f.name == 'status'), [])
+        self.bulk_status_combo = ctk.CTkComboBox(bulk_frame, values=status_options, width=150)
+        self.bulk_status_combo.set(status_options[0] if status_options else "")
+        self.bulk_status_combo.pack(side="left", padx=5, pady=5)
+        ctk.CTkButton(bulk_frame, text="Сменить статус", width=120,
+                      command=self._bulk_change_status).pack(side="left", padx=5)
+
+        self.bulk_company_entry = ctk.CTkEntry(bulk_frame, width=160, placeholder_text="Компания")
+        self.bulk_company_entry.pack(side="left", padx=5)
+        ctk.CTkButton(bulk_frame, text="Назначить", width=100,
+                      command=self._bulk_assign_company).pack(side="left", padx=5)
+
+        ctk.CTkButton(bulk_frame, text="Экспорт", width=90,
+                      command=self._bulk_export).pack(side="left", padx=5)
+        ctk.CTkButton(bulk_frame, text="Удалить", width=90,
+                      fg_color=Styles.ERROR_COLOR, hover_color="#B71C1C",
+                      command=self._bulk_delete).pack(side="left", padx=5)
+
+        ctk.CTkButton(bulk_frame, text="Снять выделение", width=120,
+                      command=self._clear_selection).pack(side="right", padx=5)
+        ctk.CTkButton(bulk_frame, text="Выбрать все по фильтру", width=170,
+                      command=self._select_all_matching).pack(side="right", padx=5)
+
+    def _is_selected(self, client_id: int) -> bool:
+        """Отмечен ли клиент для массовых операций"""
+        return self.selection_filter is not None or client_id in self.selected_ids
+
+    def _toggle_selection(self, client_id: int, selected: bool):
+        """Отмечает/снимает отметку с клиента"""
+        if self.selection_filter is not None:
+            # Переходим от выбора "все по фильтру" к явному списку видимых строк
+            self.selection_filter = None
+            self.selected_ids = {cid for cid, var in self.row_check_vars.items() if var.get()}
+        elif selected:
+            self.selected_ids.add(client_id)
+        else:
+            self.selected_ids.discard(client_id)
+        self._update_selection_info()
+
+    def _toggle_visible_selection(self):
+        """Отмечает/снимает отметку со всех видимых строк"""
+        selected = self.select_all_var.get()
+        self.selection_filter = None
+        for client_id, var in self.row_check_vars.items():
+            var.set(selected)
+            if selected:
+                self.selected_ids.add(client_id)
+            else:
+                self.selected_ids.discard(client_id)
+        self._update_selection_info()
+
+    def _select_all_matching(self):
+        """Выбирает всех клиентов, подходящих под текущий поиск и фильтры"""
+        where, params = self._build_filters(self.search_entry.get().strip())
+        self.selection_filter = (where or "1 = 1", params)
+        self.selected_ids = set()
+        for var in self.row_check_vars.values():
+            var.set(True)
+        self.select_all_var.set(True)
+        self._update_selection_info()
+
+    def _clear_selection(self):
+        """Снимает все отметки"""
+        self.selection_filter = None
+        self.selected_ids = set()
+        for var in self.row_check_vars.values():
+            var.set(False)
+        self.select_all_var.set(False)
+        self._update_selection_info()
+
+    def _selection_condition(self) -> Tuple[str, tuple]:
+        """Возвращает WHERE для отмеченных клиентов"""
+        if self.selection_filter is not None:
+            return self.selection_filter
+        return db_manager.ids_condition(self.selected_ids)
+
+    def _selection_count(self) -> int:
+        """Количество отмеченных клиентов"""
+        if self.selection_filter is not None:
+            where, params = self.selection_filter
+            return Client.count(where, params or None)
+        return len(self.selected_ids)
+
+    def _update_selection_info(self):
+        """Обновляет счетчик отмеченных клиентов"""
+        self.selection_info_label.configure(text=f"Выбрано: {self._selection_count()}")
+
+    def _bulk_change_status(self):
+        """Меняет статус у всех отмеченных клиентов"""
+        status = self.bulk_status_combo.get()
+        status_options = next((f.options for f in self.custom_fields if f.name == 'status'), [])
+        if status not in status_options:
+            messagebox.showerror("Ошибка", "Выберите статус из списка!")
+            return
+        self._bulk_update({'status': status})
+
+    def _bulk_assign_company(self):
+        """Назначает компанию всем отмеченным клиентам"""
+        company = self.bulk_company_entry.get().strip()
+        if company:
+            is_valid, error_msg = Validators.validate_field('company', company, "Компания")
+            if not is_valid:
+                messagebox.showerror("Ошибка валидации", error_msg)
+                return
+        self._bulk_update({'company': company})
+
+    def _bulk_update(self, changes: Dict[str, Any]):
+        """Применяет изменения ко всем отмеченным клиентам одним UPDATE"""
+        if not self._selection_count():
+            messagebox.showwarning("Предупреждение", "Отметьте клиентов в списке!")
+            return
+
+        where, params = self._selection_condition()
+
+        # Проверяем зависимости полей на записях после изменения (только если
+        # изменения касаются полей из правил); записи читаются порциями
+        if dependency_manager.affects(changes):
+            columns = ['id', 'name', 'email', 'phone', 'company', 'status']
+            source = RowSource(f"SELECT {', '.join(columns)} FROM {Client.TABLE_NAME} WHERE {where}",
+                               tuple(params or ()), columns)
+            total = invalid = 0
+            invalid_ids = []
+            first_error = None
+            for chunk in source.chunks():
+                records = [{**dict(zip(columns, row)), **changes} for row in chunk]
+                for record, record_errors in zip(records, dependency_manager.validate_many(records)):
+                    if record_errors:
+                        invalid += 1
+                        if len(invalid_ids) < 10:
+                            invalid_ids.append(record['id'])
+                        first_error = first_error or record_errors[0]
+                total += len(chunk)
+
+            if invalid:
+                ids = ", ".join(str(client_id) for client_id in invalid_ids)
+                messagebox.showerror(
+                    "Ошибки валидации",
+                    f"{invalid} из {total} клиентов нарушают правила:\n"
+                    f"{first_error}\nID: {ids}{' ...' if invalid > 10 else ''}"
+                )
+                return
+
+        with db_manager.transaction():
+            updated = Client.update_where(changes, where, params)
+
+        self._clear_selection()
+        self._search_clients(keep_page=True)
+        messagebox.showinfo("Успех", f"Обновлено клиентов: {updated}")
+
+    def _bulk_delete(self):
+        """Удаляет всех отмеченных клиентов одним DELETE"""
+        count = self._selection_count()
+        if not count:
+            messagebox.showwarning("Предупреждение", "Отметьте клиентов в списке!")
+            return
+
+        confirm = messagebox.askyesno(
+            "Подтверждение удаления",
+            f"Вы уверены, что хотите удалить выбранных клиентов ({count})?"
+        )
+        if not confirm:
+            return
+
+        where, params = self._selection_condition()
+        with db_manager.transaction():
+            if self.selected_client_id and Client.count(
+                    f"id = ? AND ({where})", (self.selected_client_id,) + tuple(params or ())):
+                self._clear_edit_form()
+            deleted = Client.delete_where(where, params)
+
+        self._clear_selection()
+        self._search_clients(keep_page=True)
+        messagebox.showinfo("Успех", f"Удалено клиентов: {deleted}")
+
+    def _bulk_export(self):
+        """Экспортирует отмеченных клиентов в CSV"""
+        if not self._selection_count():
+            messagebox.showwarning("Предупреждение", "Отметьте клиентов в списке!")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            initialfile=f"clients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        if not file_path:
+            return
+
+        where, params = self._selection_condition()
+        columns = ['id', 'name', 'email', 'phone', 'company', 'status', 'notes', 'created_at', 'updated_at']
+        source = RowSource(
+            f"SELECT {', '.join(columns)} FROM {Client.TABLE_NAME} WHERE {where} ORDER BY id",
+            params, columns)
+
+        try:
+            result = export_csv(source, file_path)
+            messagebox.showinfo("Успех", f"Экспортировано клиентов: {result.rows}\n{file_path}")
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {e}")
+
     def _select_client(self, client_id: int):
         """Выбирает клиента для редактирования/удаления"""
         self.selected_client_id = client_id
-        client = Client.get(client_id)
+        with tracer.span("Выбор клиента", "ui", client_id=client_id):
+            client = Client.get(client_id)
+            if client:
+                # Переключаемся на вкладку управления
+                self._show_tab("Управление клиентом")
 
-        if client:
-            # Переключаемся на вкладку управления
-            self.tabview.set("Управление клиентом")
+                # Заполняем поля формы
+                self._fill_edit_form(client)
 
-            # Заполняем поля формы
-            self._fill_edit_form(client)
+        if client:
             messagebox.showinfo("Выбран клиент", f"Выбран клиент: {client.name} (ID: {client.id})")
 
     def _create_add_form(self, parent):
@@ -310,7 +783,7 @@ class ClientsModule(BaseModule):
 
                 entry = ctk.CTkComboBox(field_container, values=field.options, width=400)
                 entry.grid(row=0, column=1, sticky="ew", padx=(0, 0), pady=5)
-                entry.configure(command=lambda v, f=field.name: self._handle_dependency(f, v))
+                entry.configure(command=lambda v, f=field.name: self._handle_dependency(f, v, notify=True))
 
                 # Пример для выпадающего списка
                 example_label = ctk.CTkLabel(
@@ -396,6 +869,9 @@ class ClientsModule(BaseModule):
 
             current_row += 1
 
+        self._bind_dependency_events(self.form_fields, self.form_widgets)
+        self.form_dependency_state = dependency_manager.new_state()
+
         # Кнопки
         button_frame = ctk.CTkFrame(form_frame)
         button_frame.grid(row=current_row, column=0, columnspan=2, pady=20)
@@ -465,33 +941,46 @@ class ClientsModule(BaseModule):
             widget.insert(0, cleaned)
             widget.icursor(len(cleaned))
 
-    def _handle_dependency(self, field_name, value):
-        """Обрабатывает зависимости между полями"""
-        if field_name in self.field_dependencies:
-            dependency = self.field_dependencies[field_name]
+    def _bind_dependency_events(self, form_fields, form_widgets, edit: bool = False):
+        """Подписывает текстовые поля формы на пересчет зависимостей"""
+        for field_name, (widget, field) in form_fields.items():
+            form_widgets[field_name]['required'] = field.required
+            if isinstance(widget, ctk.CTkEntry) and dependency_manager.is_trigger(field_name):
+                widget.bind('<FocusOut>',
+                            lambda e, f=field_name, w=widget: self._handle_dependency(f, w.get(), edit=edit),
+                            add='+')
+
+    def _handle_dependency(self, field_name, value, edit: bool = False, notify: bool = False):
+        """Инкрементально пересчитывает зависимости после изменения поля"""
+        if edit:
+            state, widgets = self.edit_dependency_state, self.edit_form_widgets
+        else:
+            state, widgets = self.form_dependency_state, self.form_widgets
 
-            if dependency.get('trigger_value') == value:
-                dependent_field = dependency['dependent_field']
-                action = dependency['action']
+        activated, deactivated = state.update(field_name, value)
+        apply_to_widgets(activated, deactivated, widgets)
 
-                if dependent_field in self.form_widgets:
-                    if action == 'make_required':
-                        # Обновляем метку поля
-                        if 'label' in self.form_widgets[dependent_field]:
-                            label = self.form_widgets[dependent_field]['label']
-                            current_text = label.cget('text')
-                            if ' *' not in current_text:
-                                label.configure(text=current_text + ' *')
+        if notify:
+            messages = [rule.message for rule in activated if rule.message]
+            if messages:
+                messagebox.showinfo("Зависимость полей", "\n".join(messages))
 
-                        # Показываем сообщение
-                        messagebox.showinfo("Зависимость полей", dependency['message'])
+    def _reset_dependencies(self, edit: bool = False, values: Dict[str, Any] = None):
+        """Пересчитывает зависимости формы для нового набора значений"""
+        if edit:
+            state, widgets = self.edit_dependency_state, self.edit_form_widgets
+        else:
+            state, widgets = self.form_dependency_state, self.form_widgets
 
-    def _save_client(self):
-        """Сохраняет клиента из формы"""
+        activated, deactivated = state.load(values or {})
+        apply_to_widgets(activated, deactivated, widgets)
+
+    def _collect_form_data(self, form_fields: Dict[str, Tuple[Any, CustomField]]) -> Tuple[Dict[str, Any], List[str]]:
+        """Читает значения формы, валидирует и подсвечивает поля с ошибками"""
         data = {}
         validation_errors = []
 
-        for field_name, (widget, field) in self.form_fields.items():
+        for field_name, (widget, field) in form_fields.items():
             if isinstance(widget, ctk.CTkTextbox):
                 value = widget.get("1.0", "end-1c")
             elif isinstance(widget, ctk.CTkComboBox):
@@ -526,20 +1015,24 @@ class ClientsModule(BaseModule):
 
             data[field_name] = value
 
-        # Проверяем зависимости
-        status = data.get('status')
-        company = data.get('company')
+        return data, validation_errors
+
+    def _save_client(self):
+        """Сохраняет клиента из формы"""
+        with tracer.span("Проверка данных", "ui", form="add"):
+            data, validation_errors = self._collect_form_data(self.form_fields)
 
-        if status == 'потенциальный' and not company:
-            validation_errors.append("Для потенциальных клиентов обязательно указание компании!")
+            # Проверяем зависимости
+            validation_errors.extend(dependency_manager.check_record(data))
 
         if validation_errors:
             messagebox.showerror("Ошибки валидации", "\n".join(validation_errors))
             return
 
         # Создаем и сохраняем клиента
-        client = Client(**data)
-        client_id = client.save()
+        with tracer.span("Сохранение клиента", "ui"):
+            client = Client(**data)
+            client_id = client.save()
 
         messagebox.showinfo("Успех", f"Клиент сохранен! ID: {client_id}")
 
@@ -550,7 +1043,7 @@ class ClientsModule(BaseModule):
         self._clear_form()
 
         # Переключаемся на вкладку списка
-        self.tabview.set("Список клиентов")
+        self._show_tab("Список клиентов")
 
     def _clear_form(self):
         """Очищает форму"""
@@ -563,6 +1056,8 @@ class ClientsModule(BaseModule):
                 widget.delete(0, "end")
                 widget.configure(border_color="#4A5568")
 
+        self._reset_dependencies()
+
     def _create_edit_form(self, parent):
         """Создает форму управления клиентом"""
         form_frame = ctk.CTkScrollableFrame(parent)
@@ -640,7 +1135,7 @@ class ClientsModule(BaseModule):
 
                 entry = ctk.CTkComboBox(field_container, values=field.options, width=400)
                 entry.grid(row=0, column=1, sticky="ew", padx=(0, 0), pady=5)
-                entry.configure(command=lambda v, f=field.name: self._handle_edit_dependency(f, v))
+                entry.configure(command=lambda v, f=field.name: self._handle_dependency(f, v, edit=True, notify=True))
 
                 # Пример для выпадающего списка
                 example_label = ctk.CTkLabel(
@@ -726,6 +1221,9 @@ class ClientsModule(BaseModule):
 
             current_row += 1
 
+        self._bind_dependency_events(self.edit_form_fields, self.edit_form_widgets, edit=True)
+        self.edit_dependency_state = dependency_manager.new_state()
+
         # Кнопки управления
         button_frame = ctk.CTkFrame(form_frame)
         button_frame.grid(row=current_row, column=0, columnspan=2, pady=30)
@@ -766,32 +1264,13 @@ class ClientsModule(BaseModule):
 
         form_frame.grid_columnconfigure(1, weight=1)
 
-    def _handle_edit_dependency(self, field_name, value):
-        """Обрабатывает зависимости между полями в форме редактирования"""
-        if field_name in self.field_dependencies:
-            dependency = self.field_dependencies[field_name]
-
-            if dependency.get('trigger_value') == value:
-                dependent_field = dependency['dependent_field']
-                action = dependency['action']
-
-                if dependent_field in self.edit_form_widgets:
-                    if action == 'make_required':
-                        # Обновляем метку поля
-                        if 'label' in self.edit_form_widgets[dependent_field]:
-                            label = self.edit_form_widgets[dependent_field]['label']
-                            current_text = label.cget('text')
-                            if ' *' not in current_text:
-                                label.configure(text=current_text + ' *')
-
-                        # Показываем сообщение
-                        messagebox.showinfo("Зависимость полей", dependency['message'])
-
     def _fill_edit_form(self, client: Client):
         """Заполняет форму редактирования данными клиента"""
         self.selected_client_info.configure(
             text=f"Редактирование: {client.name} (ID: {client.id})"
         )
+        # Сохранение проверит, что запись не изменили после загрузки в форму
+        self.selected_client_version = client.row_version
 
         for field_name, (widget, field) in self.edit_form_fields.items():
             value = getattr(client, field_name, "")
@@ -805,6 +1284,8 @@ class ClientsModule(BaseModule):
                 widget.delete(0, "end")
                 widget.insert(0, value if value else "")
 
+        self._reset_dependencies(edit=True, values=client.to_dict())
+
     def _update_client(self):
         """Обновляет данные клиента"""
         if not self.selected_client_id:
@@ -816,65 +1297,51 @@ class ClientsModule(BaseModule):
             messagebox.showerror("Ошибка", "Клиент не найден!")
             return
 
-        data = {}
-        validation_errors = []
-
-        for field_name, (widget, field) in self.edit_form_fields.items():
-            if isinstance(widget, ctk.CTkTextbox):
-                value = widget.get("1.0", "end-1c")
-            elif isinstance(widget, ctk.CTkComboBox):
-                value = widget.get()
-            else:
-                value = widget.get()
-
-            # Валидация в зависимости от типа поля
-            if field.type in ['name', 'email', 'phone', 'company']:
-                is_valid, error_msg = Validators.validate_field(field.type, value, field.label)
-                if not is_valid and (field.required or value):
-                    validation_errors.append(error_msg)
-                    # Подсвечиваем поле с ошибкой
-                    if isinstance(widget, ctk.CTkEntry):
-                        widget.configure(border_color=Styles.ERROR_COLOR)
-                else:
-                    if isinstance(widget, ctk.CTkEntry):
-                        widget.configure(border_color="#4A5568")
-            else:
-                # Стандартная валидация для других типов полей
-                if field.required and not value:
-                    validation_errors.append(f"Поле '{field.label}' обязательно для заполнения!")
-                    if isinstance(widget, ctk.CTkEntry):
-                        widget.configure(border_color=Styles.ERROR_COLOR)
-                else:
-                    if isinstance(widget, ctk.CTkEntry):
-                        widget.configure(border_color="#4A5568")
-
-            # Форматирование телефона
-            if field.type == 'phone' and value:
-                value = Validators.format_phone(value)
-
-            data[field_name] = value
-
-        # Проверяем зависимости
-        status = data.get('status')
-        company = data.get('company')
+        with tracer.span("Проверка данных", "ui", form="edit"):
+            data, validation_errors = self._collect_form_data(self.edit_form_fields)
 
-        if status == 'потенциальный' and not company:
-            validation_errors.append("Для потенциальных клиентов обязательно указание компании!")
+            # Проверяем зависимости
+            validation_errors.extend(dependency_manager.check_record(data))
 
         if validation_errors:
             messagebox.showerror("Ошибки валидации", "\n".join(validation_errors))
             return
 
-        # Обновляем клиента
+        # Обновляем клиента (с версией, которую видел пользователь)
         for key, value in data.items():
             setattr(client, key, value)
+        client.row_version = self.selected_client_version
 
-        client.save()
+        try:
+            with tracer.span("Сохранение клиента", "ui", client_id=client.id):
+                client.save()
+        except ConflictError as e:
+            self._handle_update_conflict(e)
+            return
+        self.selected_client_version = client.row_version
         messagebox.showinfo("Успех", f"Данные клиента {client.name} обновлены!")
 
         # Обновляем список клиентов
         self._refresh_clients_list()
 
+    def _handle_update_conflict(self, error: ConflictError):
+        """Клиента изменил или удалил другой пользователь: изменения формы не сохранены"""
+        if error.current_version is None:
+            messagebox.showerror("Конфликт изменений", f"{error}.\nИзменения не сохранены.")
+            self._refresh_clients_list()
+            return
+
+        reload = messagebox.askyesno(
+            "Конфликт изменений",
+            f"{error}.\n\nИзменения не сохранены. Загрузить актуальные данные клиента?\n"
+            f"Введенные в форму значения будут заменены."
+        )
+        if reload:
+            client = Client.get(error.record_id)
+            if client:
+                self._fill_edit_form(client)
+        self._refresh_clients_list()
+
     def _delete_client(self):
         """Удаляет выбранного клиента"""
         if not self.selected_client_id:
@@ -915,5 +1382,8 @@ class ClientsModule(BaseModule):
                 widget.delete(0, "end")
                 widget.configure(border_color="#4A5568")
 
+        self._reset_dependencies(edit=True)
+
         self.selected_client_id = None
+        self.selected_client_version = None
         self.selected_client_info.configure(text="Выберите клиента из списка")
\ No newline at end of file
@@ -0,0 +1,380 @@
+"""
+Модуль диагностики: статистика SQL-запросов, журнал медленных запросов,
+задержки интерфейса и трассировка действий
+"""
+import customtkinter as ctk
+from tkinter import messagebox, filedialog
+from datetime import datetime
+from typing import Dict, Any
+
+from modules.base_module import BaseModule
+from ui.styles import Styles
+from core.database import db_manager
+from core.query_stats import query_stats
+from utils.tracing import tracer
+from utils.watchdog import ui_watchdog
+
+
+class DiagnosticsModule(BaseModule):
+    """Модуль диагностики производительности"""
+
+    MODULE_NAME = "Диагностика"
+    MODULE_VERSION = "1.0"
+
+    # Сколько форм запросов показывать в таблице
+    SHAPES_LIMIT = 50
+
+    # Сортировка таблицы: подпись -> поле статистики
+    SORT_OPTIONS = {
+        "Суммарное время": "total_ms",
+        "Среднее время": "avg_ms",
+        "Максимальное время": "max_ms",
+        "Число выполнений": "count",
+        "Медленные": "slow",
+        "Серии (N+1)": "max_burst"
+    }
+
+    COLUMNS = ["Форма запроса", "Выполнений", "Всего, мс", "Среднее, мс",
+               "p95, мс", "Макс., мс", "Строк", "Признаки"]
+
+    STALL_COLUMNS = ["Время", "Длительность, мс", "Обработчик", "Спаны"]
+
+    def __init__(self):
+        super().__init__()
+        self.selected_shape = None
+
+    def initialize_database(self):
+        """Модулю не нужны таблицы"""
+        pass
+
+    def get_ui_component(self, parent) -> ctk.CTkFrame:
+        """Создает интерфейс модуля диагностики"""
+        frame = ctk.CTkFrame(parent)
+
+        title = ctk.CTkLabel(
+            frame,
+            text="Диагностика",
+            font=("Arial", 24, "bold"),
+            text_color=Styles.PRIMARY_COLOR
+        )
+        title.pack(pady=(10, 5))
+
+        tabview = ctk.CTkTabview(frame)
+        tabview.pack(fill="both", expand=True, padx=10, pady=10)
+        self._create_queries_tab(tabview.add("Запросы"))
+        self._create_lag_tab(tabview.add("Отзывчивость"))
+        self._create_trace_tab(tabview.add("Трассировка"))
+
+        return frame
+
+    def on_show(self):
+        """Обновляет статистику при каждом показе модуля"""
+        if hasattr(self, 'shapes_frame') and self.shapes_frame.winfo_exists():
+            self._refresh_queries()
+            self._refresh_lag()
+            self._refresh_trace()
+
+    # -- запросы
+
+    def _create_queries_tab(self, parent):
+        """Вкладка статистики SQL-запросов"""
+        toolbar = ctk.CTkFrame(parent)
+        toolbar.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkLabel(toolbar, text="Сортировка:").pack(side="left", padx=5)
+        self.sort_var = ctk.StringVar(value="Суммарное время")
+        ctk.CTkOptionMenu(toolbar, values=list(self.SORT_OPTIONS), variable=self.sort_var,
+                          command=lambda _: self._refresh_queries(), width=180).pack(side="left", padx=5)
+
+        ctk.CTkButton(toolbar, text="Обновить", width=100,
+                      command=self._refresh_queries).pack(side="left", padx=5)
+        ctk.CTkButton(toolbar, text="Сбросить", width=100, fg_color=Styles.WARNING_COLOR,
+                      hover_color="#E68900", command=self._reset_queries).pack(side="left", padx=5)
+        ctk.CTkButton(toolbar, text="Сохранить JSON", width=140,
+                      command=self._dump_queries).pack(side="left", padx=5)
+
+        self.queries_info_label = ctk.CTkLabel(toolbar, text="", text_color="gray")
+        self.queries_info_label.pack(side="right", padx=10)
+
+        self.shapes_frame = ctk.CTkScrollableFrame(parent, height=300)
+        self.shapes_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.shapes_frame.grid_columnconfigure(0, weight=1)
+
+        details_frame = ctk.CTkFrame(parent)
+        details_frame.pack(fill="x", padx=5, pady=5)
+
+        header = ctk.CTkFrame(details_frame, fg_color="transparent")
+        header.pack(fill="x")
+        ctk.CTkLabel(header, text="План запроса и медленные запросы",
+                     font=("Arial", 13, "bold")).pack(side="left", padx=5, pady=5)
+        ctk.CTkButton(header, text="Снять план", width=120,
+                      command=self._explain_selected).pack(side="right", padx=5, pady=5)
+
+        self.details_text = ctk.CTkTextbox(details_frame, height=180, font=("Courier New", 11))
+        self.details_text.pack(fill="x", padx=5, pady=(0, 5))
+
+        self._refresh_queries()
+
+    def _refresh_queries(self):
+        """Перерисовывает таблицу форм запросов"""
+        for widget in self.shapes_frame.winfo_children():
+            widget.destroy()
+
+        snapshot = query_stats.snapshot(self.SORT_OPTIONS[self.sort_var.get()], self.SHAPES_LIMIT)
+        state = "" if snapshot["enabled"] else " (сбор выключен)"
+        self.queries_info_label.configure(
+            text=f"Запросов: {snapshot['queries']} с {snapshot['since']}, "
+                 f"медленных: {len(snapshot['slow_queries'])} (порог {snapshot['slow_query_ms']:.0f} мс){state}")
+
+        for column, title in enumerate(self.COLUMNS):
+            ctk.CTkLabel(self.shapes_frame, text=title, font=("Arial", 12, "bold"),
+                         anchor="w").grid(row=0, column=column, padx=5, pady=3, sticky="ew")
+
+        for row, item in enumerate(snapshot["shapes"], start=1):
+            flags = []
+            if item["full_scan"]:
+                flags.append(f"full scan: {', '.join(item['full_scan'])}")
+            if item["n_plus_one_suspect"]:
+                flags.append(f"N+1? ({item['max_burst']} подряд)")
+            values = [item["count"], f"{item['total_ms']:.1f}", f"{item['avg_ms']:.2f}",
+                      item["p95_ms"], f"{item['max_ms']:.1f}", item["rows"], "; ".join(flags)]
+
+            shape_btn = ctk.CTkButton(
+                self.shapes_frame,
+                text=self._shorten(item["shape"]),
+                anchor="w",
+                fg_color=Styles.PRIMARY_COLOR if item["shape"] == self.selected_shape else "transparent",
+                hover_color="#4A5568",
+                height=24,
+                command=lambda s=item: self._show_shape(s)
+            )
+            shape_btn.grid(row=row, column=0, padx=5, pady=1, sticky="ew")
+            for column, value in enumerate(values, start=1):
+                color = Styles.WARNING_COLOR if column == len(values) and value else None
+                label = ctk.CTkLabel(self.shapes_frame, text=str(value), anchor="w")
+                if color:
+                    label.configure(text_color=color)
+                label.grid(row=row, column=column, padx=5, pady=1, sticky="ew")
+
+        self._show_slow_queries(snapshot["slow_queries"])
+
+    @staticmethod
+    def _shorten(text: str, length: int = 90) -> str:
+        return text if len(text) <= length else text[:length - 3] + "..."
+
+    def _set_details(self, text: str):
+        self.details_text.delete("1.0", "end")
+        self.details_text.insert("1.0", text)
+
+    def _show_slow_queries(self, slow_queries):
+        """Показывает последние медленные запросы"""
+        if not slow_queries:
+            self._set_details("Медленных запросов нет")
+            return
+        lines = []
+        for record in reversed(slow_queries[-20:]):
+            lines.append(f"{record['ts']}  {record['elapsed_ms']:.1f} мс, строк: {record['rows']}, "
+                         f"поток: {record['thread']}")
+            lines.append(f"  {record['shape']}")
+            for step in record["plan"] or []:
+                lines.append(f"    {step}")
+        self._set_details("\n".join(lines))
+
+    def _show_shape(self, item: Dict[str, Any]):
+        """Показывает подробности формы запроса"""
+        self.selected_shape = item["shape"]
+        lines = [item["shape"], "",
+                 f"Выполнений: {item['count']}, строк: {item['rows']} (в среднем {item['avg_rows']})",
+                 f"Время: среднее {item['avg_ms']} мс, p50 {item['p50_ms']}, p95 {item['p95_ms']}, "
+                 f"p99 {item['p99_ms']}, макс. {item['max_ms']} мс, медленных: {item['slow']}",
+                 f"Наибольшая серия выполнений подряд: {item['max_burst']}", "",
+                 "Гистограмма:"]
+        lines.extend(f"  {bucket:>10}: {count}" for bucket, count in item["histogram"].items() if count)
+        lines.append("")
+        lines.append("План:" if item["plan"] else "План не снят (кнопка «Снять план»)")
+        lines.extend(f"  {step}" for step in item["plan"] or [])
+        self._set_details("\n".join(lines))
+
+    def _explain_selected(self):
+        """Снимает план выбранной формы запроса"""
+        if not self.selected_shape:
+            messagebox.showwarning("Предупреждение", "Сначала выберите запрос в таблице")
+            return
+        if not db_manager.is_connected:
+            messagebox.showwarning("Предупреждение", "База данных еще не загружена")
+            return
+        if query_stats.explain(self.selected_shape, db_manager.connection) is None:
+            messagebox.showinfo("План запроса", "Для этого запроса план недоступен")
+        for item in query_stats.snapshot()["shapes"]:
+            if item["shape"] == self.selected_shape:
+                self._show_shape(item)
+                break
+
+    def _reset_queries(self):
+        """Сбрасывает статистику запросов"""
+        query_stats.reset()
+        self.selected_shape = None
+        self._refresh_queries()
+
+    def _dump_queries(self):
+        """Сохраняет статистику запросов в JSON"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            initialfile=f"query_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        if not file_path:
+            return
+        try:
+            query_stats.dump(file_path)
+            messagebox.showinfo("Успех", f"Статистика сохранена:\n{file_path}")
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {e}")
+
+
+    # -- отзывчивость интерфейса
+
+    def _create_lag_tab(self, parent):
+        """Вкладка задержек главного цикла и зависаний интерфейса"""
+        toolbar = ctk.CTkFrame(parent)
+        toolbar.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkButton(toolbar, text="Обновить", width=100,
+                      command=self._refresh_lag).pack(side="left", padx=5)
+        ctk.CTkButton(toolbar, text="Сбросить", width=100, fg_color=Styles.WARNING_COLOR,
+                      hover_color="#E68900", command=self._reset_lag).pack(side="left", padx=5)
+
+        self.lag_info_label = ctk.CTkLabel(parent, text="", justify="left", anchor="w")
+        self.lag_info_label.pack(fill="x", padx=10, pady=5)
+
+        self.stalls_frame = ctk.CTkScrollableFrame(parent, height=250)
+        self.stalls_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.stalls_frame.grid_columnconfigure(2, weight=1)
+
+        self.stall_text = ctk.CTkTextbox(parent, height=180, font=("Courier New", 11))
+        self.stall_text.pack(fill="x", padx=5, pady=5)
+
+        self._refresh_lag()
+
+    def _refresh_lag(self):
+        """Перерисовывает перцентили задержек и журнал зависаний"""
+        for widget in self.stalls_frame.winfo_children():
+            widget.destroy()
+
+        snapshot = ui_watchdog.snapshot()
+        if not snapshot["running"]:
+            self.lag_info_label.configure(text="Сторож интерфейса не запущен (настройка ui_watchdog_enabled)")
+        else:
+            percentiles = ", ".join(
+                f"{name} {snapshot[f'{name}_ms']} мс" for name in ("p50", "p90", "p99"))
+            self.lag_info_label.configure(
+                text=f"Задержка главного цикла (последние {snapshot['samples']} из {snapshot['beats']} "
+                     f"heartbeat по {snapshot['heartbeat_ms']} мс с {snapshot['since']}):\n"
+                     f"{percentiles}, макс. {snapshot['max_ms']} мс\n"
+                     f"Зависаний дольше {snapshot['stall_ms']:.0f} мс: {snapshot['stall_count']}, "
+                     f"всего {snapshot['stall_total_ms'] / 1000:.1f} с")
+
+        for column, title in enumerate(self.STALL_COLUMNS):
+            ctk.CTkLabel(self.stalls_frame, text=title, font=("Arial", 12, "bold"),
+                         anchor="w").grid(row=0, column=column, padx=5, pady=3, sticky="ew")
+
+        for row, stall in enumerate(snapshot["stalls"], start=1):
+            ctk.CTkButton(
+                self.stalls_frame,
+                text=stall["started_at"].split("T")[1],
+                anchor="w",
+                fg_color="transparent",
+                hover_color="#4A5568",
+                height=24,
+                width=110,
+                command=lambda s=stall: self._show_stall(s)
+            ).grid(row=row, column=0, padx=5, pady=1, sticky="ew")
+            values = [f"{stall['duration_ms']:.0f}", stall["action"] or "неизвестно",
+                      " › ".join(stall["spans"])]
+            for column, value in enumerate(values, start=1):
+                ctk.CTkLabel(self.stalls_frame, text=self._shorten(value, 70),
+                             anchor="w").grid(row=row, column=column, padx=5, pady=1, sticky="ew")
+
+        self.stall_text.delete("1.0", "end")
+        self.stall_text.insert("1.0", "Выберите зависание, чтобы увидеть стек главного потока"
+                               if snapshot["stalls"] else "Зависаний нет")
+
+    def _show_stall(self, stall: Dict[str, Any]):
+        """Показывает стек главного потока, снятый во время зависания"""
+        lines = [f"{stall['started_at']}  {stall['duration_ms']:.0f} мс",
+                 f"Обработчик: {stall['action'] or 'неизвестно'}"]
+        if stall["spans"]:
+            lines.append(f"Спаны: {' › '.join(stall['spans'])}")
+        lines.append("")
+        lines.append(stall["stack"] or "Стек не снят (главный поток не отпускал GIL "
+                                       "или снятие стека выключено)")
+        self.stall_text.delete("1.0", "end")
+        self.stall_text.insert("1.0", "\n".join(lines))
+
+    def _reset_lag(self):
+        """Сбрасывает накопленные задержки"""
+        ui_watchdog.reset()
+        self._refresh_lag()
+
+    # -- трассировка
+
+    def _create_trace_tab(self, parent):
+        """Вкладка трассировки действий (формат Chrome trace events)"""
+        toolbar = ctk.CTkFrame(parent)
+        toolbar.pack(fill="x", padx=5, pady=5)
+
+        self.trace_var = ctk.BooleanVar(value=tracer.enabled)
+        ctk.CTkCheckBox(toolbar, text="Записывать трассу", variable=self.trace_var,
+                        command=self._toggle_trace).pack(side="left", padx=5)
+        ctk.CTkButton(toolbar, text="Обновить", width=100,
+                      command=self._refresh_trace).pack(side="left", padx=5)
+        ctk.CTkButton(toolbar, text="Очистить", width=100, fg_color=Styles.WARNING_COLOR,
+                      hover_color="#E68900", command=self._clear_trace).pack(side="left", padx=5)
+        ctk.CTkButton(toolbar, text="Сохранить JSON", width=140,
+                      command=self._dump_trace).pack(side="left", padx=5)
+
+        self.trace_info_label = ctk.CTkLabel(parent, text="", justify="left", anchor="w")
+        self.trace_info_label.pack(fill="x", padx=10, pady=10)
+
+        ctk.CTkLabel(
+            parent,
+            text="Сохраненный файл открывается в chrome://tracing или ui.perfetto.dev.\n"
+                 "Чтобы трасса писалась с запуска, укажите \"trace_enabled\": true в settings.json;\n"
+                 "при выходе из приложения она сохраняется в папку traces.",
+            justify="left", anchor="w", text_color="gray"
+        ).pack(fill="x", padx=10)
+
+        self._refresh_trace()
+
+    def _refresh_trace(self):
+        """Обновляет число записанных событий"""
+        state = "включена" if tracer.enabled else "выключена"
+        self.trace_info_label.configure(text=f"Трассировка {state}, событий: {len(tracer.events)}")
+
+    def _toggle_trace(self):
+        """Включает или выключает запись трассы до перезапуска"""
+        tracer.enable(self.trace_var.get())
+        self._refresh_trace()
+
+    def _clear_trace(self):
+        """Удаляет записанные события"""
+        tracer.clear()
+        self._refresh_trace()
+
+    def _dump_trace(self):
+        """Сохраняет трассу в JSON"""
+        if not tracer.events:
+            messagebox.showwarning("Предупреждение", "Трасса пуста: включите запись и выполните действия.")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            initialfile=f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        if not file_path:
+            return
+        try:
+            tracer.dump(file_path)
+            messagebox.showinfo("Успех", f"Трасса сохранена:\n{file_path}")
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {e}")
\ No newline at end of file
@@ -11,6 +11,7 @@ from modules.base_module import BaseModule
 from ui.styles import Styles
 from core.config import Config
 from plugins import plugin_manager
+from utils.tracing import tracer
 
 
 class PluginsModule(BaseModule):
@@ -218,8 +219,11 @@ class PluginsModule(BaseModule):
 
     def _enable_plugin(self, plugin_id: str):
         """Включает плагин"""
-        if plugin_manager.enable_plugin(plugin_id):
-            self._load_plugins_list()
+        with tracer.span("Включение плагина (интерфейс)", "ui", plugin=plugin_id):
+            enabled = plugin_manager.enable_plugin(plugin_id)
+            if enabled:
+                self._load_plugins_list()
+        if enabled:
             messagebox.showinfo("Успех", 
                 f"Плагин '{plugin_manager.get_plugin_info(plugin_id)['name']}' включен!\n"
                 f"Перезапустите приложение для отображения в боковой панели.")
@@ -5,13 +5,17 @@ import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
-import pandas as pd
 from pathlib import Path
 import os
 
 from modules.base_module import BaseModule
 from ui.styles import Styles
-from modules.clients import Client
+from core.reports import report_registry, summary_statistics, period_range
+from core.export import EXPORTERS, export_xlsx
+from core.jobs import Job, job_queue, export_job
+from core.delta import DeltaExport
+from ui.notifications import show_toast
+from utils.tracing import tracer, traced
 
 
 class ReportsModule(BaseModule):
@@ -20,11 +24,28 @@ class ReportsModule(BaseModule):
     MODULE_NAME = "Отчеты"
     MODULE_VERSION = "1.0"
 
+    # Период обновления прогресса заданий, мс
+    JOBS_POLL_MS = 200
+
+    # Цель дельта-выгрузок из интерфейса (у каждой цели свой курсор)
+    DELTA_TARGET = "reports_module"
+
     def __init__(self):
         super().__init__()
+        self.root = None
+        self._job_rows = {}     # Задание -> виджеты строки в списке заданий
+        self._notified = set()  # Задания, о завершении которых уже сообщили
+        self._polling = False
+        # Части текущего предварительного просмотра: задание -> имя части
+        self._preview_parts = {}
+        self._preview_results = {}
+        self._preview_header = ""
+        self._preview_columns = []
 
     def get_ui_component(self, parent) -> ctk.CTkFrame:
         """Создает интерфейс для модуля отчетов"""
+        self.root = parent.winfo_toplevel()
+        self._job_rows = {}
         frame = ctk.CTkFrame(parent)
         frame.pack(fill="both", expand=True, padx=20, pady=20)
 
@@ -45,17 +66,13 @@ class ReportsModule(BaseModule):
         ctk.CTkLabel(scrollable_frame, text="Тип отчета:", 
                      font=("Arial", 16, "bold")).pack(anchor="w", pady=(10, 5))
         
-        self.report_type_var = ctk.StringVar(value="clients_summary")
+        # Список отчетов берется из реестра (туда же добавляют отчеты плагины)
+        report_types = [(definition.report_id, definition.title)
+                        for definition in report_registry.all()]
+        self.report_type_var = ctk.StringVar(value=report_types[0][0] if report_types else "")
         report_types_frame = ctk.CTkFrame(scrollable_frame)
         report_types_frame.pack(fill="x", pady=5)
         
-        report_types = [
-            ("clients_summary", "Общий отчет по клиентам"),
-            ("clients_by_status", "Клиенты по статусам"),
-            ("clients_by_date", "Клиенты по дате добавления"),
-            ("detailed_clients", "Подробный отчет по клиентам")
-        ]
-        
         for value, text in report_types:
             radio = ctk.CTkRadioButton(
                 report_types_frame,
@@ -131,7 +148,8 @@ class ReportsModule(BaseModule):
         formats = [
             ("excel", "Excel (.xlsx)"),
             ("csv", "CSV (.csv)"),
-            ("json", "JSON (.json)")
+            ("json", "JSON (.json)"),
+            ("jsonl", "JSON Lines (.jsonl)")
         ]
         
         for value, text in formats:
@@ -168,6 +186,24 @@ class ReportsModule(BaseModule):
             font=("Arial", 12)
         )
         group_by_status_check.pack(anchor="w", padx=10, pady=5)
+        
+        self.compress_var = ctk.BooleanVar(value=False)
+        compress_check = ctk.CTkCheckBox(
+            options_frame,
+            text="Сжимать gzip (CSV/JSON)",
+            variable=self.compress_var,
+            font=("Arial", 12)
+        )
+        compress_check.pack(anchor="w", padx=10, pady=5)
+        
+        self.delta_var = ctk.BooleanVar(value=False)
+        delta_check = ctk.CTkCheckBox(
+            options_frame,
+            text="Только изменения клиентов с прошлой выгрузки (тип отчета и период не учитываются)",
+            variable=self.delta_var,
+            font=("Arial", 12)
+        )
+        delta_check.pack(anchor="w", padx=10, pady=5)
 
         # Кнопки
         button_frame = ctk.CTkFrame(scrollable_frame)
@@ -204,6 +240,24 @@ class ReportsModule(BaseModule):
         self.preview_text = ctk.CTkTextbox(scrollable_frame, height=200)
         self.preview_text.pack(fill="x", pady=5)
 
+        # Очередь отчетов (генерация идет в фоне)
+        ctk.CTkLabel(scrollable_frame, text="Очередь отчетов:", 
+                     font=("Arial", 16, "bold")).pack(anchor="w", pady=(20, 5))
+        
+        self.jobs_frame = ctk.CTkFrame(scrollable_frame)
+        self.jobs_frame.pack(fill="x", pady=5)
+        
+        self.no_jobs_label = ctk.CTkLabel(self.jobs_frame, text="Нет активных заданий",
+                                          font=("Arial", 12), text_color="gray")
+        self.no_jobs_label.pack(anchor="w", padx=10, pady=5)
+        
+        # Задания, поставленные до пересоздания интерфейса
+        for job in job_queue.active_jobs():
+            if job.kind == "export":
+                self._add_job_row(job)
+        if job_queue.active_jobs():
+            self._start_polling()
+
         return frame
 
     def _on_period_change(self, *args):
@@ -230,24 +284,10 @@ class ReportsModule(BaseModule):
         if period == "all":
             return None, None
         
-        now = datetime.now()
-        
-        if period == "today":
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now
-        elif period == "week":
-            start_date = now - timedelta(days=7)
-            end_date = now
-        elif period == "month":
-            start_date = now - timedelta(days=30)
-            end_date = now
-        elif period == "quarter":
-            start_date = now - timedelta(days=90)
-            end_date = now
-        elif period == "year":
-            start_date = now - timedelta(days=365)
-            end_date = now
-        elif period == "custom":
+        # Относительные периоды выровнены по дням (стабильный ключ кэша)
+        start_date, end_date = period_range(period)
+        
+        if period == "custom":
             try:
                 start_date = datetime.strptime(self.start_date_entry.get(), "%Y-%m-%d")
                 end_date = datetime.strptime(self.end_date_entry.get(), "%Y-%m-%d")
@@ -258,91 +298,114 @@ class ReportsModule(BaseModule):
         
         return start_date, end_date
 
-    def _get_clients_data(self, start_date=None, end_date=None):
-        """Получает данные клиентов для отчета"""
-        clients = Client.get_all()
-        
-        if start_date and end_date:
-            filtered_clients = []
-            for client in clients:
-                try:
-                    client_date = datetime.fromisoformat(client.created_at.replace('Z', '+00:00'))
-                    if start_date <= client_date <= end_date:
-                        filtered_clients.append(client)
-                except:
-                    filtered_clients.append(client)
-            clients = filtered_clients
-        
-        return clients
-
-    def _prepare_data_for_report(self, clients):
-        """Подготавливает данные для отчета"""
-        data = []
-        
-        for client in clients:
-            client_data = {
-                "ID": client.id,
-                "Имя": client.name,
-                "Email": client.email,
-                "Телефон": client.phone,
-                "Компания": client.company,
-                "Статус": client.status,
-                "Дата создания": client.created_at,
-                "Дата обновления": client.updated_at
-            }
-            
-            if self.include_notes_var.get():
-                client_data["Заметки"] = client.notes[:100] + "..." if len(client.notes) > 100 else client.notes
-            
-            data.append(client_data)
-        
-        return data
-
-    def _generate_summary_statistics(self, clients):
-        """Генерирует сводную статистику"""
-        if not clients:
-            return {"total": 0, "by_status": {}, "by_company": {}}
-        
-        stats = {
-            "total": len(clients),
-            "by_status": {},
-            "by_company": {}
+    def _get_report_options(self) -> Dict[str, Any]:
+        """Опции отчета из флажков интерфейса"""
+        return {
+            "include_notes": self.include_notes_var.get(),
+            "group_by_status": self.group_by_status_var.get()
         }
-        
-        # Статистика по статусам
-        for client in clients:
-            status = client.status if client.status else "не указан"
-            stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
-        
-        # Статистика по компаниям
-        for client in clients:
-            company = client.company if client.company else "не указана"
-            stats["by_company"][company] = stats["by_company"].get(company, 0) + 1
-        
-        return stats
 
+    def _get_report_definition(self):
+        """Выбранное описание отчета"""
+        return report_registry.get(self.report_type_var.get())
+
+    def _get_report_source(self, start_date=None, end_date=None):
+        """Потоковый источник строк выбранного отчета"""
+        definition = self._get_report_definition()
+        if definition is None:
+            return None
+        return definition.source(start_date, end_date, self._get_report_options())
+
+    @traced("Просмотр отчета", "ui")
     def _preview_report(self):
-        """Предварительный просмотр отчета"""
+        """
+        Предварительный просмотр отчета: число строк, сводная статистика и первые
+        10 строк считаются отдельными запросами параллельно в пуле коротких
+        заданий, каждая часть выводится по мере готовности
+        """
         start_date, end_date = self._get_date_range()
         
         if start_date is None and self.period_var.get() == "custom":
             return
         
-        clients = self._get_clients_data(start_date, end_date)
-        
-        if not clients:
-            self.preview_text.delete("1.0", "end")
-            self.preview_text.insert("1.0", "Нет данных для отчета.")
+        definition = self._get_report_definition()
+        source = self._get_report_source(start_date, end_date)
+        if source is None:
             return
         
-        stats = self._generate_summary_statistics(clients)
+        # Результаты предыдущего просмотра больше не нужны: еще не начатые части
+        # пропускаются пулом и не занимают его потоки
+        for job in self._preview_parts:
+            job.cancel()
         
-        preview_text = f"""
-=== ОТЧЕТ ПО КЛИЕНТАМ ===
+        # Параметры читаются из виджетов здесь, в потоке UI
+        self._preview_header = f"""
+=== {definition.title.upper()} ===
 Дата генерации: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Период: {self._get_period_text()}
-Тип отчета: {self._get_report_type_text()}
+Тип отчета: {definition.title}
+"""
+        self._preview_columns = source.columns
+        self._preview_results = {}
+        
+        parts = {
+            "count": lambda job: source.count(),
+            "head": lambda job: source.head(10)
+        }
+        # Сводная статистика - для отчетов по клиентам
+        if "clients" in definition.depends_on:
+            parts["stats"] = lambda job: summary_statistics(start_date, end_date, company_limit=5)
+        
+        self._preview_parts = {}
+        for part, run in parts.items():
+            job = Job(f"Просмотр: {definition.title}", run, kind="preview")
+            self._preview_parts[job] = part
+            self._submit_job(job)
+        
+        self._render_preview()
+
+    @traced("Отрисовка просмотра", "ui")
+    def _render_preview(self):
+        """Выводит готовые части просмотра, для остальных - заглушки"""
+        if not self.preview_text.winfo_exists():
+            return
+        results = self._preview_results
+        loading = "  ...\n"
+        
+        total_rows = results.get("count")
+        if total_rows == 0:
+            text = "Нет данных для отчета."
+        else:
+            text = self._preview_header
+            text += f"Всего записей: {total_rows if total_rows is not None else '...'}\n"
+            
+            if "stats" in self._preview_parts.values():
+                stats = results.get("stats")
+                if stats is None:
+                    text += "\nСВОДНАЯ СТАТИСТИКА:\n" + loading
+                else:
+                    text += self._format_preview_stats(stats)
+            
+            text += f"\nПЕРВЫЕ 10 ЗАПИСЕЙ:\n"
+            text += " | ".join(self._preview_columns) + "\n"
+            text += "-" * 70 + "\n"
+            rows = results.get("head")
+            if rows is None:
+                text += loading
+            else:
+                for row in rows:
+                    text += " | ".join("" if value is None else str(value) for value in row) + "\n"
+            
+            if total_rows is not None and total_rows > 10:
+                text += f"\n... и еще {total_rows - 10} записей\n"
+        
+        self.preview_text.delete("1.0", "end")
+        self.preview_text.insert("1.0", text)
 
+    @staticmethod
+    def _format_preview_stats(stats: Dict[str, Any]) -> str:
+        """Текст сводной статистики для просмотра"""
+        text = f"""
 СВОДНАЯ СТАТИСТИКА:
 Всего клиентов: {stats['total']}
 
@@ -350,26 +413,13 @@ class ReportsModule(BaseModule):
 """
         for status, count in stats['by_status'].items():
             percentage = (count / stats['total']) * 100 if stats['total'] > 0 else 0
-            preview_text += f"  {status}: {count} ({percentage:.1f}%)\n"
+            text += f"  {status}: {count} ({percentage:.1f}%)\n"
         
-        preview_text += "\nРАСПРЕДЕЛЕНИЕ ПО КОМПАНИЯМ (топ 5):\n"
-        sorted_companies = sorted(stats['by_company'].items(), key=lambda x: x[1], reverse=True)[:5]
-        for company, count in sorted_companies:
+        text += "\nРАСПРЕДЕЛЕНИЕ ПО КОМПАНИЯМ (топ 5):\n"
+        for company, count in stats['by_company'].items():
             percentage = (count / stats['total']) * 100 if stats['total'] > 0 else 0
-            preview_text += f"  {company}: {count} ({percentage:.1f}%)\n"
-        
-        preview_text += f"\nПЕРВЫЕ 10 ЗАПИСЕЙ:\n"
-        preview_text += "ID | Имя | Компания | Статус | Дата создания\n"
-        preview_text += "-" * 70 + "\n"
-        
-        for i, client in enumerate(clients[:10]):
-            preview_text += f"{client.id} | {client.name} | {client.company} | {client.status} | {client.created_at[:10]}\n"
-        
-        if len(clients) > 10:
-            preview_text += f"\n... и еще {len(clients) - 10} записей\n"
-        
-        self.preview_text.delete("1.0", "end")
-        self.preview_text.insert("1.0", preview_text)
+            text += f"  {company}: {count} ({percentage:.1f}%)\n"
+        return text
 
     def _get_period_text(self):
         """Получает текстовое описание периода"""
@@ -387,32 +437,27 @@ class ReportsModule(BaseModule):
 
     def _get_report_type_text(self):
         """Получает текстовое описание типа отчета"""
-        report_type = self.report_type_var.get()
-        type_texts = {
-            "clients_summary": "Общий отчет по клиентам",
-            "clients_by_status": "Клиенты по статусам",
-            "clients_by_date": "Клиенты по дате добавления",
-            "detailed_clients": "Подробный отчет по клиентам"
-        }
-        return type_texts.get(report_type, "Неизвестный тип отчета")
+        definition = self._get_report_definition()
+        return definition.title if definition else "Неизвестный тип отчета"
 
     def _generate_report(self):
         """Генерирует и сохраняет отчет"""
+        if self.delta_var.get():
+            self._generate_delta_export()
+            return
+        
         start_date, end_date = self._get_date_range()
         
         if start_date is None and self.period_var.get() == "custom":
             return
         
-        clients = self._get_clients_data(start_date, end_date)
+        definition = self._get_report_definition()
+        source = self._get_report_source(start_date, end_date)
         
-        if not clients:
+        if source is None:
             messagebox.showwarning("Нет данных", "Нет данных для генерации отчета.")
             return
         
-        # Подготавливаем данные
-        data = self._prepare_data_for_report(clients)
-        df = pd.DataFrame(data)
-        
         # Выбираем место для сохранения
         file_ext = self._get_file_extension()
         default_name = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}{file_ext}"
@@ -426,36 +471,55 @@ class ReportsModule(BaseModule):
         if not file_path:
             return  # Пользователь отменил
         
-        try:
-            # Сохраняем в выбранном формате
-            file_format = self.format_var.get()
-            
-            if file_format == "excel":
-                self._save_to_excel(df, file_path, clients)
-            elif file_format == "csv":
-                df.to_csv(file_path, index=False, encoding='utf-8-sig')
-            elif file_format == "json":
-                df.to_json(file_path, orient='records', force_ascii=False, indent=2)
-            
-            messagebox.showinfo("Успех", f"Отчет успешно сохранен:\n{file_path}")
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить отчет: {str(e)}")
-
-    def _save_to_excel(self, df, file_path, clients):
-        """Сохраняет отчет в Excel с несколькими листами"""
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            # Основные данные
-            df.to_excel(writer, sheet_name='Клиенты', index=False)
-            
-            # Сводная статистика
-            stats = self._generate_summary_statistics(clients)
+        # Файл пишется в фоне, потоково из курсора; в очередь можно поставить несколько отчетов
+        # (сама запись видна в трассе как спан задачи)
+        file_format = self.format_var.get()
+        tracer.instant("Генерация отчета", "ui", report=definition.report_id, format=file_format)
+        title = f"{definition.title} → {os.path.basename(file_path)}"
+        if file_format == "excel":
+            job = export_job(title, self._save_to_excel, source, file_path,
+                             start_date=start_date, end_date=end_date,
+                             definition=definition, period_text=self._get_period_text())
+        else:
+            job = export_job(title, EXPORTERS[file_format], source, file_path,
+                             gzip_output=self._is_compressed())
+        self._submit_job(job)
+
+    def _generate_delta_export(self):
+        """Выгружает клиентов, измененных с прошлой дельта-выгрузки из этого модуля"""
+        file_ext = self._get_file_extension()
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=file_ext,
+            filetypes=self._get_file_types(),
+            initialfile=f"clients_delta_{datetime.now().strftime('%Y%m%d_%H%M%S')}{file_ext}"
+        )
+        if not file_path:
+            return
+        
+        delta = DeltaExport(self.DELTA_TARGET, "clients")
+        source = delta.source()
+        file_format = self.format_var.get()
+        kwargs = {} if file_format == "excel" else {'gzip_output': self._is_compressed()}
+        title = f"{'Все клиенты' if delta.is_full else 'Изменения клиентов'} → {os.path.basename(file_path)}"
+        # Курсор сдвигается только после успешной записи файла; пустая дельта
+        # тоже пишется, как в python -m crm export --delta
+        job = export_job(title, EXPORTERS[file_format], source, file_path,
+                         on_done=delta.commit, allow_empty=True, **kwargs)
+        self._submit_job(job)
+
+    def _save_to_excel(self, source, file_path, start_date=None, end_date=None,
+                       definition=None, period_text: str = "", progress=None):
+        """Сохраняет отчет в Excel с несколькими листами (строки пишутся потоково)"""
+        extra_sheets = []
+        
+        # Лист со статистикой (для отчетов по клиентам)
+        if definition is not None and "clients" in definition.depends_on:
+            stats = summary_statistics(start_date, end_date, company_limit=10)
             
-            # Лист со статистикой
             stats_data = []
             stats_data.append(["ОБЩАЯ СТАТИСТИКА"])
             stats_data.append([f"Всего клиентов: {stats['total']}"])
-            stats_data.append([f"Период: {self._get_period_text()}"])
+            stats_data.append([f"Период: {period_text}"])
             stats_data.append([f"Дата генерации: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
             stats_data.append([])
             
@@ -468,50 +532,156 @@ class ReportsModule(BaseModule):
             stats_data.append([])
             stats_data.append(["РАСПРЕДЕЛЕНИЕ ПО КОМПАНИЯМ (топ 10)"])
             stats_data.append(["Компания", "Количество", "Процент"])
-            sorted_companies = sorted(stats['by_company'].items(), key=lambda x: x[1], reverse=True)[:10]
-            for company, count in sorted_companies:
+            for company, count in stats['by_company'].items():
                 percentage = (count / stats['total']) * 100 if stats['total'] > 0 else 0
                 stats_data.append([company, count, f"{percentage:.1f}%"])
             
-            stats_df = pd.DataFrame(stats_data)
-            stats_df.to_excel(writer, sheet_name='Статистика', index=False, header=False)
-            
-            # Лист с диаграммой (заглушка - можно добавить реальные диаграммы позже)
-            summary_data = [["Сводная информация по отчету"]]
-            summary_df = pd.DataFrame(summary_data)
-            summary_df.to_excel(writer, sheet_name='Сводка', index=False, header=False)
-            
-            # Автонастройка ширины колонок
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
+            extra_sheets.append(('Статистика', stats_data))
+        
+        # Лист с диаграммой (заглушка - можно добавить реальные диаграммы позже)
+        extra_sheets.append(('Сводка', [["Сводная информация по отчету"]]))
+        
+        return export_xlsx(source, file_path, sheet_title='Отчет',
+                           extra_sheets=extra_sheets, progress=progress)
+
+    def _submit_job(self, job: Job):
+        """Ставит задание в очередь и показывает его в списке"""
+        if job.kind == "export":
+            job_queue.submit(job)
+            self._add_job_row(job)
+        else:
+            # Просмотр не ждет в очереди за длинными выгрузками: части выполняются
+            # в постоянном пуле job_queue (без нового потока и соединения с БД на клик)
+            job_queue.run_now(job)
+        self._start_polling()
+
+    def _add_job_row(self, job: Job):
+        """Добавляет строку задания: название, прогресс, статус и кнопка отмены"""
+        self.no_jobs_label.pack_forget()
+        
+        row = ctk.CTkFrame(self.jobs_frame)
+        row.pack(fill="x", padx=5, pady=3)
+        
+        title_label = ctk.CTkLabel(row, text=job.title, font=("Arial", 12), anchor="w")
+        title_label.pack(side="left", padx=10)
+        
+        cancel_btn = ctk.CTkButton(
+            row,
+            text="Отменить",
+            command=job.cancel,
+            width=90,
+            height=28,
+            fg_color=Styles.ERROR_COLOR,
+            hover_color="#B71C1C"
+        )
+        cancel_btn.pack(side="right", padx=5)
+        
+        status_label = ctk.CTkLabel(row, text="В очереди", font=("Arial", 11),
+                                    text_color="gray", width=160)
+        status_label.pack(side="right", padx=5)
+        
+        progress_bar = ctk.CTkProgressBar(row, width=200)
+        progress_bar.set(0)
+        progress_bar.pack(side="right", padx=5)
+        
+        self._job_rows[job] = {
+            'row': row,
+            'progress': progress_bar,
+            'status': status_label,
+            'cancel': cancel_btn
+        }
+
+    def _start_polling(self):
+        if not self._polling and self.root is not None:
+            self._polling = True
+            self.root.after(self.JOBS_POLL_MS, self._poll_jobs)
+
+    def _poll_jobs(self):
+        """Обновляет прогресс заданий и сообщает о завершенных"""
+        for job, widgets in list(self._job_rows.items()):
+            if not widgets['row'].winfo_exists():
+                # Интерфейс модуля был выгружен - строки пересоздадутся при показе
+                del self._job_rows[job]
+                continue
+            widgets['progress'].set(job.progress)
+            widgets['status'].configure(text=self._get_job_status_text(job))
+            if job.is_finished:
+                widgets['cancel'].configure(state="disabled")
+        
+        for job in job_queue.jobs:
+            if job.is_finished and job not in self._notified:
+                self._notified.add(job)
+                self._on_job_finished(job)
+        
+        if job_queue.active_jobs():
+            self.root.after(self.JOBS_POLL_MS, self._poll_jobs)
+        else:
+            self._polling = False
+            job_queue.clear_finished()
+            self._notified.clear()
+
+    def _get_job_status_text(self, job: Job) -> str:
+        """Текст состояния задания"""
+        if job.state == Job.QUEUED:
+            return "В очереди"
+        if job.state == Job.RUNNING:
+            if job.total:
+                return f"{job.processed} из {job.total} строк"
+            return "Подсчет строк..."
+        if job.state == Job.DONE:
+            return "Готово"
+        if job.state == Job.CANCELLED:
+            return "Отменено"
+        return "Ошибка"
+
+    def _on_job_finished(self, job: Job):
+        """Результат задания: просмотр - в текстовое поле, файл - немодальное уведомление"""
+        if job.kind == "preview":
+            part = self._preview_parts.get(job)
+            if part is None:
+                # Часть устаревшего просмотра
+                return
+            if job.state == Job.DONE:
+                self._preview_results[part] = job.result
+                self._render_preview()
+            elif job.state == Job.FAILED:
+                show_toast(self.root, f"Ошибка просмотра: {job.error}", "error")
+            return
+        
+        if job.state == Job.DONE and job.result.rows == 0:
+            show_toast(self.root, f"Нет новых данных: {job.title}\nЗаписан файл без строк", "info")
+        elif job.state == Job.DONE:
+            show_toast(self.root, f"Отчет готов: {job.title}\n{job.result}", "success")
+        elif job.state == Job.CANCELLED:
+            show_toast(self.root, f"Отчет отменен: {job.title}", "warning")
+        else:
+            show_toast(self.root, f"Не удалось сохранить отчет: {job.title}\n{job.error}", "error")
 
     def _get_file_extension(self):
         """Получает расширение файла на основе формата"""
         formats = {
             "excel": ".xlsx",
             "csv": ".csv",
-            "json": ".json"
+            "json": ".json",
+            "jsonl": ".jsonl"
         }
-        return formats.get(self.format_var.get(), ".xlsx")
+        extension = formats.get(self.format_var.get(), ".xlsx")
+        return extension + ".gz" if self._is_compressed() else extension
+
+    def _is_compressed(self) -> bool:
+        """Сжимать ли файл (Excel уже сжат, для него опция не действует)"""
+        return self.compress_var.get() and self.format_var.get() != "excel"
 
     def _get_file_types(self):
         """Получает типы файлов для диалога сохранения"""
         formats = {
             "excel": [("Excel files", "*.xlsx"), ("All files", "*.*")],
             "csv": [("CSV files", "*.csv"), ("All files", "*.*")],
-            "json": [("JSON files", "*.json"), ("All files", "*.*")]
+            "json": [("JSON files", "*.json"), ("All files", "*.*")],
+            "jsonl": [("JSON Lines files", "*.jsonl"), ("All files", "*.*")]
         }
+        if self._is_compressed():
+            return [("Gzip files", "*.gz"), ("All files", "*.*")]
         return formats.get(self.format_var.get(), [("All files", "*.*")])
 
     def initialize_database(self):
@@ -32,7 +32,8 @@ class SettingsModule(BaseModule):
             "auto_save": True,
             "backup_interval": 24,  # часов
             "max_rows_per_page": 50,
-            "default_status": "активный"  # Изменено на русский
+            "default_status": "активный",  # Изменено на русский
+            "module_view_cache_size": Config.MODULE_VIEW_CACHE_SIZE
         }
 
         if self.settings_file.exists():
@@ -209,6 +210,19 @@ class SettingsModule(BaseModule):
 
         backup_slider.configure(command=lambda v: self.backup_label.configure(text=f"{int(float(v))} часов"))
 
+        # Сколько открытых модулей держать в памяти
+        ctk.CTkLabel(parent, text="Модулей в памяти (быстрое переключение):",
+                     font=("Arial", 14, "bold")).pack(anchor="w", pady=(20, 5))
+
+        self.view_cache_var = ctk.IntVar(value=self.settings["module_view_cache_size"])
+        view_cache_combo = ctk.CTkComboBox(
+            parent,
+            values=["1", "2", "3", "4", "6", "8"],
+            variable=self.view_cache_var,
+            width=200
+        )
+        view_cache_combo.pack(anchor="w", pady=5)
+
     def _create_database_tab(self, parent):
         """Создает вкладку настроек базы данных"""
         # Максимальное количество записей на странице
@@ -266,7 +280,29 @@ class SettingsModule(BaseModule):
             fg_color=Styles.SECONDARY_COLOR,
             hover_color="#8A2C5C"
         )
-        backup_btn.pack(pady=20)
+        backup_btn.pack(pady=(20, 5))
+
+        # Пересчет агрегатов отчетов (после ручного изменения файла БД)
+        rebuild_btn = ctk.CTkButton(
+            parent,
+            text="Пересобрать агрегаты отчетов",
+            command=self._rebuild_aggregates,
+            width=250,
+            height=40,
+            fg_color=Styles.SECONDARY_COLOR,
+            hover_color="#8A2C5C"
+        )
+        rebuild_btn.pack(pady=(5, 20))
+
+    def _rebuild_aggregates(self):
+        """Пересчитывает агрегатные таблицы отчетов"""
+        try:
+            from core.aggregates import rebuild_client_aggregates
+
+            elapsed = rebuild_client_aggregates()
+            messagebox.showinfo("Успех", f"Агрегаты отчетов пересобраны за {elapsed:.2f} с")
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось пересобрать агрегаты: {e}")
 
     def _create_backup(self):
         """Создает резервную копию базы данных"""
@@ -305,7 +341,8 @@ class SettingsModule(BaseModule):
             "auto_save": self.autosave_var.get(),
             "backup_interval": self.backup_var.get(),
             "max_rows_per_page": self.rows_var.get(),
-            "default_status": self.status_var.get()
+            "default_status": self.status_var.get(),
+            "module_view_cache_size": self.view_cache_var.get()
         })
 
         if self.save_settings():
@@ -331,7 +368,8 @@ class SettingsModule(BaseModule):
                 "auto_save": True,
                 "backup_interval": 24,
                 "max_rows_per_page": 50,
-                "default_status": "активный"  # На русском
+                "default_status": "активный",  # На русском
+                "module_view_cache_size": Config.MODULE_VIEW_CACHE_SIZE
             }
 
             # Обновляем UI
@@ -342,6 +380,7 @@ class SettingsModule(BaseModule):
             self.backup_var.set(self.settings["backup_interval"])
             self.rows_var.set(self.settings["max_rows_per_page"])
             self.status_var.set(self.settings["default_status"])
+            self.view_cache_var.set(self.settings["module_view_cache_size"])
 
             messagebox.showinfo("Сброс", "Настройки сброшены к значениям по умолчанию!")
 
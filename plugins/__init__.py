@@ -1,13 +1,15 @@
 """
 Система плагинов
 """
+import importlib
 import importlib.util
 import json
 import sys
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
-from tkinter import messagebox
+
+from utils.tracing import tracer
 
 PLUGINS_DIR = Path(__file__).parent
 ENABLED_PLUGINS_FILE = PLUGINS_DIR / "enabled_plugins.json"
@@ -20,6 +22,7 @@ class PluginManager:
         self.plugins = {}
         self.enabled_plugins = self._load_enabled_plugins()
         self.loaded_plugins = {}
+        self.errors = {}  # Последняя ошибка включения по каждому плагину
         
     def _load_enabled_plugins(self) -> Dict[str, bool]:
         """Загружает список включенных плагинов"""
@@ -94,40 +97,50 @@ class PluginManager:
             logging.error(f"Ошибка загрузки модуля плагина {plugin_id}: {e}")
             return None
     
-    def enable_plugin(self, plugin_id: str) -> bool:
-        """Включает плагин"""
+    def enable_plugin(self, plugin_id: str, show_errors: bool = True) -> bool:
+        """
+        Включает плагин
+
+        show_errors=False - не показывать диалог ошибки (вызов из фонового потока),
+        текст ошибки остается в self.errors[plugin_id]
+        """
         if plugin_id not in self.plugins:
             return False
+        self.errors.pop(plugin_id, None)
         
         try:
-            # Загружаем модуль плагина
-            plugin_module = self._load_plugin_module(plugin_id)
-            
-            if plugin_module is None:
-                raise ImportError(f"Не удалось загрузить модуль плагина {plugin_id}")
-            
-            # Получаем класс Plugin из модуля
-            if not hasattr(plugin_module, 'Plugin'):
-                raise AttributeError(f"Модуль {plugin_id} не содержит класса Plugin")
-            
-            # Инициализируем плагин
-            plugin_instance = plugin_module.Plugin()
-            
-            # Сохраняем экземпляр
-            self.loaded_plugins[plugin_id] = plugin_instance
-            self.enabled_plugins[plugin_id] = True
-            
-            # Инициализируем БД плагина
-            plugin_instance.initialize_database()
-            
-            # Сохраняем состояние
-            self._save_enabled_plugins()
+            with tracer.span("Включение плагина", "plugin", plugin=plugin_id):
+                # Загружаем модуль плагина
+                plugin_module = self._load_plugin_module(plugin_id)
+                
+                if plugin_module is None:
+                    raise ImportError(f"Не удалось загрузить модуль плагина {plugin_id}")
+                
+                # Получаем класс Plugin из модуля
+                if not hasattr(plugin_module, 'Plugin'):
+                    raise AttributeError(f"Модуль {plugin_id} не содержит класса Plugin")
+                
+                # Инициализируем плагин
+                plugin_instance = plugin_module.Plugin()
+                
+                # Сохраняем экземпляр
+                self.loaded_plugins[plugin_id] = plugin_instance
+                self.enabled_plugins[plugin_id] = True
+                
+                # Инициализируем БД плагина
+                plugin_instance.initialize_database()
+                
+                # Сохраняем состояние
+                self._save_enabled_plugins()
             
             return True
             
         except Exception as e:
             logging.error(f"Ошибка включения плагина {plugin_id}: {e}")
-            messagebox.showerror("Ошибка", f"Не удалось включить плагин {plugin_id}:\n{str(e)}")
+            self.errors[plugin_id] = str(e)
+            if show_errors:
+                from tkinter import messagebox
+                messagebox.showerror("Ошибка", f"Не удалось включить плагин {plugin_id}:\n{str(e)}")
             return False
     
     def disable_plugin(self, plugin_id: str) -> bool:
@@ -154,6 +167,29 @@ class PluginManager:
                 enabled.append(plugin_info_copy)
         return enabled
     
+    def load_plugin_models(self) -> List[str]:
+        """
+        Загружает только данные включенных плагинов (plugins/<id>/models.py) без
+        интерфейса: для консольных команд и фоновых процессов. Если в модуле есть
+        функция register_reports(), регистрирует отчеты плагина
+        """
+        loaded = []
+        for plugin_id, plugin_info in self.plugins.items():
+            if not self.is_plugin_enabled(plugin_id):
+                continue
+            plugin_dir = Path(plugin_info['path'])
+            if not (plugin_dir / "models.py").exists():
+                continue
+            try:
+                module = importlib.import_module(f"plugins.{plugin_dir.name}.models")
+                if hasattr(module, 'register_reports'):
+                    module.register_reports()
+                loaded.append(plugin_id)
+            except Exception as e:
+                logging.error(f"Ошибка загрузки данных плагина {plugin_id}: {e}")
+                self.errors[plugin_id] = str(e)
+        return loaded
+    
     def get_plugin_module(self, plugin_id: str):
         """Получает модуль плагина"""
         return self.loaded_plugins.get(plugin_id)
@@ -2,7 +2,7 @@
 Базовый класс для плагинов
 """
 from abc import ABC, abstractmethod
-import customtkinter as ctk
+from typing import Any
 
 
 class BasePlugin(ABC):
@@ -12,8 +12,8 @@ class BasePlugin(ABC):
         self.plugin_info = {}
     
     @abstractmethod
-    def get_ui_component(self, parent) -> ctk.CTkFrame:
-        """Возвращает UI компонент плагина"""
+    def get_ui_component(self, parent) -> Any:
+        """Возвращает UI компонент плагина (CTkFrame)"""
         pass
     
     @abstractmethod
@@ -21,6 +21,14 @@ class BasePlugin(ABC):
         """Инициализирует таблицы БД для плагина"""
         pass
     
+    def on_show(self):
+        """Вызывается при показе интерфейса плагина (можно обновить данные)"""
+        pass
+    
+    def on_hide(self):
+        """Вызывается, когда интерфейс плагина скрыт, но остается построенным"""
+        pass
+    
     def get_module_name(self) -> str:
         """Возвращает имя модуля для отображения в сайдбаре"""
         return self.plugin_info.get('name', 'Плагин')
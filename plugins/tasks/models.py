@@ -0,0 +1,109 @@
+"""
+Данные плагина задач: модель и отчеты (без графического интерфейса)
+"""
+from typing import Dict, Any, List
+from datetime import datetime
+
+from core.database import db_manager
+from core.reports import report_registry, ReportDefinition, ReportColumn
+
+
+class TaskModel:
+    """Модель задачи"""
+    
+    TABLE_NAME = "tasks"
+    
+    SCHEMA = {
+        'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+        'title': 'TEXT NOT NULL',
+        'description': 'TEXT',
+        'priority': 'TEXT',
+        'status': 'TEXT',
+        'created_at': 'TEXT'
+    }
+    
+    def __init__(self, **kwargs):
+        self.id = kwargs.get('id')
+        self.title = kwargs.get('title', '')
+        self.description = kwargs.get('description', '')
+        self.priority = kwargs.get('priority', 'medium')
+        self.status = kwargs.get('status', 'pending')
+        self.created_at = kwargs.get('created_at', datetime.now().isoformat())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'title': self.title,
+            'description': self.description,
+            'priority': self.priority,
+            'status': self.status,
+            'created_at': self.created_at
+        }
+        if self.id:
+            data['id'] = self.id
+        return data
+    
+    def save(self) -> int:
+        """Сохраняет задачу в БД"""
+        data = self.to_dict()
+        
+        if self.id:
+            # Обновление
+            db_manager.update(self.TABLE_NAME, data, "id = ?", (self.id,))
+            return self.id
+        else:
+            # Создание
+            self.id = db_manager.insert(self.TABLE_NAME, data)
+            return self.id
+    
+    @classmethod
+    def get_all(cls):
+        """Получает все задачи"""
+        results = db_manager.select(cls.TABLE_NAME)
+        return [cls(**dict(row)) for row in results]
+    
+    @classmethod
+    def get(cls, task_id: int):
+        """Получает задачу по ID"""
+        result = db_manager.select(cls.TABLE_NAME, where="id = ?", params=(task_id,))
+        if result:
+            return cls(**dict(result[0]))
+        return None
+    
+    def delete(self) -> bool:
+        """Удаляет задачу"""
+        if self.id:
+            return db_manager.delete(self.TABLE_NAME, "id = ?", (self.id,))
+        return False
+    
+    @classmethod
+    def prepare_record(cls, record: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+        """Запись задачи из внешнего источника (API) в формате таблицы"""
+        record = {key: value for key, value in record.items() if key != 'id'}
+        if not record.get('created_at'):
+            record.pop('created_at', None)
+        return {key: value for key, value in cls(**record).to_dict().items() if key in columns}
+    
+    @classmethod
+    def validate_many(cls, records: List[Dict[str, Any]]) -> List[List[str]]:
+        """Пакетная проверка задач: название обязательно"""
+        return [[] if str(record.get('title') or '').strip()
+                else ["Поле 'title' обязательно для заполнения"] for record in records]
+    
+    @classmethod
+    def initialize_table(cls):
+        """Создает таблицу задач"""
+        db_manager.create_table(cls.TABLE_NAME, cls.SCHEMA)
+        db_manager.track_changes(cls.TABLE_NAME)
+
+
+def register_reports(registry=report_registry):
+    """Регистрирует отчеты по задачам в реестре отчетов"""
+    registry.register(ReportDefinition(
+        "tasks_by_status", "Задачи по статусам и приоритетам", TaskModel.TABLE_NAME,
+        group_by=[
+            ReportColumn("Статус", "status"),
+            ReportColumn("Приоритет", "priority")
+        ],
+        measures=[ReportColumn("Количество", "COUNT(*)")],
+        order_by='"Статус", "Приоритет"'
+    ))
\ No newline at end of file
@@ -3,73 +3,14 @@
 """
 import customtkinter as ctk
 from tkinter import messagebox
-from typing import Dict, Any
-from datetime import datetime
 
 from plugins.base_plugin import BasePlugin
+from plugins.tasks.models import TaskModel, register_reports
 from core.database import db_manager
+from core.watcher import change_watcher
 from ui.styles import Styles
 
 
-class TaskModel:
-    """Модель задачи"""
-    
-    TABLE_NAME = "tasks"
-    
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('id')
-        self.title = kwargs.get('title', '')
-        self.description = kwargs.get('description', '')
-        self.priority = kwargs.get('priority', 'medium')
-        self.status = kwargs.get('status', 'pending')
-        self.created_at = kwargs.get('created_at', datetime.now().isoformat())
-    
-    def to_dict(self) -> Dict[str, Any]:
-        data = {
-            'title': self.title,
-            'description': self.description,
-            'priority': self.priority,
-            'status': self.status,
-            'created_at': self.created_at
-        }
-        if self.id:
-            data['id'] = self.id
-        return data
-    
-    def save(self) -> int:
-        """Сохраняет задачу в БД"""
-        data = self.to_dict()
-        
-        if self.id:
-            # Обновление
-            db_manager.update(self.TABLE_NAME, data, "id = ?", (self.id,))
-            return self.id
-        else:
-            # Создание
-            self.id = db_manager.insert(self.TABLE_NAME, data)
-            return self.id
-    
-    @classmethod
-    def get_all(cls):
-        """Получает все задачи"""
-        results = db_manager.select(cls.TABLE_NAME)
-        return [cls(**dict(row)) for row in results]
-    
-    @classmethod
-    def get(cls, task_id: int):
-        """Получает задачу по ID"""
-        result = db_manager.select(cls.TABLE_NAME, where="id = ?", params=(task_id,))
-        if result:
-            return cls(**dict(result[0]))
-        return None
-    
-    def delete(self) -> bool:
-        """Удаляет задачу"""
-        if self.id:
-            return db_manager.delete(self.TABLE_NAME, "id = ?", (self.id,))
-        return False
-
-
 class Plugin(BasePlugin):
     """Плагин менеджера задач"""
     
@@ -79,6 +20,20 @@ class Plugin(BasePlugin):
             'name': 'Задачи',
             'icon': '✅'
         }
+        self._tasks_version = None
+        register_reports()
+        change_watcher.subscribe(TaskModel.TABLE_NAME, self._on_external_changes)
+
+    def _on_external_changes(self, changes):
+        """Задачи изменены другой копией приложения: список короткий, перечитываем целиком"""
+        if hasattr(self, 'tasks_listbox') and self.tasks_listbox.winfo_exists():
+            self._refresh_tasks()
+    
+    def on_show(self):
+        """Обновляет список, если задачи менялись, пока плагин был скрыт"""
+        if self._tasks_version is not None and \
+                self._tasks_version != db_manager.table_version(TaskModel.TABLE_NAME):
+            self._refresh_tasks()
     
     def get_ui_component(self, parent) -> ctk.CTkFrame:
         """Создает интерфейс для управления задачами"""
@@ -165,6 +120,7 @@ class Plugin(BasePlugin):
             widget.destroy()
         
         tasks = TaskModel.get_all()
+        self._tasks_version = db_manager.table_version(TaskModel.TABLE_NAME)
         
         if not tasks:
             label = ctk.CTkLabel(
@@ -234,15 +190,7 @@ class Plugin(BasePlugin):
     
     def initialize_database(self):
         """Инициализирует таблицу задач"""
-        schema = {
-            'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
-            'title': 'TEXT NOT NULL',
-            'description': 'TEXT',
-            'priority': 'TEXT',
-            'status': 'TEXT',
-            'created_at': 'TEXT'
-        }
-        db_manager.create_table(TaskModel.TABLE_NAME, schema)
+        TaskModel.initialize_table()
     
     def get_module_name(self) -> str:
         return "Задачи"
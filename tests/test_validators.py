@@ -0,0 +1,37 @@
+"""
+Тесты пакетной валидации Validators
+"""
+import pandas as pd
+
+from utils.validators import Validators
+
+
+def test_numeric_phone_valid_next_to_null():
+    """Числовой телефон валиден независимо от пропусков в других записях"""
+    rows = [{'phone': 89991234567}, {'phone': None}]
+    assert Validators.validate_many(rows, {'phone': 'phone'}) == [{}, {}]
+
+
+def test_numeric_phone_same_result_alone_and_in_batch():
+    alone = Validators.validate_many([{'phone': 89991234567}], {'phone': 'phone'})
+    mixed = Validators.validate_many([{'phone': 89991234567}, {'phone': None}, {'phone': 'x'}],
+                                     {'phone': 'phone'})
+    assert alone == [{}]
+    assert mixed[0] == {}
+    assert mixed[1] == {}
+    assert 'phone' in mixed[2]
+
+
+def test_null_in_required_numeric_column():
+    rows = [{'phone': 89991234567}, {'phone': None}]
+    results = Validators.validate_many(rows, {'phone': 'phone'}, required=['phone'])
+    assert results[0] == {}
+    assert results[1] == {'phone': "Поле 'phone' обязательно для заполнения"}
+
+
+def test_validate_columns_float64_column():
+    """Колонка float64 (число + NaN, как после чтения Excel) без хвоста .0"""
+    df = pd.DataFrame({'phone': [89991234567, None]})
+    assert df['phone'].dtype == 'float64'
+    errors = Validators.validate_columns(df, {'phone': 'phone'}, required=['phone'])
+    assert errors['phone'].tolist() == [False, True]
@@ -0,0 +1,63 @@
+"""
+Немодальные уведомления (всплывают в углу окна и закрываются сами)
+"""
+import customtkinter as ctk
+
+from ui.styles import Styles
+
+
+class Toast:
+    """Всплывающее уведомление в правом нижнем углу главного окна"""
+
+    COLORS = {
+        "info": Styles.PRIMARY_COLOR,
+        "success": Styles.SUCCESS_COLOR,
+        "warning": Styles.WARNING_COLOR,
+        "error": Styles.ERROR_COLOR
+    }
+
+    # Открытые уведомления (новые выводятся над предыдущими)
+    _active = []
+
+    def __init__(self, root, text: str, kind: str = "info", timeout_ms: int = 6000):
+        self.root = root
+        self.window = ctk.CTkToplevel(root)
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+
+        frame = ctk.CTkFrame(self.window, border_width=2,
+                             border_color=self.COLORS.get(kind, Styles.PRIMARY_COLOR))
+        frame.pack(fill="both", expand=True)
+
+        label = ctk.CTkLabel(frame, text=text, justify="left", wraplength=320, font=("Arial", 12))
+        label.pack(side="left", padx=(12, 6), pady=10)
+
+        close_btn = ctk.CTkButton(frame, text="✕", width=28, height=28,
+                                  fg_color="transparent", command=self.close)
+        close_btn.pack(side="right", padx=6, pady=6)
+
+        Toast._active.append(self)
+        self._place()
+        self.window.after(timeout_ms, self.close)
+
+    def _place(self):
+        """Размещает уведомление над уже открытыми"""
+        self.window.update_idletasks()
+        width = self.window.winfo_reqwidth()
+        height = self.window.winfo_reqheight()
+        offset = sum(toast.window.winfo_reqheight() + 8
+                     for toast in Toast._active[:-1] if toast.window.winfo_exists())
+        x = self.root.winfo_rootx() + self.root.winfo_width() - width - 20
+        y = self.root.winfo_rooty() + self.root.winfo_height() - height - 20 - offset
+        self.window.geometry(f"+{max(x, 0)}+{max(y, 0)}")
+
+    def close(self):
+        if self in Toast._active:
+            Toast._active.remove(self)
+        if self.window.winfo_exists():
+            self.window.destroy()
+
+
+def show_toast(root, text: str, kind: str = "info", timeout_ms: int = 6000) -> Toast:
+    """Показывает немодальное уведомление"""
+    return Toast(root, text, kind, timeout_ms)
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Виджеты форм поверх UI-независимой логики (валидация, зависимости полей)
+"""
+from typing import Any, Dict, List, Tuple
+import customtkinter as ctk
+
+from utils.validators import Validators
+from utils.dependencies import (DependencyRule, FieldDependencyManager,
+                                INVERSE_ACTIONS, dependency_manager)
+
+
+def create_field_with_example(parent, field_type: str, label: str,
+                              required: bool = False, width: int = 300) -> Tuple[ctk.CTkEntry, ctk.CTkLabel, ctk.CTkFrame]:
+    """Создает поле ввода с примером"""
+    frame = ctk.CTkFrame(parent)
+
+    # Метка поля
+    field_label = ctk.CTkLabel(
+        frame,
+        text=label + (" *" if required else ""),
+        font=("Arial", 12)
+    )
+    field_label.grid(row=0, column=0, sticky="w", padx=5, pady=(5, 0))
+
+    # Поле ввода
+    entry = ctk.CTkEntry(frame, width=width)
+    entry.grid(row=1, column=0, sticky="ew", padx=5, pady=(0, 2))
+
+    # Метка с примером
+    example = Validators.MASKS.get(field_type, {}).get('example', '')
+    example_label = ctk.CTkLabel(
+        frame,
+        text=f"Пример: {example}",
+        font=("Arial", 10),
+        text_color="gray"
+    )
+    example_label.grid(row=2, column=0, sticky="w", padx=5, pady=(0, 5))
+
+    frame.grid_columnconfigure(0, weight=1)
+
+    return entry, example_label, frame
+
+
+def check_dependencies(field_name: str, value: Any, field_widgets: Dict,
+                       manager: FieldDependencyManager = dependency_manager) -> List[str]:
+    """
+    Проверяет зависимости для поля
+
+    Returns:
+        Список сообщений об ошибках
+    """
+    manager.compile()
+    errors = []
+
+    for rule in manager.dependencies.get(field_name, ()):
+        if rule.matches(value) and rule.dependent_field in field_widgets:
+            apply_dependency_action(
+                rule.dependent_field, rule.action,
+                field_widgets[rule.dependent_field]
+            )
+
+            if rule.message:
+                errors.append(rule.message)
+
+    return errors
+
+
+def apply_to_widgets(activated: List[DependencyRule],
+                     deactivated: List[DependencyRule], field_widgets: Dict):
+    """Применяет изменения состояния зависимостей к виджетам формы"""
+    for rule in deactivated:
+        inverse = INVERSE_ACTIONS.get(rule.action)
+        if inverse and rule.dependent_field in field_widgets:
+            apply_dependency_action(rule.dependent_field, inverse,
+                                    field_widgets[rule.dependent_field])
+
+    for rule in activated:
+        if rule.dependent_field in field_widgets:
+            apply_dependency_action(rule.dependent_field, rule.action,
+                                    field_widgets[rule.dependent_field])
+
+
+def apply_dependency_action(field_name: str, action: str, widget_info: Dict):
+    """Применяет действие зависимости к виджету"""
+    widget = (widget_info.get('widget') or widget_info.get('entry')
+              or widget_info.get('combo') or widget_info.get('textbox'))
+    frame = widget_info.get('frame') or widget_info.get('container')
+
+    if not widget:
+        return
+
+    if action == 'required':
+        # Обновляем метку
+        label = widget_info.get('label')
+        if label and isinstance(label, ctk.CTkLabel):
+            current_text = label.cget('text')
+            if ' *' not in current_text:
+                label.configure(text=current_text + ' *')
+
+        # Делаем поле обязательным
+        widget.configure(border_color="#FF9800")  # Оранжевый цвет для обязательных полей
+
+    elif action == 'optional':
+        # Снимаем отметку, если поле не обязательно само по себе
+        if not widget_info.get('required'):
+            label = widget_info.get('label')
+            if label and isinstance(label, ctk.CTkLabel):
+                label.configure(text=label.cget('text').replace(' *', ''))
+        widget.configure(border_color="#4A5568")
+
+    elif action == 'disabled':
+        widget.configure(state="disabled")
+
+    elif action == 'enabled':
+        widget.configure(state="normal")
+
+    elif action == 'hidden':
+        if frame:
+            frame.grid_remove()
+        else:
+            widget.grid_remove()
+
+    elif action == 'visible':
+        if frame:
+            frame.grid()
+        else:
+            widget.grid()
\ No newline at end of file
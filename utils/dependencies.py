@@ -1,18 +1,105 @@
 """
 Управление зависимостями между полями
+
+Правила компилируются в индекс "поле-триггер -> правила", поэтому при
+изменении поля проверяются только его правила и зависимые от них поля.
+Вычисление правил не требует виджетов: одни и те же правила работают
+в формах и при пакетной проверке импортируемых/API записей. Действия над
+виджетами формы - в ui.widgets.
 """
-from typing import Dict, Any, List, Callable
-import customtkinter as ctk
-from tkinter import messagebox
+from typing import Dict, Any, List, Callable, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Действия, после которых значение зависимого поля не учитывается в правилах
+MASKING_ACTIONS = {'hidden', 'disabled'}
+
+# Обратные действия для снятия эффекта правила
+INVERSE_ACTIONS = {
+    'required': 'optional',
+    'disabled': 'enabled',
+    'enabled': 'disabled',
+    'hidden': 'visible',
+    'visible': 'hidden'
+}
+
+
+class DependencyRule:
+    """Скомпилированное правило зависимости"""
+
+    def __init__(self, trigger_field: str, trigger_value: Any,
+                 dependent_field: str, action: str,
+                 condition: Callable = None, message: str = None):
+        self.trigger_field = trigger_field
+        self.trigger_value = trigger_value
+        self.dependent_field = dependent_field
+        self.action = action
+        self.condition = condition
+        self.message = message
+        self.matches = self._compile_predicate(trigger_value, condition)
+
+    @staticmethod
+    def _compile_predicate(trigger_value: Any, condition: Callable = None) -> Callable[[Any], bool]:
+        """Преобразует условие правила в функцию value -> bool"""
+        if condition is not None:
+            return lambda value: bool(condition(value))
+        if callable(trigger_value):
+            return lambda value: bool(trigger_value(value))
+        if isinstance(trigger_value, (set, frozenset, list, tuple)):
+            options = frozenset(trigger_value)
+            return lambda value: value in options
+        return lambda value: value == trigger_value
+
+
+class DependencyState:
+    """Состояние зависимостей одной формы или записи (без виджетов)"""
+
+    def __init__(self, manager: 'FieldDependencyManager'):
+        self.manager = manager
+        self.values = {}
+        self.active = set()
+
+    def effective_value(self, field_name: str) -> Any:
+        """Значение поля с учетом скрытия/блокировки другими правилами"""
+        for rule in self.active:
+            if rule.dependent_field == field_name and rule.action in MASKING_ACTIONS:
+                return ''
+        return self.values.get(field_name, '')
+
+    def active_rules(self) -> List[DependencyRule]:
+        """Активные правила в порядке их добавления"""
+        return [rule for rule in self.manager.rules if rule in self.active]
+
+    def is_required(self, field_name: str) -> bool:
+        """Стало ли поле обязательным из-за зависимостей"""
+        return any(rule.dependent_field == field_name and rule.action == 'required'
+                   for rule in self.active)
+
+    def load(self, values: Dict[str, Any]) -> Tuple[List[DependencyRule], List[DependencyRule]]:
+        """Полностью пересчитывает состояние для набора значений"""
+        self.manager.compile()
+        self.values = dict(values)
+        return self.manager.propagate(self, list(self.manager.dependencies))
+
+    def update(self, field_name: str, value: Any) -> Tuple[List[DependencyRule], List[DependencyRule]]:
+        """Инкрементально пересчитывает правила после изменения одного поля"""
+        if self.values.get(field_name) == value and field_name in self.values:
+            return [], []
+        self.values[field_name] = value
+        return self.manager.propagate(self, [field_name])
 
 
 class FieldDependencyManager:
     """Менеджер зависимостей между полями"""
     
     def __init__(self):
-        self.dependencies = {}
+        self.rules = []
+        self.dependencies = {}  # поле-триггер -> [DependencyRule]
         self.field_validators = {}
         self.field_formatters = {}
+        self._order = {}
+        self._compiled = False
         
     def add_dependency(self, trigger_field: str, trigger_value: Any,
                       dependent_field: str, action: str, 
@@ -22,22 +109,126 @@ class FieldDependencyManager:
         
         Args:
             trigger_field: Поле, которое запускает зависимость
-            trigger_value: Значение, которое активирует зависимость
+            trigger_value: Значение (список значений или функция), которое активирует зависимость
             dependent_field: Зависимое поле
             action: Действие ('required', 'hidden', 'disabled', 'visible')
             condition: Дополнительное условие (функция)
             message: Сообщение для пользователя
         """
-        if trigger_field not in self.dependencies:
-            self.dependencies[trigger_field] = []
+        rule = DependencyRule(trigger_field, trigger_value, dependent_field,
+                              action, condition, message)
         
-        self.dependencies[trigger_field].append({
-            'trigger_value': trigger_value,
-            'dependent_field': dependent_field,
-            'action': action,
-            'condition': condition,
-            'message': message
-        })
+        self.rules.append(rule)
+        self._compiled = False
+
+    def compile(self):
+        """Строит индекс правил по полям-триггерам и порядок пересчета полей"""
+        if self._compiled:
+            return
+
+        self.dependencies = {}
+        for rule in self.rules:
+            self.dependencies.setdefault(rule.trigger_field, []).append(rule)
+
+        # Топологический порядок по ребрам "триггер -> скрываемое поле"
+        edges = {}
+        indegree = {}
+        for rule in self.rules:
+            indegree.setdefault(rule.trigger_field, 0)
+            indegree.setdefault(rule.dependent_field, 0)
+            if rule.action in MASKING_ACTIONS:
+                targets = edges.setdefault(rule.trigger_field, set())
+                if rule.dependent_field not in targets:
+                    targets.add(rule.dependent_field)
+                    indegree[rule.dependent_field] += 1
+
+        queue = [field for field, degree in indegree.items() if degree == 0]
+        order = []
+        while queue:
+            field = queue.pop(0)
+            order.append(field)
+            for target in edges.get(field, ()):
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    queue.append(target)
+
+        if len(order) < len(indegree):
+            logger.warning("Обнаружен цикл в зависимостях полей")
+            order.extend(field for field in indegree if field not in order)
+
+        self._order = {field: i for i, field in enumerate(order)}
+        self._compiled = True
+
+    def is_trigger(self, field_name: str) -> bool:
+        """Есть ли правила, зависящие от значения поля"""
+        self.compile()
+        return field_name in self.dependencies
+
+    def affects(self, fields: Iterable[str]) -> bool:
+        """Участвует ли хоть одно из полей в правилах (как триггер или зависимое поле)"""
+        fields = set(fields)
+        return any(rule.trigger_field in fields or rule.dependent_field in fields
+                   for rule in self.rules)
+
+    def new_state(self, values: Dict[str, Any] = None) -> DependencyState:
+        """Создает состояние зависимостей для формы или записи"""
+        state = DependencyState(self)
+        if values is not None:
+            state.load(values)
+        return state
+
+    def propagate(self, state: DependencyState,
+                  fields: Iterable[str]) -> Tuple[List[DependencyRule], List[DependencyRule]]:
+        """
+        Пересчитывает правила изменившихся полей и зависимых от них полей
+
+        Returns:
+            (включившиеся правила, выключившиеся правила)
+        """
+        self.compile()
+        activated, deactivated = [], []
+        pending = set(fields)
+        processed = set()
+
+        while pending:
+            field = min(pending, key=lambda f: self._order.get(f, len(self._order)))
+            pending.discard(field)
+            if field in processed:
+                continue
+            processed.add(field)
+
+            value = state.effective_value(field)
+            for rule in self.dependencies.get(field, ()):
+                was_active = rule in state.active
+                is_active = rule.matches(value)
+                if was_active == is_active:
+                    continue
+
+                if is_active:
+                    state.active.add(rule)
+                    activated.append(rule)
+                else:
+                    state.active.discard(rule)
+                    deactivated.append(rule)
+
+                # Скрытие поля меняет его значение для следующих правил
+                if rule.action in MASKING_ACTIONS:
+                    pending.add(rule.dependent_field)
+
+        return activated, deactivated
+
+    def check_record(self, record: Dict[str, Any]) -> List[str]:
+        """Проверяет запись на нарушения зависимостей (без виджетов)"""
+        state = self.new_state(record)
+        errors = []
+        for rule in state.active_rules():
+            if rule.action == 'required' and not str(record.get(rule.dependent_field) or '').strip():
+                errors.append(rule.message or f"Поле '{rule.dependent_field}' обязательно для заполнения")
+        return errors
+
+    def validate_many(self, records: Iterable[Dict[str, Any]]) -> List[List[str]]:
+        """Пакетная проверка зависимостей для списка записей"""
+        return [self.check_record(record) for record in records]
     
     def add_field_validator(self, field_name: str, validator: Callable, 
                            error_message: str = None):
@@ -65,85 +256,21 @@ class FieldDependencyManager:
             return self.field_formatters[field_name](value)
         return value
     
-    def check_dependencies(self, field_name: str, value: Any, 
-                          field_widgets: Dict) -> List[str]:
-        """
-        Проверяет зависимости для поля
-        
-        Returns:
-            Список сообщений об ошибках
-        """
-        errors = []
-        
-        if field_name in self.dependencies:
-            for dependency in self.dependencies[field_name]:
-                # Проверяем условие
-                condition_met = False
-                if dependency['condition']:
-                    condition_met = dependency['condition'](value)
-                else:
-                    condition_met = (value == dependency['trigger_value'])
-                
-                if condition_met:
-                    dependent_field = dependency['dependent_field']
-                    action = dependency['action']
-                    
-                    if dependent_field in field_widgets:
-                        self._apply_dependency_action(
-                            dependent_field, action, 
-                            field_widgets[dependent_field]
-                        )
-                        
-                        if dependency['message']:
-                            errors.append(dependency['message'])
-        
-        return errors
-    
-    def _apply_dependency_action(self, field_name: str, action: str, 
-                                widget_info: Dict):
-        """Применяет действие зависимости к виджету"""
-        widget = widget_info.get('widget')
-        
-        if not widget:
-            return
-        
-        if action == 'required':
-            # Обновляем метку
-            label = widget_info.get('label')
-            if label and isinstance(label, ctk.CTkLabel):
-                current_text = label.cget('text')
-                if ' *' not in current_text:
-                    label.configure(text=current_text + ' *')
-            
-            # Делаем поле обязательным
-            widget.configure(border_color="#FF9800")  # Оранжевый цвет для обязательных полей
-            
-        elif action == 'disabled':
-            widget.configure(state="disabled")
-            
-        elif action == 'enabled':
-            widget.configure(state="normal")
-            
-        elif action == 'hidden':
-            if 'frame' in widget_info:
-                widget_info['frame'].grid_remove()
-            else:
-                widget.grid_remove()
-                
-        elif action == 'visible':
-            if 'frame' in widget_info:
-                widget_info['frame'].grid()
-            else:
-                widget.grid()
-
 
 # Глобальный экземпляр менеджера зависимостей
 dependency_manager = FieldDependencyManager()
 
+# Зависимости клиентов уже зарегистрированы (setup_client_dependencies)
+_client_dependencies_registered = False
+
 
 # Пример использования зависимостей для модуля клиентов
 def setup_client_dependencies():
-    """Настраивает зависимости для модуля клиентов"""
+    """Настраивает зависимости для модуля клиентов (повторный вызов ничего не делает)"""
+    global _client_dependencies_registered
+    if _client_dependencies_registered:
+        return
+    _client_dependencies_registered = True
     
     # Если статус "потенциальный", компания становится обязательной
     dependency_manager.add_dependency(
@@ -186,4 +313,4 @@ def _format_phone(phone: str) -> str:
         return f"+7 ({digits[1:4]}) {digits[4:7]}-{digits[7:9]}-{digits[9:]}"
     elif len(digits) == 10:
         return f"+7 ({digits[0:3]}) {digits[3:6]}-{digits[6:8]}-{digits[8:]}"
-    return phone
\ No newline at end of file
+    return phone
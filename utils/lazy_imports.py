@@ -0,0 +1,30 @@
+"""
+Отложенный импорт тяжелых библиотек
+"""
+import importlib
+
+
+class LazyImport:
+    """Прокси модуля: импорт выполняется при первом обращении к атрибуту"""
+
+    def __init__(self, module_name: str):
+        self._module_name = module_name
+        self._module = None
+
+    def load(self):
+        """Импортирует модуль (один раз) и возвращает его"""
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+# Библиотеки, нужные только отчетам, импорту и экспорту
+pandas = LazyImport("pandas")
+openpyxl = LazyImport("openpyxl")
\ No newline at end of file
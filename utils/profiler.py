@@ -0,0 +1,68 @@
+"""
+Профилирование запуска приложения
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Замеряет длительность фаз запуска и сравнивает с бюджетом"""
+
+    def __init__(self):
+        # Отсчет ведется от первого импорта профайлера
+        self.started_at = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        # Отметки mark() ведутся отдельно для каждого потока
+        self._local = threading.local()
+
+    @property
+    def _last_mark(self) -> float:
+        return getattr(self._local, 'last_mark', self.started_at)
+
+    @_last_mark.setter
+    def _last_mark(self, value: float):
+        self._local.last_mark = value
+
+    def _record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+        logger.info(f"Startup phase '{name}': {seconds * 1000:.1f} ms")
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замеряет фазу запуска: with startup_profiler.phase('...'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._last_mark = end
+            self._record(name, end - start)
+
+    def mark(self, name: str):
+        """Записывает фазу от предыдущей отметки до текущего момента"""
+        now = time.perf_counter()
+        self._record(name, now - self._last_mark)
+        self._last_mark = now
+
+    def total_ms(self) -> float:
+        """Время с начала запуска, мс"""
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def report(self, budget_ms: float = None) -> float:
+        """Логирует итог запуска; превышение бюджета - предупреждение"""
+        total = self.total_ms()
+        summary = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        if budget_ms is not None and total > budget_ms:
+            logger.warning(f"Startup took {total:.0f} ms (budget {budget_ms:.0f} ms): {summary}")
+        else:
+            logger.info(f"Startup took {total:.0f} ms: {summary}")
+        return total
+
+
+# Глобальный профайлер запуска
+startup_profiler = StartupProfiler()
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Трассировка действий пользователя в формате Chrome trace events
+
+Спаны (интервалы) вкладываются друг в друга и пишутся как события "X"
+(complete event) с временем начала и длительностью в микросекундах. Файл
+открывается в chrome://tracing или https://ui.perfetto.dev: по потокам видно,
+сколько заняли запросы к БД, проверка данных и отрисовка Tk внутри действия.
+
+    with tracer.span("Сохранение клиента", "ui", client_id=client_id) as span:
+        ...
+        span.set("rows", 10)
+
+    @traced("Загрузка таблицы клиентов", "ui")
+    def _load_clients_to_grid(self): ...
+
+Пока трассировка выключена (настройка trace_enabled), span() возвращает
+общий пустой объект и ничего не записывает.
+"""
+import json
+import os
+import threading
+import time
+import logging
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних событий хранить (старые вытесняются)
+MAX_EVENTS = 200000
+
+
+class _NullSpan:
+    """Спан выключенной трассировки: ничего не делает"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key: str, value: Any):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Интервал трассировки (with tracer.span(...) as span)"""
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.tracer._push(self.name)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._pop()
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.complete(self.name, self.category, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+    def set(self, key: str, value: Any):
+        """Добавляет аргумент спана (виден в окне события)"""
+        self.args[key] = value
+
+
+class Tracer:
+    """Сборщик событий трассировки (все потоки процесса)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = deque(maxlen=MAX_EVENTS)
+        self._origin = time.perf_counter_ns()
+        self._threads: Dict[int, str] = {}
+        # Открытые спаны по потокам: их видит сторож интерфейса при зависании
+        self._open: Dict[int, List[str]] = {}
+        self._pid = os.getpid()
+
+    def enable(self, enabled: bool = True):
+        """Включает или выключает запись событий"""
+        self.enabled = bool(enabled)
+        logger.info(f"Tracing {'enabled' if self.enabled else 'disabled'}")
+
+    def clear(self):
+        """Удаляет записанные события"""
+        self.events.clear()
+
+    def _push(self, name: str):
+        self._open.setdefault(threading.get_ident(), []).append(name)
+
+    def _pop(self):
+        stack = self._open.get(threading.get_ident())
+        if stack:
+            stack.pop()
+
+    def open_spans(self, thread_id: int) -> List[str]:
+        """Имена незавершенных спанов потока (от внешнего к внутреннему)"""
+        return list(self._open.get(thread_id, ()))
+
+    def span(self, name: str, category: str = "app", **args):
+        """Контекстный менеджер интервала; при выключенной трассировке - пустой объект"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, args)
+
+    def _event(self, name: str, category: str, phase: str, start_ns: int,
+               args: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads[thread.ident] = thread.name
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": phase,
+            "ts": (start_ns - self._origin) / 1000,
+            "pid": self._pid,
+            "tid": thread.ident
+        }
+        if args:
+            event["args"] = args
+        return event
+
+    def complete(self, name: str, category: str, start_ns: int, end_ns: int,
+                 args: Dict[str, Any] = None):
+        """Записывает завершенный интервал по меткам time.perf_counter_ns()"""
+        if not self.enabled:
+            return
+        event = self._event(name, category, "X", start_ns, args)
+        event["dur"] = (end_ns - start_ns) / 1000
+        self.events.append(event)
+
+    def instant(self, name: str, category: str = "app", **args):
+        """Записывает мгновенное событие (отметку на шкале потока)"""
+        if not self.enabled:
+            return
+        event = self._event(name, category, "i", time.perf_counter_ns(), args)
+        event["s"] = "t"
+        self.events.append(event)
+
+    def until_idle(self, widget, name: str, category: str = "ui", **args):
+        """
+        Интервал от текущего момента до выполнения очереди idle-задач Tk
+        (перерисовка и раскладка виджетов после действия)
+        """
+        if not self.enabled:
+            return
+        start = time.perf_counter_ns()
+        widget.after_idle(lambda: self.complete(name, category, start, time.perf_counter_ns(), args))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Трасса в формате Chrome trace events"""
+        events = list(self.events)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                     "args": {"name": name}} for tid, name in list(self._threads.items())]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> str:
+        """Сохраняет трассу в JSON-файл"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, default=str)
+        logger.info(f"Trace saved: {path} ({len(self.events)} events)")
+        return path
+
+
+# Глобальный трассировщик
+tracer = Tracer()
+
+
+def traced(name: Optional[str] = None, category: str = "app") -> Callable:
+    """Декоратор: вызов функции записывается как спан (имя по умолчанию - имя функции)"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(tracer, span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
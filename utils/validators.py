@@ -3,9 +3,9 @@
 """
 import re
 from datetime import datetime
-from typing import Optional, Tuple, Dict
-from tkinter import messagebox
-import customtkinter as ctk
+from typing import Optional, Tuple, Dict, List, Iterable, Any
+
+from utils.lazy_imports import pandas as pd
 
 
 class Validators:
@@ -35,10 +35,13 @@ class Validators:
         }
     }
 
+    # Скомпилированные шаблоны (компилируются один раз при импорте)
+    PATTERNS = {name: re.compile(mask['pattern']) for name, mask in MASKS.items()}
+
     @staticmethod
     def is_valid_email(email: str) -> bool:
         """Проверяет валидность email"""
-        return bool(re.match(Validators.MASKS['email']['pattern'], email))
+        return bool(Validators.PATTERNS['email'].match(email))
 
     @staticmethod
     def is_valid_phone(phone: str) -> bool:
@@ -46,17 +49,17 @@ class Validators:
         # Удаляем все пробелы, скобки и дефисы
         cleaned = re.sub(r'[\s\-\(\)]', '', phone)
         # Проверяем длину и содержание
-        return bool(re.match(Validators.MASKS['phone']['pattern'], phone))
+        return bool(Validators.PATTERNS['phone'].match(phone))
 
     @staticmethod
     def is_valid_name(name: str) -> bool:
         """Проверяет валидность имени"""
-        return bool(re.match(Validators.MASKS['name']['pattern'], name))
+        return bool(Validators.PATTERNS['name'].match(name))
 
     @staticmethod
     def is_valid_company(company: str) -> bool:
         """Проверяет валидность названия компании"""
-        return bool(re.match(Validators.MASKS['company']['pattern'], company))
+        return bool(Validators.PATTERNS['company'].match(company))
 
     @staticmethod
     def is_valid_date(date_str: str, fmt: str = "%Y-%m-%d") -> bool:
@@ -103,38 +106,6 @@ class Validators:
             return f"+7 ({digits[1:4]}) {digits[4:7]}-{digits[7:9]}-{digits[9:]}"
         return phone
 
-    @staticmethod
-    def create_field_with_example(parent, field_type: str, label: str,
-                                 required: bool = False, width: int = 300) -> Tuple[ctk.CTkEntry, ctk.CTkLabel]:
-        """Создает поле ввода с примером"""
-        frame = ctk.CTkFrame(parent)
-
-        # Метка поля
-        field_label = ctk.CTkLabel(
-            frame,
-            text=label + (" *" if required else ""),
-            font=("Arial", 12)
-        )
-        field_label.grid(row=0, column=0, sticky="w", padx=5, pady=(5, 0))
-
-        # Поле ввода
-        entry = ctk.CTkEntry(frame, width=width)
-        entry.grid(row=1, column=0, sticky="ew", padx=5, pady=(0, 2))
-
-        # Метка с примером
-        example = Validators.MASKS.get(field_type, {}).get('example', '')
-        example_label = ctk.CTkLabel(
-            frame,
-            text=f"Пример: {example}",
-            font=("Arial", 10),
-            text_color="gray"
-        )
-        example_label.grid(row=2, column=0, sticky="w", padx=5, pady=(0, 5))
-
-        frame.grid_columnconfigure(0, weight=1)
-
-        return entry, example_label, frame
-
     @staticmethod
     def validate_field(field_type: str, value: str, field_name: str = None) -> Tuple[bool, str]:
         """Валидирует поле и возвращает сообщение об ошибке"""
@@ -152,4 +123,93 @@ class Validators:
             if not validators[field_type](value):
                 return False, Validators.MASKS.get(field_type, {}).get('error', 'Неверный формат')
 
-        return True, ""
\ No newline at end of file
+        return True, ""
+
+    @staticmethod
+    def _cell_text(value: Any) -> str:
+        """
+        Значение ячейки как строка: None/NaN - пустая строка, целое float без ".0"
+        (pandas приводит числовую колонку с пропусками к float64)
+        """
+        if value is None or value is pd.NA:
+            return ''
+        if isinstance(value, float):
+            if value != value:
+                return ''
+            if value.is_integer():
+                return str(int(value))
+        return str(value)
+
+    @staticmethod
+    def validate_columns(df, field_types: Dict[str, str] = None,
+                         required: Iterable[str] = ()):
+        """
+        Векторная валидация DataFrame по колонкам
+
+        Args:
+            df: DataFrame с данными (одна строка - одна запись)
+            field_types: {'колонка': 'тип маски'}, по умолчанию проверяются
+                колонки, имена которых совпадают с типами из MASKS
+            required: Колонки, обязательные для заполнения
+
+        Returns:
+            DataFrame-маска с тем же индексом: True - значение с ошибкой
+        """
+        if field_types is None:
+            field_types = {col: col for col in df.columns if col in Validators.MASKS}
+        required = set(required)
+        columns = list(dict.fromkeys(list(field_types) + sorted(required)))
+
+        errors = pd.DataFrame(False, index=df.index, columns=columns)
+        for column in columns:
+            if column in df.columns:
+                # Поэлементно: результат не зависит от типа, выведенного для всей колонки
+                values = df[column].map(Validators._cell_text).astype(object)
+            else:
+                values = pd.Series('', index=df.index, dtype=object)
+
+            empty = values.str.len() == 0
+            mask = empty if column in required else pd.Series(False, index=df.index)
+
+            pattern = Validators.PATTERNS.get(field_types.get(column))
+            if pattern is not None:
+                # Пустые необязательные поля формат не проверяем
+                mask = mask | (~empty & ~values.str.match(pattern))
+
+            errors[column] = mask
+        return errors
+
+    @staticmethod
+    def validate_many(rows: Iterable[Dict[str, Any]], field_types: Dict[str, str] = None,
+                      required: Iterable[str] = ()) -> List[Dict[str, str]]:
+        """
+        Пакетная валидация списка записей
+
+        Returns:
+            Список той же длины: для каждой записи {'поле': 'сообщение об ошибке'},
+            пустой словарь - запись валидна
+        """
+        # dtype=object: числа не приводятся к float64 из-за пропусков в других записях
+        df = pd.DataFrame(list(rows), dtype=object)
+        results = [{} for _ in range(len(df))]
+        if df.empty:
+            return results
+
+        if field_types is None:
+            field_types = {col: col for col in df.columns if col in Validators.MASKS}
+        mask = Validators.validate_columns(df, field_types, required)
+
+        for column in mask.columns:
+            positions = mask[column].to_numpy().nonzero()[0]
+            if not len(positions):
+                continue
+            format_error = Validators.MASKS.get(field_types.get(column), {}).get('error', 'Неверный формат')
+            values = df[column] if column in df.columns else None
+            for pos in positions:
+                value = values.iat[pos] if values is not None else None
+                if value is None or value != value or str(value) == '':
+                    # Пустое (или NaN) значение в обязательной колонке
+                    results[pos][column] = f"Поле '{column}' обязательно для заполнения"
+                else:
+                    results[pos][column] = format_error
+        return results
\ No newline at end of file
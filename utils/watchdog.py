@@ -0,0 +1,245 @@
+"""
+Сторож главного цикла Tk: измерение задержек интерфейса
+
+Раз в heartbeat_ms главный поток выполняет задачу root.after. Опоздание
+задачи относительно расписания - время, в течение которого цикл событий был
+занят и окно не отвечало. По опозданиям считаются перцентили, а опоздания
+больше stall_ms записываются как зависания: с обработчиком, который в это
+время выполнялся, открытыми спанами трассировки и стеком главного потока.
+Стек снимает вспомогательный поток прямо во время зависания.
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Опоздание больше этого (с) - сон или пауза системы, а не зависание
+SUSPEND_THRESHOLD = 300
+
+# Перцентили задержки в сводке
+PERCENTILES = (50, 90, 99)
+
+
+class Stall:
+    """Зависание интерфейса"""
+
+    def __init__(self, started_at: datetime, duration_ms: float, action: Optional[str],
+                 spans: List[str], stack: Optional[str]):
+        self.started_at = started_at
+        self.duration_ms = duration_ms
+        self.action = action
+        self.spans = spans
+        self.stack = stack
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration_ms, 1),
+            "action": self.action,
+            "spans": self.spans,
+            "stack": self.stack
+        }
+
+
+class UIWatchdog:
+    """Измеряет опоздания heartbeat-задачи главного цикла Tk"""
+
+    def __init__(self):
+        self.enabled = False
+        self.heartbeat_ms = 100
+        self.stall_ms = 200
+        self.sample_stacks = True
+        self.lags = deque(maxlen=3000)
+        self.stalls = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._root = None
+        self._after_id = None
+        self._main_thread = None
+        self._expected = 0
+        self._stop = threading.Event()
+        self._monitor = None
+        # Снимок главного потока во время текущего зависания (снимает монитор)
+        self._sample = None
+        self.reset()
+
+    def configure(self, enabled: bool = None, heartbeat_ms: int = None, stall_ms: float = None,
+                  sample_stacks: bool = None, window: int = None, log_size: int = None):
+        """Меняет параметры (применяются при следующем start())"""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if heartbeat_ms is not None:
+            self.heartbeat_ms = max(10, int(heartbeat_ms))
+        if stall_ms is not None:
+            self.stall_ms = float(stall_ms)
+        if sample_stacks is not None:
+            self.sample_stacks = bool(sample_stacks)
+        with self._lock:
+            if window is not None:
+                self.lags = deque(self.lags, maxlen=window)
+            if log_size is not None:
+                self.stalls = deque(self.stalls, maxlen=log_size)
+
+    def reset(self):
+        """Сбрасывает накопленные задержки и журнал зависаний"""
+        with self._lock:
+            self.lags.clear()
+            self.stalls.clear()
+            self.beats = 0
+            self.stall_count = 0
+            self.stall_total_ms = 0.0
+            self.max_lag_ms = 0.0
+            self.since = datetime.now()
+
+    @property
+    def running(self) -> bool:
+        return self._root is not None
+
+    def start(self, root):
+        """Запускает heartbeat в главном цикле root (вызывается из главного потока)"""
+        if not self.enabled or self.running:
+            return
+        self._root = root
+        self._main_thread = threading.get_ident()
+        self._schedule()
+        if self.sample_stacks:
+            self._stop.clear()
+            self._monitor = threading.Thread(target=self._monitor_loop,
+                                             name="ui-watchdog", daemon=True)
+            self._monitor.start()
+        logger.info(f"UI watchdog started: heartbeat {self.heartbeat_ms} ms, stall {self.stall_ms:.0f} ms")
+
+    def stop(self):
+        """Останавливает heartbeat и пишет итог в лог"""
+        if not self.running:
+            return
+        self._stop.set()
+        try:
+            if self._after_id is not None:
+                self._root.after_cancel(self._after_id)
+        except Exception:
+            pass
+        self._root = None
+        self._after_id = None
+        snapshot = self.snapshot(stalls_limit=0)
+        logger.info(f"UI responsiveness: p50={snapshot['p50_ms']} ms, p99={snapshot['p99_ms']} ms, "
+                    f"max={snapshot['max_ms']} ms, stalls={snapshot['stall_count']}")
+
+    def _schedule(self):
+        self._expected = time.perf_counter_ns() + self.heartbeat_ms * 1_000_000
+        self._after_id = self._root.after(self.heartbeat_ms, self._beat)
+
+    def _beat(self):
+        """Heartbeat: опоздание относительно расписания"""
+        if self._root is None:
+            return
+        now = time.perf_counter_ns()
+        expected = self._expected
+        lag_ms = max(0, now - expected) / 1_000_000
+        with self._lock:
+            sample, self._sample = self._sample, None
+        if lag_ms < SUSPEND_THRESHOLD * 1000:
+            self._record(lag_ms, sample, expected, now)
+        self._schedule()
+
+    def _record(self, lag_ms: float, sample: Optional[Dict[str, Any]], start_ns: int, end_ns: int):
+        with self._lock:
+            self.beats += 1
+            self.lags.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms < self.stall_ms:
+                return
+            sample = sample or {}
+            stall = Stall(datetime.now() - timedelta(milliseconds=lag_ms), lag_ms,
+                          sample.get("action"), sample.get("spans", []), sample.get("stack"))
+            self.stall_count += 1
+            self.stall_total_ms += lag_ms
+            self.stalls.append(stall)
+
+        logger.warning(f"UI stall {lag_ms:.0f} ms: {stall.action or 'unknown action'}")
+        tracer.complete("Зависание интерфейса", "ui", start_ns, end_ns,
+                        {"action": stall.action, "spans": stall.spans})
+
+    def _monitor_loop(self):
+        """Вспомогательный поток: снимает стек главного потока, пока тот не отвечает"""
+        interval = max(self.stall_ms / 4, 10) / 1000
+        sampled_beat = -1
+        while not self._stop.wait(interval):
+            overdue_ms = (time.perf_counter_ns() - self._expected) / 1_000_000
+            beat = self.beats
+            if overdue_ms < self.stall_ms or beat == sampled_beat:
+                continue
+            sampled_beat = beat
+            sample = self._capture()
+            if sample is not None:
+                with self._lock:
+                    self._sample = sample
+
+    def _capture(self) -> Optional[Dict[str, Any]]:
+        """Стек главного потока и обработчик, вызванный циклом Tk"""
+        frame = sys._current_frames().get(self._main_thread)
+        if frame is None:
+            return None
+        stack = "".join(traceback.format_list(traceback.extract_stack(frame)))
+
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+
+        # Обработчик - первый кадр приложения после последнего кадра (custom)tkinter
+        action = None
+        after_tk = False
+        for frame in frames:
+            code = frame.f_code
+            if "tkinter" in code.co_filename:
+                after_tk = True
+                continue
+            if after_tk:
+                name = getattr(code, "co_qualname", code.co_name)
+                action = f"{name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                after_tk = False
+
+        return {"action": action, "spans": tracer.open_spans(self._main_thread), "stack": stack}
+
+    @staticmethod
+    def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 1)
+
+    def snapshot(self, stalls_limit: int = 20) -> Dict[str, Any]:
+        """Сводка задержек: перцентили по последним heartbeat и последние зависания"""
+        with self._lock:
+            ordered = sorted(self.lags)
+            stalls = list(self.stalls)[::-1][:stalls_limit] if stalls_limit else []
+            result = {
+                "enabled": self.enabled,
+                "running": self.running,
+                "heartbeat_ms": self.heartbeat_ms,
+                "stall_ms": self.stall_ms,
+                "since": self.since.isoformat(timespec="seconds"),
+                "beats": self.beats,
+                "samples": len(ordered),
+                "max_ms": round(self.max_lag_ms, 1),
+                "stall_count": self.stall_count,
+                "stall_total_ms": round(self.stall_total_ms, 1)
+            }
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = self._percentile(ordered, percent)
+        result["stalls"] = [stall.to_dict() for stall in stalls]
+        return result
+
+
+# Глобальный сторож интерфейса
+ui_watchdog = UIWatchdog()